@@ -1,8 +1,13 @@
+import hashlib
+from datetime import datetime
+from functools import partial
+
 import frappe
 from frappe import _
 from frappe.model.workflow import get_workflow_name
 from frappe.query_builder import Order
-from frappe.utils import getdate
+from frappe.query_builder.functions import Max
+from frappe.utils import add_to_date, get_datetime, getdate, now_datetime
 
 SUPPORTED_FIELD_TYPES = [
     "Link",
@@ -23,6 +28,22 @@ SUPPORTED_FIELD_TYPES = [
     "Currency",
 ]
 
+EMPLOYEE_DIRECTORY_FIELDS = [
+    "name",
+    "employee_name",
+    "designation",
+    "department",
+    "company",
+    "reports_to",
+    "user_id",
+    "image",
+    "status",
+]
+EMPLOYEE_DIRECTORY_CACHE_KEY = "hrms:employee_directory"
+EMPLOYEE_DIRECTORY_CACHE_EXPIRY = 6 * 60 * 60
+# seconds a transaction may take to commit an employee change after setting its modified timestamp
+EMPLOYEE_DIRECTORY_SYNC_MARGIN = 5 * 60
+
 
 @frappe.whitelist()
 def get_current_user_info() -> dict:
@@ -60,21 +81,116 @@ def get_current_employee_info() -> dict:
 def get_all_employees() -> list[dict]:
     return frappe.get_all(
         "Employee",
-        fields=[
-            "name",
-            "employee_name",
-            "designation",
-            "department",
-            "company",
-            "reports_to",
-            "user_id",
-            "image",
-            "status",
-        ],
+        fields=EMPLOYEE_DIRECTORY_FIELDS,
         limit=999999,
     )
 
 
+@frappe.whitelist()
+def get_employee_directory(since: str | None = None, etag: str | None = None) -> dict:
+    """
+    Returns the directory of active employees along with its `etag` and the `modified` timestamp
+    to sync from next time.
+
+    Without `since`, the full directory is served from a cached snapshot, leaving out the
+    employees if `etag` matches the current one. With `since`, only the employees changed from
+    then on are returned, and the ones deactivated or deleted are listed in `removed`.
+    """
+    snapshot = get_employee_directory_snapshot()
+
+    if since:
+        return get_employee_directory_delta(since) | {"etag": snapshot["etag"]}
+
+    if etag and etag == snapshot["etag"]:
+        return {"etag": etag, "modified": snapshot["modified"], "unchanged": True}
+
+    return snapshot
+
+
+def get_employee_directory_snapshot() -> dict:
+    if snapshot := frappe.cache().get_value(EMPLOYEE_DIRECTORY_CACHE_KEY):
+        return snapshot
+
+    # read before the employees, so that changes made in between are part of the next delta
+    modified = str(get_safe_sync_watermark(get_employee_directory_watermark()))
+    employees = frappe.get_all(
+        "Employee",
+        filters={"status": "Active"},
+        fields=EMPLOYEE_DIRECTORY_FIELDS,
+        order_by="name",
+        limit=999999,
+    )
+    snapshot = {
+        "etag": hashlib.sha1(frappe.as_json(employees).encode()).hexdigest(),
+        "modified": modified,
+        "employees": employees,
+    }
+    frappe.cache().set_value(
+        EMPLOYEE_DIRECTORY_CACHE_KEY, snapshot, expires_in_sec=EMPLOYEE_DIRECTORY_CACHE_EXPIRY
+    )
+
+    return snapshot
+
+
+def get_employee_directory_delta(since: str) -> dict:
+    # rows modified at `since` are sent again, as others may have been saved in the same instant
+    changed = frappe.get_all(
+        "Employee",
+        filters={"modified": (">=", since)},
+        fields=[*EMPLOYEE_DIRECTORY_FIELDS, "modified"],
+        order_by="modified",
+        limit=999999,
+    )
+    deleted = frappe.get_all(
+        "Deleted Document",
+        filters={"deleted_doctype": "Employee", "creation": (">=", since)},
+        fields=["deleted_name", "creation"],
+        limit=999999,
+    )
+
+    timestamps = [get_datetime(since)]
+    timestamps += [employee.pop("modified") for employee in changed]
+    timestamps += [d.creation for d in deleted]
+
+    employees = [employee for employee in changed if employee.status == "Active"]
+    updated = {employee.name for employee in employees}
+    removed = {employee.name for employee in changed if employee.status != "Active"}
+    removed.update(d.deleted_name for d in deleted if d.deleted_name not in updated)
+
+    return {
+        "modified": str(max(get_datetime(since), get_safe_sync_watermark(max(timestamps)))),
+        "employees": employees,
+        "removed": sorted(removed),
+    }
+
+
+def get_employee_directory_watermark() -> str:
+    Employee = frappe.qb.DocType("Employee")
+    DeletedDocument = frappe.qb.DocType("Deleted Document")
+
+    modified = frappe.qb.from_(Employee).select(Max(Employee.modified)).run()[0][0]
+    deleted = (
+        frappe.qb.from_(DeletedDocument)
+        .select(Max(DeletedDocument.creation))
+        .where(DeletedDocument.deleted_doctype == "Employee")
+    ).run()[0][0]
+
+    return str(max(filter(None, [modified, deleted]), default=get_datetime()))
+
+
+def get_safe_sync_watermark(modified: str | datetime) -> datetime:
+    """Moves the watermark back by the sync margin, so that changes committed late with an earlier
+    modified timestamp are part of the next delta. Clients apply resent employees idempotently."""
+    margin = add_to_date(now_datetime(), seconds=-EMPLOYEE_DIRECTORY_SYNC_MARGIN)
+    return min(get_datetime(modified), margin)
+
+
+def clear_employee_directory_cache() -> None:
+    frappe.cache().delete_value(EMPLOYEE_DIRECTORY_CACHE_KEY)
+    # a snapshot built concurrently may not see the change before it is committed
+    frappe.db.after_commit.add(partial(frappe.cache().delete_value, EMPLOYEE_DIRECTORY_CACHE_KEY))
+
+
 @frappe.whitelist()
 def get_unread_notifications_count() -> int:
     return frappe.db.count(
@@ -170,9 +286,35 @@ def get_leave_balance_map(employee: str) -> dict[str, dict[str, float]]:
             'Earned Leave': {'allocated_leaves': 3.0, 'balance_leaves': 3.0},
     }
     """
+    return get_cached_leave_balance_map(employee, getdate())
+
+
+def get_cached_leave_balance_map(employee: str, date) -> dict[str, dict[str, float]]:
+    """Returns the leave balance map on `date`, cached until the employee's leave ledger changes"""
+    from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import (
+        LEAVE_BALANCE_CACHE_EXPIRY,
+        get_leave_balance_cache_key,
+        get_leave_ledger_version,
+    )
+
+    cache_key = get_leave_balance_cache_key(employee)
+    version = get_leave_ledger_version(employee)
+    date = str(getdate(date))
+
+    cached = frappe.cache().hget(cache_key, date)
+    if cached and cached["version"] == version:
+        return cached["leave_map"]
+
+    leave_map = make_leave_balance_map(employee, date)
+    frappe.cache().hset(cache_key, date, {"version": version, "leave_map": leave_map})
+    frappe.cache().expire(frappe.cache().make_key(cache_key), LEAVE_BALANCE_CACHE_EXPIRY)
+
+    return leave_map
+
+
+def make_leave_balance_map(employee: str, date) -> dict[str, dict[str, float]]:
     from hrms.hr.doctype.leave_application.leave_application import get_leave_details
 
-    date = getdate()
     leave_map = {}
 
     leave_details = get_leave_details(employee, date)
@@ -269,12 +411,11 @@ def get_department_approvers(department: str, parentfield: str) -> list[str]:
 
 @frappe.whitelist()
 def get_leave_types(employee: str, date: str) -> list:
-    from hrms.hr.doctype.leave_application.leave_application import get_leave_details
-
     date = date or getdate()
 
-    leave_details = get_leave_details(employee, date)
-    leave_types = list(leave_details["leave_allocation"].keys()) + leave_details["lwps"]
+    leave_types = list(get_cached_leave_balance_map(employee, date))
+    # is used in set query
+    leave_types += frappe.get_list("Leave Type", filters={"is_lwp": 1}, pluck="name")
 
     return leave_types
 
@@ -541,30 +682,18 @@ def get_attachments(dt: str, dn: str):
 @frappe.whitelist()
 def upload_base64_file(content, filename, dt=None, dn=None, fieldname=None):
     import base64
-    import io
     from mimetypes import guess_type
 
-    from PIL import Image, ImageOps
-
     from frappe.handler import ALLOWED_MIMETYPES
 
+    from hrms.utils.image import enqueue_image_normalisation
+
     decoded_content = base64.b64decode(content)
     content_type = guess_type(filename)[0]
     if content_type not in ALLOWED_MIMETYPES:
         frappe.throw(_("You can only upload JPG, PNG, PDF, TXT or Microsoft documents."))
 
-    if content_type.startswith("image/jpeg"):
-        # transpose the image according to the orientation tag, and remove the orientation data
-        with Image.open(io.BytesIO(decoded_content)) as image:
-            transpose_img = ImageOps.exif_transpose(image)
-            # convert the image back to bytes
-            file_content = io.BytesIO()
-            transpose_img.save(file_content, format="JPEG")
-            file_content = file_content.getvalue()
-    else:
-        file_content = decoded_content
-
-    return frappe.get_doc(
+    file = frappe.get_doc(
         {
             "doctype": "File",
             "attached_to_doctype": dt,
@@ -572,34 +701,51 @@ def upload_base64_file(content, filename, dt=None, dn=None, fieldname=None):
             "attached_to_field": fieldname,
             "folder": "Home",
             "file_name": filename,
-            "content": file_content,
+            "content": decoded_content,
             "is_private": 1,
         }
     ).insert()
 
+    if content_type.startswith("image/jpeg"):
+        # the orientation is fixed in the background, the original is stored meanwhile
+        enqueue_image_normalisation(file.name)
+
+    return file
+
 
 @frappe.whitelist()
 def delete_attachment(filename: str):
     frappe.delete_doc("File", filename)
 
 
-@frappe.whitelist()
+@frappe.whitelist(methods=["GET"])
 def download_salary_slip(name: str):
-    import base64
+    from werkzeug.wrappers import Response
 
-    from frappe.utils.print_format import download_pdf
+    from hrms.payroll.doctype.salary_slip.salary_slip_pdf import (
+        get_or_store_salary_slip_pdf,
+        get_salary_slip_pdf_etag,
+    )
 
-    default_print_format = frappe.get_meta("Salary Slip").default_print_format or "Standard"
+    doc = frappe.get_doc("Salary Slip", name)
+    frappe.has_permission("Salary Slip", "print", doc=doc, throw=True)
 
-    try:
-        download_pdf("Salary Slip", name, format=default_print_format)
-    except Exception:
-        frappe.throw(_("Failed to download Salary Slip PDF"))
+    etag = get_salary_slip_pdf_etag(doc)
+    if etag and frappe.request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(get_or_store_salary_slip_pdf(doc), mimetype="application/pdf")
+        response.headers.add("Content-Disposition", "attachment", filename=f"{name}.pdf")
 
-    base64content = base64.b64encode(frappe.local.response.filecontent)
-    content_type = frappe.local.response.type
+    if etag:
+        response.set_etag(etag)
+        # revalidated on every download, the stored file is named after the slip and print format
+        response.headers["Cache-Control"] = "private, no-cache"
+    else:
+        # drafts are rendered again on every change
+        response.headers["Cache-Control"] = "no-store"
 
-    return f"data:{content_type};base64," + base64content.decode("utf-8")
+    return response
 
 
 # Workflow
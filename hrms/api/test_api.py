@@ -0,0 +1,281 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import base64
+import io
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import (
+    add_days,
+    add_to_date,
+    get_datetime,
+    get_year_ending,
+    get_year_start,
+    getdate,
+    now_datetime,
+)
+
+from hrms.api import (
+    EMPLOYEE_DIRECTORY_SYNC_MARGIN,
+    get_employee_directory,
+    get_leave_balance_map,
+    make_leave_balance_map,
+    upload_base64_file,
+)
+from hrms.hr.doctype.leave_application.test_leave_application import make_allocation_record
+from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import (
+    get_leave_balance_cache_key,
+    process_expired_allocation,
+)
+from hrms.payroll.doctype.salary_slip.test_salary_slip import make_holiday_list
+from hrms.utils.image import normalise_image, normalise_uploaded_image
+from basic.setup.doctype.employee.test_employee import make_employee
+
+
+class TestEmployeeDirectory(FrappeTestCase):
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_delta_sync_converges_to_full_fetch(self):
+        employee = make_employee("test_directory1@example.com", company="_Test Company")
+        leaving_employee = make_employee("test_directory2@example.com", company="_Test Company")
+
+        directory = get_employee_directory()
+        client = {e["name"]: e for e in directory["employees"]}
+        self.assertIn(leaving_employee, client)
+        # changes committed late are synced again
+        self.assertLessEqual(
+            get_datetime(directory["modified"]),
+            add_to_date(now_datetime(), seconds=-EMPLOYEE_DIRECTORY_SYNC_MARGIN),
+        )
+
+        # unchanged directory is not sent again
+        self.assertTrue(get_employee_directory(etag=directory["etag"])["unchanged"])
+
+        doc = frappe.get_doc("Employee", employee)
+        doc.first_name = "Renamed"
+        doc.save()
+
+        doc = frappe.get_doc("Employee", leaving_employee)
+        doc.status = "Inactive"
+        doc.save()
+
+        new_employee = make_employee("test_directory3@example.com", company="_Test Company")
+
+        delta = get_employee_directory(since=directory["modified"])
+        self.assertIn(leaving_employee, delta["removed"])
+        self.assertIn(new_employee, [e["name"] for e in delta["employees"]])
+
+        for name in delta["removed"]:
+            client.pop(name, None)
+        for e in delta["employees"]:
+            client[e["name"]] = e
+
+        full = get_employee_directory()
+        self.assertNotEqual(full["etag"], directory["etag"])
+        self.assertEqual(delta["etag"], full["etag"])
+        self.assertEqual(client, {e["name"]: e for e in full["employees"]})
+
+        # applying the same delta again is harmless
+        delta = get_employee_directory(since=delta["modified"])
+        for name in delta["removed"]:
+            client.pop(name, None)
+        for e in delta["employees"]:
+            client[e["name"]] = e
+        self.assertEqual(client, {e["name"]: e for e in full["employees"]})
+
+
+class TestLeaveBalanceCache(FrappeTestCase):
+    def setUp(self):
+        for dt in ["Leave Application", "Leave Allocation", "Leave Ledger Entry"]:
+            frappe.db.delete(dt)
+
+        if not frappe.db.exists("Leave Type", "_Test Leave Type"):
+            frappe.get_doc(
+                dict(
+                    leave_type_name="_Test Leave Type", doctype="Leave Type", include_holiday=True
+                )
+            ).insert()
+
+        frappe.db.set_single_value(
+            "HR Settings", "leave_approver_mandatory_in_leave_application", 0
+        )
+        self.date = getdate()
+        self.employee = make_employee("test_leave_balance_cache@example.com", "_Test Company")
+        holiday_list = make_holiday_list(
+            "_Test Leave Balance Cache",
+            from_date=get_year_start(self.date),
+            to_date=get_year_ending(self.date),
+            add_weekly_offs=False,
+        )
+        frappe.db.set_value("Employee", self.employee, "holiday_list", holiday_list)
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_cached_leave_balance_across_ledger_events(self):
+        self.assert_cached_balance_matches()
+
+        # allocation
+        make_allocation_record(
+            employee=self.employee,
+            from_date=add_days(self.date, -60),
+            to_date=add_days(self.date, 60),
+            leaves=20,
+        )
+        self.assert_cached_balance_matches()
+
+        # application
+        application = frappe.get_doc(
+            dict(
+                doctype="Leave Application",
+                employee=self.employee,
+                leave_type="_Test Leave Type",
+                from_date=self.date,
+                to_date=add_days(self.date, 1),
+                company="_Test Company",
+                status="Approved",
+            )
+        )
+        application.submit()
+        self.assert_cached_balance_matches()
+
+        # encashment
+        encashment = frappe.get_doc(
+            dict(
+                doctype="Leave Ledger Entry",
+                employee=self.employee,
+                leave_type="_Test Leave Type",
+                transaction_type="Leave Encashment",
+                transaction_name="_Test Leave Encashment",
+                leaves=-3,
+                from_date=self.date,
+                to_date=self.date,
+            )
+        )
+        encashment.flags.ignore_links = True
+        encashment.submit()
+        self.assert_cached_balance_matches()
+
+        # expiry
+        make_allocation_record(
+            employee=self.employee,
+            from_date=add_days(self.date, -120),
+            to_date=add_days(self.date, -61),
+            leaves=5,
+        )
+        self.assert_cached_balance_matches()
+        process_expired_allocation()
+        self.assert_cached_balance_matches()
+
+        # cancellation
+        application.cancel()
+        self.assert_cached_balance_matches()
+
+    def assert_cached_balance_matches(self):
+        # invalidated by the ledger change preceding it
+        cache_key = get_leave_balance_cache_key(self.employee)
+        self.assertIsNone(frappe.cache().hget(cache_key, str(self.date)))
+
+        balance = get_leave_balance_map(self.employee)
+        self.assertEqual(balance, make_leave_balance_map(self.employee, self.date))
+
+        with patch("hrms.api.make_leave_balance_map") as compute_balance:
+            self.assertEqual(get_leave_balance_map(self.employee), balance)
+            compute_balance.assert_not_called()
+
+
+# seconds the upload request may take for a 12 megapixel photo
+UPLOAD_LATENCY_BUDGET = 1
+EXIF_ORIENTATION = 0x0112
+
+
+class TestUploadBase64File(FrappeTestCase):
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_upload_stores_original_and_defers_normalisation(self):
+        content = make_jpeg(4000, 3000, orientation=6)
+
+        with patch("hrms.utils.image.frappe.enqueue") as enqueue, patch(
+            "PIL.Image.open", side_effect=AssertionError("image decoded in the request")
+        ):
+            start = time.monotonic()
+            file = upload_base64_file(base64.b64encode(content).decode(), "receipt.jpg")
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, UPLOAD_LATENCY_BUDGET)
+        self.assertEqual(file.get_content(), content)
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.kwargs["file"], file.name)
+
+        normalise_uploaded_image(file.name)
+        file.reload()
+        self.assertEqual(file.file_size, len(file.get_content()))
+
+        from PIL import Image
+
+        with Image.open(io.BytesIO(file.get_content())) as image:
+            # rotated clockwise, the marked top left corner is now the top right one
+            self.assertEqual(image.size, (3000, 4000))
+            self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+            red, green, _ = image.convert("RGB").getpixel((2950, 50))
+            self.assertGreater(red, 200)
+            self.assertLess(green, 80)
+
+    def test_shared_upload_is_normalised_once(self):
+        content = make_jpeg(400, 300, orientation=6)
+        encoded_content = base64.b64encode(content).decode()
+
+        with patch("hrms.utils.image.frappe.enqueue"):
+            file = upload_base64_file(encoded_content, "receipt.jpg")
+            duplicate = upload_base64_file(encoded_content, "receipt_copy.jpg")
+
+        # deduplicated by the content hash
+        self.assertEqual(duplicate.file_url, file.file_url)
+        normalise_uploaded_image(duplicate.name)
+        normalised_content = frappe.get_doc("File", file.name).get_content()
+        self.assertNotEqual(normalised_content, content)
+
+        with patch("hrms.utils.image.normalise_image") as normalise:
+            normalise_uploaded_image(file.name)
+            normalise.assert_not_called()
+
+        for name in (file.name, duplicate.name):
+            # loaded again, the uploaded docs still hold the original content
+            doc = frappe.get_doc("File", name)
+            self.assertEqual(doc.get_content(), normalised_content)
+            self.assertEqual(doc.file_size, len(normalised_content))
+
+    def test_normalise_image_limits(self):
+        from PIL import Image
+
+        content = make_jpeg(4000, 3000, orientation=6)
+
+        with Image.open(io.BytesIO(normalise_image(content, max_dimension=1000))) as image:
+            self.assertEqual(image.size, (750, 1000))
+
+        # too large to decode within the memory limit, left as is
+        self.assertIsNone(normalise_image(content, memory_limit=1024 * 1024))
+        # no orientation to fix
+        self.assertIsNone(normalise_image(make_jpeg(400, 300)))
+
+
+def make_jpeg(width, height, orientation=None):
+    """Returns a white JPEG with a red top left corner, tagged with the EXIF `orientation`"""
+    from PIL import Image
+
+    image = Image.new("RGB", (width, height), "white")
+    image.paste((255, 0, 0), (0, 0, 100, 100))
+
+    options = {}
+    if orientation:
+        options["exif"] = exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+
+    content = io.BytesIO()
+    image.save(content, format="JPEG", **options)
+    return content.getvalue()
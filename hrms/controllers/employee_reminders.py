@@ -1,13 +1,17 @@
 # Copyright (c) 2021, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
+from collections import defaultdict
+
 from basic.setup.doctype.employee.employee import get_all_employee_emails, get_employee_email
 
 import frappe
 from frappe import _
+from frappe.query_builder.functions import Coalesce, NullIf
 from frappe.utils import add_days, add_months, comma_sep, getdate, today
+from frappe.utils.caching import request_cache
 
-from hrms.hr.utils import get_holidays_for_employee
+from hrms.overrides.employee_master import EMPLOYEE_EVENT_DAY_KEYS, get_month_day_key
 
 
 # -----------------
@@ -34,6 +38,9 @@ def send_reminders_in_advance_monthly():
 def send_advance_holiday_reminders(frequency):
     """Send Holiday Reminders in Advance to Employees
     `frequency` (str): 'Weekly' or 'Monthly'
+
+    Employees sharing a holiday list get identical content, so the upcoming
+    holidays are computed once per holiday list and one bulk email is queued per group.
     """
     if frequency == "Weekly":
         start_date = getdate()
@@ -45,35 +52,97 @@ def send_advance_holiday_reminders(frequency):
     else:
         return
 
-    employees = frappe.db.get_all("Employee", filters={"status": "Active"}, pluck="name")
+    employees_by_holiday_list = get_active_employees_by_holiday_list()
+    if not employees_by_holiday_list:
+        return
+
+    holidays_by_holiday_list = get_upcoming_holidays_by_holiday_list(
+        list(employees_by_holiday_list), start_date, end_date
+    )
+    sender_email = get_sender_email()
+
+    for holiday_list, employees in employees_by_holiday_list.items():
+        send_holidays_reminder_in_advance(
+            employees, holidays_by_holiday_list.get(holiday_list), frequency, sender_email
+        )
+
+
+def get_active_employees_by_holiday_list() -> dict[str, list[dict]]:
+    """Returns active employees grouped by their effective holiday list
+    (employee's holiday list, else the company default). Employees without one are skipped."""
+    Employee = frappe.qb.DocType("Employee")
+    Company = frappe.qb.DocType("Company")
+
+    employees = (
+        frappe.qb.from_(Employee)
+        .left_join(Company)
+        .on(Employee.company == Company.name)
+        .select(
+            Employee.name,
+            Employee.user_id,
+            Employee.personal_email,
+            Employee.company_email,
+            Coalesce(NullIf(Employee.holiday_list, ""), Company.default_holiday_list).as_(
+                "holiday_list"
+            ),
+        )
+        .where(Employee.status == "Active")
+    ).run(as_dict=True)
+
+    grouped_employees = defaultdict(list)
     for employee in employees:
-        holidays = get_holidays_for_employee(
-            employee, start_date, end_date, only_non_weekly=True, raise_exception=False
+        if employee.holiday_list:
+            grouped_employees[employee.holiday_list].append(employee)
+
+    return grouped_employees
+
+
+def get_upcoming_holidays_by_holiday_list(
+    holiday_lists: list[str], start_date, end_date
+) -> dict[str, list[dict]]:
+    """Returns non-weekly holidays between `start_date` and `end_date` grouped by holiday list"""
+    Holiday = frappe.qb.DocType("Holiday")
+
+    holidays = (
+        frappe.qb.from_(Holiday)
+        .select(Holiday.parent, Holiday.holiday_date, Holiday.description)
+        .where(
+            (Holiday.parent.isin(holiday_lists))
+            & (Holiday.holiday_date.between(start_date, end_date))
+            & (Holiday.weekly_off == 0)
         )
+        .orderby(Holiday.holiday_date)
+    ).run(as_dict=True)
 
-        send_holidays_reminder_in_advance(employee, holidays)
+    grouped_holidays = defaultdict(list)
+    for holiday in holidays:
+        grouped_holidays[holiday.pop("parent")].append(holiday)
 
+    return grouped_holidays
 
-def send_holidays_reminder_in_advance(employee, holidays):
+
+def send_holidays_reminder_in_advance(employees, holidays, frequency=None, sender_email=None):
+    """Queues one reminder email for all `employees` (list of dicts with email fields)
+    sharing the same `holidays`"""
     if not holidays:
         return
 
-    employee_doc = frappe.get_doc("Employee", employee)
-    employee_email = get_employee_email(employee_doc)
-    frequency = frappe.db.get_single_value("HR Settings", "frequency")
-    sender_email = get_sender_email()
+    recipients = list({get_employee_email(employee) for employee in employees} - {None, ""})
+    if not recipients:
+        return
+
+    frequency = frequency or frappe.db.get_single_value("HR Settings", "frequency")
+    sender_email = sender_email or get_sender_email()
     email_header = (
         _("Holidays this Month.") if frequency == "Monthly" else _("Holidays this Week.")
     )
     frappe.sendmail(
         sender=sender_email,
-        recipients=[employee_email],
+        recipients=recipients,
         subject=_("Upcoming Holidays Reminder"),
         template="holiday_reminder",
         args=dict(
-            reminder_text=_(
-                "Hey {}! This email is to remind you about the upcoming holidays."
-            ).format(employee_doc.get("first_name")),
+            reminder_text=_("Hey! This email is to remind you about the upcoming holidays."),
             message=_("Below is the list of upcoming holidays for you:"),
             advance_holiday_reminder=True,
             holidays=holidays,
@@ -97,7 +166,7 @@ def send_birthday_reminders():
     employees_born_today = get_employees_who_are_born_today()
 
     for company, birthday_persons in employees_born_today.items():
-        employee_emails = get_all_employee_emails(company)
+        employee_emails = get_company_employee_emails(company)
         birthday_person_emails = [get_employee_email(doc) for doc in birthday_persons]
         recipients = list(set(employee_emails) - set(birthday_person_emails))
 
@@ -158,8 +227,6 @@ def get_employees_having_an_event_today(event_type):
     & group them based on their company. `event_type`
     can be `birthday` or `work_anniversary`"""
 
-    from collections import defaultdict
-
     # Set column based on event type
     if event_type == "birthday":
         condition_column = "date_of_birth"
@@ -168,36 +235,28 @@ def get_employees_having_an_event_today(event_type):
     else:
         return
 
-    employees_born_today = frappe.db.multisql(
-        {
-            "mariadb": f"""
-			SELECT `personal_email`, `company`, `company_email`, `user_id`, `employee_name` AS 'name', `image`, `date_of_joining`
-			FROM `tabEmployee`
-			WHERE
-				DAY({condition_column}) = DAY(%(today)s)
-			AND
-				MONTH({condition_column}) = MONTH(%(today)s)
-			AND
-				YEAR({condition_column}) < YEAR(%(today)s)
-			AND
-				`status` = 'Active'
-		""",
-            "postgres": f"""
-			SELECT "personal_email", "company", "company_email", "user_id", "employee_name" AS 'name', "image"
-			FROM "tabEmployee"
-			WHERE
-				DATE_PART('day', {condition_column}) = date_part('day', %(today)s)
-			AND
-				DATE_PART('month', {condition_column}) = date_part('month', %(today)s)
-			AND
-				DATE_PART('year', {condition_column}) < date_part('year', %(today)s)
-			AND
-				"status" = 'Active'
-		""",
-        },
-        dict(today=today(), condition_column=condition_column),
-        as_dict=1,
-    )
+    # filter on the indexed month-day key instead of DAY() / MONTH() over the date column
+    key_column = EMPLOYEE_EVENT_DAY_KEYS[condition_column]
+    current_date = getdate(today())
+
+    Employee = frappe.qb.DocType("Employee")
+    employees_born_today = (
+        frappe.qb.from_(Employee)
+        .select(
+            Employee.personal_email,
+            Employee.company,
+            Employee.company_email,
+            Employee.user_id,
+            Employee.employee_name.as_("name"),
+            Employee.image,
+            Employee.date_of_joining,
+        )
+        .where(
+            (Employee[key_column] == get_month_day_key(current_date))
+            & (Employee[condition_column] < current_date.replace(month=1, day=1))
+            & (Employee.status == "Active")
+        )
+    ).run(as_dict=True)
 
     grouped_employees = defaultdict(lambda: [])
 
@@ -207,6 +266,13 @@ def get_employees_having_an_event_today(event_type):
     return grouped_employees
 
 
+@request_cache
+def get_company_employee_emails(company: str) -> list[str]:
+    """Employee emails of a company, cached for the current job so that
+    birthday and anniversary reminders don't refetch them per event"""
+    return get_all_employee_emails(company)
+
+
 # --------------------------
 # WORK ANNIVERSARY REMINDERS
 # --------------------------
@@ -224,7 +290,7 @@ def send_work_anniversary_reminders():
     message += _("Everyone, let’s congratulate them on their work anniversary!")
 
     for company, anniversary_persons in employees_joined_today.items():
-        employee_emails = get_all_employee_emails(company)
+        employee_emails = get_company_employee_emails(company)
         anniversary_person_emails = [get_employee_email(doc) for doc in anniversary_persons]
         recipients = list(set(employee_emails) - set(anniversary_person_emails))
 
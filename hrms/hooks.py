@@ -159,14 +159,21 @@ doc_events = {
     },
     "Timesheet": {"validate": "hrms.hr.utils.validate_active_employee"},
     "Employee": {
-        "validate": "hrms.overrides.employee_master.validate_onboarding_process",
+        "validate": [
+            "hrms.overrides.employee_master.validate_onboarding_process",
+            "hrms.overrides.employee_master.set_event_day_keys",
+        ],
         "on_update": [
             "hrms.overrides.employee_master.update_approver_role",
             "hrms.overrides.employee_master.publish_update",
+            "hrms.hr.page.organizational_chart.organizational_chart.clear_org_chart_cache",
         ],
         "after_insert": "hrms.overrides.employee_master.update_job_applicant_and_offer",
         "on_trash": "hrms.overrides.employee_master.update_employee_transfer",
-        "after_delete": "hrms.overrides.employee_master.publish_update",
+        "after_delete": [
+            "hrms.overrides.employee_master.publish_update",
+            "hrms.hr.page.organizational_chart.organizational_chart.clear_org_chart_cache",
+        ],
     },
     # "Project": {
     #     "validate": "basic.controllers.employee_boarding_controller.update_employee_boarding_status"
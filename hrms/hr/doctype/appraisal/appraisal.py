@@ -20,7 +20,8 @@ class Appraisal(Document):
 
 		validate_active_employee(self.employee)
 		validate_active_appraisal_cycle(self.appraisal_cycle)
-		self.validate_duplicate()
+		if not self.flags.ignore_duplicate_check:
+			self.validate_duplicate()
 
 		self.set_goal_score()
 		self.calculate_self_appraisal_score()
@@ -95,12 +96,18 @@ class Appraisal(Document):
 		if not self.appraisal_template:
 			return
 
+		template = frappe.get_doc("Appraisal Template", self.appraisal_template)
+		return self.set_kras_and_rating_criteria_from_template(template)
+
+	def set_kras_and_rating_criteria_from_template(self, template):
+		"""Sets KRAs and rating criteria from an already loaded Appraisal Template"""
+		if not template:
+			return
+
 		self.set("appraisal_kra", [])
 		self.set("self_ratings", [])
 		self.set("goals", [])
 
-		template = frappe.get_doc("Appraisal Template", self.appraisal_template)
-
 		for entry in template.goals:
 			table_name = "goals" if self.rate_goals_manually else "appraisal_kra"
 
@@ -6,6 +6,9 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.query_builder.functions import Count
 from frappe.query_builder.terms import SubQuery
+from frappe.utils import create_batch
+
+APPRAISAL_CHUNK_SIZE = 500
 
 
 class AppraisalCycle(Document):
@@ -118,8 +121,9 @@ class AppraisalCycle(Document):
 			frappe.enqueue(
 				create_appraisals_for_cycle,
 				queue="long",
-				timeout=600,
-				appraisal_cycle=self,
+				timeout=max(600, len(self.appraisees) // APPRAISAL_CHUNK_SIZE * 300),
+				appraisal_cycle=self.name,
+				commit_per_chunk=True,
 			)
 			frappe.msgprint(
 				_("Appraisal creation is queued. It may take a few minutes."),
@@ -161,38 +165,94 @@ class AppraisalCycle(Document):
 		self.save()
 
 
-def create_appraisals_for_cycle(appraisal_cycle: AppraisalCycle, publish_progress: bool = False):
+def create_appraisals_for_cycle(
+	appraisal_cycle: AppraisalCycle | str,
+	publish_progress: bool = False,
+	commit_per_chunk: bool = False,
+	chunk_size: int = APPRAISAL_CHUNK_SIZE,
+):
 	"""
 	Creates appraisals for employees in the appraisee list of appraisal cycle,
-	if not already created
+	if not already created.
+
+	Appraisees are processed in chunks. With `commit_per_chunk`, every chunk is committed
+	so a job that fails midway can be re-run and resumes with the remaining appraisees
 	"""
-	count = 0
-
-	for employee in appraisal_cycle.appraisees:
-		try:
-			appraisal = frappe.get_doc(
-				{
-					"doctype": "Appraisal",
-					"appraisal_template": employee.appraisal_template,
-					"employee": employee.employee,
-					"appraisal_cycle": appraisal_cycle.name,
-				}
-			)
+	if isinstance(appraisal_cycle, str):
+		appraisal_cycle = frappe.get_doc("Appraisal Cycle", appraisal_cycle)
+
+	total = len(appraisal_cycle.appraisees)
+	existing = get_employees_with_appraisals(appraisal_cycle)
+	pending = [d for d in appraisal_cycle.appraisees if d.employee not in existing]
+	if not pending:
+		return
+
+	templates = {
+		template: frappe.get_doc("Appraisal Template", template)
+		for template in {d.appraisal_template for d in pending if d.appraisal_template}
+	}
+	rate_goals_manually = 1 if appraisal_cycle.kra_evaluation_method == "Manual Rating" else 0
+	count = total - len(pending)
+
+	for chunk in create_batch(pending, chunk_size):
+		for employee in chunk:
+			try:
+				appraisal = frappe.get_doc(
+					{
+						"doctype": "Appraisal",
+						"appraisal_template": employee.appraisal_template,
+						"employee": employee.employee,
+						"appraisal_cycle": appraisal_cycle.name,
+						"rate_goals_manually": rate_goals_manually,
+					}
+				)
+				appraisal.set_kras_and_rating_criteria_from_template(
+					templates.get(employee.appraisal_template)
+				)
+				# duplicates for the whole cycle are already excluded above
+				appraisal.flags.ignore_duplicate_check = True
+				appraisal.insert()
+			except frappe.DuplicateEntryError:
+				# already exists
+				pass
+
+		if commit_per_chunk:
+			frappe.db.commit()  # nosemgrep
+
+		count += len(chunk)
+		frappe.publish_progress(
+			count * 100 / total,
+			title=_("Creating Appraisals") + "...",
+			doctype=None if publish_progress else appraisal_cycle.doctype,
+			docname=None if publish_progress else appraisal_cycle.name,
+		)
 
-			appraisal.rate_goals_manually = (
-				1 if appraisal_cycle.kra_evaluation_method == "Manual Rating" else 0
-			)
-			appraisal.set_kras_and_rating_criteria()
-			appraisal.insert()
 
-			if publish_progress:
-				count += 1
-				frappe.publish_progress(
-					count * 100 / len(appraisal_cycle.appraisees), title=_("Creating Appraisals") + "..."
+def get_employees_with_appraisals(appraisal_cycle: AppraisalCycle) -> set[str]:
+	"""Returns appraisees who already have an appraisal in this cycle or an overlapping period"""
+	employees = [d.employee for d in appraisal_cycle.appraisees]
+	if not employees:
+		return set()
+
+	Appraisal = frappe.qb.DocType("Appraisal")
+	return set(
+		(
+			frappe.qb.from_(Appraisal)
+			.select(Appraisal.employee)
+			.distinct()
+			.where(
+				(Appraisal.employee.isin(employees))
+				& (Appraisal.docstatus != 2)
+				& (
+					(Appraisal.appraisal_cycle == appraisal_cycle.name)
+					| (
+						(Appraisal.start_date <= appraisal_cycle.end_date)
+						& (Appraisal.end_date >= appraisal_cycle.start_date)
+					)
 				)
-		except frappe.DuplicateEntryError:
-			# already exists
-			pass
+			)
+		).run(pluck=True)
+	)
 
 
 def validate_active_appraisal_cycle(appraisal_cycle: str) -> None:
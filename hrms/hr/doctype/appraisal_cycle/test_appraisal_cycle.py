@@ -61,6 +61,30 @@ class TestAppraisalCycle(FrappeTestCase):
                 self.template.rating_criteria[i].per_weightage,
             )
 
+    def test_create_appraisals_resumes_for_pending_appraisees(self):
+        from hrms.hr.doctype.appraisal_cycle.appraisal_cycle import create_appraisals_for_cycle
+
+        cycle = create_appraisal_cycle(designation="Engineer")
+        cycle.create_appraisals()
+
+        appraisals = frappe.db.get_all("Appraisal", filters={"appraisal_cycle": cycle.name})
+        self.assertEqual(len(appraisals), 1)
+
+        # re-running skips appraisees who already have an appraisal
+        create_appraisals_for_cycle(cycle.name, chunk_size=1)
+        self.assertEqual(
+            frappe.db.count("Appraisal", {"appraisal_cycle": cycle.name, "docstatus": ("!=", 2)}), 1
+        )
+
+        # and creates the ones left out, e.g. after a failed job
+        frappe.delete_doc("Appraisal", appraisals[0].name, force=True)
+        create_appraisals_for_cycle(cycle.name, chunk_size=1)
+
+        appraisal = frappe.get_last_doc("Appraisal", filters={"appraisal_cycle": cycle.name})
+        self.assertEqual(appraisal.employee, self.employee1)
+        self.assertEqual(len(appraisal.appraisal_kra), len(self.template.goals))
+        self.assertEqual(len(appraisal.self_ratings), len(self.template.rating_criteria))
+
 
 def create_appraisal_cycle(**args):
     args = frappe._dict(args)
@@ -259,24 +259,29 @@ def get_events(start, end, filters=None):
 
 
 def add_attendance(events, start, end, conditions=None):
-    query = """select name, attendance_date, status
+    query = """select name, attendance_date, status, docstatus
 		from `tabAttendance` where
 		attendance_date between %(from_date)s and %(to_date)s
 		and docstatus < 2"""
     if conditions:
         query += conditions
 
+    seen = {(e["doctype"], e["name"]) for e in events}
     for d in frappe.db.sql(query, {"from_date": start, "to_date": end}, as_dict=True):
-        e = {
-            "name": d.name,
-            "doctype": "Attendance",
-            "start": d.attendance_date,
-            "end": d.attendance_date,
-            "title": cstr(d.status),
-            "docstatus": d.docstatus,
-        }
-        if e not in events:
-            events.append(e)
+        if ("Attendance", d.name) in seen:
+            continue
+
+        seen.add(("Attendance", d.name))
+        events.append(
+            {
+                "name": d.name,
+                "doctype": "Attendance",
+                "start": d.attendance_date,
+                "end": d.attendance_date,
+                "title": cstr(d.status),
+                "docstatus": d.docstatus,
+            }
+        )
 
 
 def mark_attendance(
@@ -1,10 +1,13 @@
 # Copyright (c) 2022, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+from collections import defaultdict
+
 from pypika import CustomFunction
 
 import frappe
 from frappe import _
+from frappe.query_builder import Criterion
 from frappe.query_builder.functions import Avg
 from frappe.utils import cint, flt
 from frappe.utils.nestedset import NestedSet
@@ -81,14 +84,7 @@ class Goal(NestedSet):
 			frappe.throw(_("Goal progress percentage cannot be more than 100."))
 
 	def set_status(self, status=None):
-		if self.status in ["Archived", "Closed"]:
-			return
-		if flt(self.progress) == 0:
-			self.status = "Pending"
-		elif flt(self.progress) == 100:
-			self.status = "Completed"
-		elif flt(self.progress) < 100:
-			self.status = "In Progress"
+		self.status = get_status_for_progress(self.status, self.progress)
 
 	def update_kra_in_child_goals(self, doc_before_save):
 		"""Aligns children's KRA to parent goal's KRA if parent goal's KRA is changed"""
@@ -206,6 +202,149 @@ def update_progress(progress: float, goal: str) -> None:
 	return goal
 
 
+@frappe.whitelist()
+def update_progress_in_bulk(goals: str | list[dict]) -> list[str]:
+	"""Updates progress of multiple goals at once.
+
+	`goals`: list of dicts with `goal` and `progress`
+
+	Instead of saving every ancestor recursively, ancestor progress is recomputed bottom-up
+	using the nested set ranges and written with a single bulk update.
+	Goal score of each affected appraisal is refreshed once.
+	"""
+	goals = frappe.parse_json(goals)
+	progress_by_goal = {d.get("goal"): flt(d.get("progress")) for d in goals}
+	if not progress_by_goal:
+		return []
+
+	for goal, progress in progress_by_goal.items():
+		frappe.has_permission("Goal", "write", doc=goal, throw=True)
+		if progress > 100:
+			frappe.throw(_("Goal progress percentage cannot be more than 100."))
+
+	Goal = frappe.qb.DocType("Goal")
+	fields = (
+		Goal.name,
+		Goal.lft,
+		Goal.rgt,
+		Goal.employee,
+		Goal.appraisal_cycle,
+		Goal.status,
+		Goal.progress,
+	)
+
+	updated_goals = (
+		frappe.qb.from_(Goal).select(*fields).where(Goal.name.isin(list(progress_by_goal)))
+	).run(as_dict=True)
+	if not updated_goals:
+		return []
+
+	for appraisal_cycle in {d.appraisal_cycle for d in updated_goals if d.appraisal_cycle}:
+		validate_active_appraisal_cycle(appraisal_cycle)
+	for employee in {d.employee for d in updated_goals}:
+		validate_active_employee(employee)
+
+	ancestors = (
+		frappe.qb.from_(Goal)
+		.select(*fields)
+		.where(Criterion.any([(Goal.lft < d.lft) & (Goal.rgt > d.rgt) for d in updated_goals]))
+	).run(as_dict=True)
+
+	goal_updates = {}
+	for goal in updated_goals:
+		goal_updates[goal.name] = {
+			"progress": progress_by_goal[goal.name],
+			"status": get_status_for_progress(goal.status, progress_by_goal[goal.name]),
+		}
+
+	if ancestors:
+		progress_by_goal.update(
+			get_ancestor_progress(ancestors, progress_by_goal, frappe.get_precision("Goal", "progress"))
+		)
+
+		for ancestor in ancestors:
+			progress = progress_by_goal[ancestor.name]
+			status = get_status_for_progress(ancestor.status, progress)
+			if progress != flt(ancestor.progress) or status != ancestor.status:
+				goal_updates[ancestor.name] = {"progress": progress, "status": status}
+
+	frappe.db.bulk_update("Goal", goal_updates)
+
+	update_goal_progress_in_appraisals(
+		{(d.employee, d.appraisal_cycle) for d in updated_goals + ancestors if d.appraisal_cycle}
+	)
+
+	return list(goal_updates)
+
+
+def get_ancestor_progress(
+	ancestors: list[dict], progress_by_goal: dict[str, float], precision: int
+) -> dict[str, float]:
+	"""Returns the average progress of each ancestor's children (excluding archived goals),
+	computed bottom-up so that each ancestor sees the new progress of its child goals"""
+	Goal = frappe.qb.DocType("Goal")
+	children = (
+		frappe.qb.from_(Goal)
+		.select(Goal.name, Goal.parent_goal, Goal.employee, Goal.progress)
+		.where(
+			(Goal.parent_goal.isin([d.name for d in ancestors]))
+			# archived goals should not contribute to progress
+			& (Goal.status != "Archived")
+		)
+	).run(as_dict=True)
+
+	children_by_parent = defaultdict(list)
+	for child in children:
+		children_by_parent[child.parent_goal].append(child)
+
+	progress_by_goal = progress_by_goal.copy()
+	ancestor_progress = {}
+
+	# descendants always have a greater lft than their ancestors
+	for ancestor in sorted(ancestors, key=lambda d: d.lft, reverse=True):
+		progress = [
+			flt(progress_by_goal.get(child.name, child.progress))
+			for child in children_by_parent[ancestor.name]
+			if child.employee == ancestor.employee
+		]
+		ancestor_progress[ancestor.name] = progress_by_goal[ancestor.name] = (
+			flt(sum(progress) / len(progress), precision) if progress else 0.0
+		)
+
+	return ancestor_progress
+
+
+def update_goal_progress_in_appraisals(employee_cycles: set[tuple[str, str]]) -> None:
+	if not employee_cycles:
+		return
+
+	appraisals = frappe.get_all(
+		"Appraisal",
+		filters={
+			"employee": ("in", list({employee for employee, _cycle in employee_cycles})),
+			"appraisal_cycle": ("in", list({cycle for _employee, cycle in employee_cycles})),
+		},
+		fields=["name", "employee", "appraisal_cycle"],
+	)
+
+	for appraisal in appraisals:
+		if (appraisal.employee, appraisal.appraisal_cycle) in employee_cycles:
+			frappe.get_doc("Appraisal", appraisal.name).set_goal_score(update=True)
+
+
+def get_status_for_progress(status: str, progress: float) -> str:
+	if status in ["Archived", "Closed"]:
+		return status
+	if flt(progress) == 0:
+		return "Pending"
+	elif flt(progress) == 100:
+		return "Completed"
+	elif flt(progress) < 100:
+		return "In Progress"
+
+	return status
+
+
 @frappe.whitelist()
 def update_status(status: str, goals: str | list) -> None:
 	if isinstance(goals, str):
@@ -5,7 +5,7 @@ import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from hrms.hr.doctype.appraisal_template.test_appraisal_template import create_kras
-from hrms.hr.doctype.goal.goal import get_children, update_status
+from hrms.hr.doctype.goal.goal import get_children, update_progress_in_bulk, update_status
 from basic.setup.doctype.employee.test_employee import make_employee
 
 
@@ -98,6 +98,48 @@ class TestGoal(FrappeTestCase):
         parent_goal.reload()
         self.assertEqual(parent_goal.progress, 12.5)
 
+    def test_update_progress_in_bulk(self):
+        """
+        parent (43.75%)
+        |_ child1 (50%)
+        |_ child2 (37.5%)
+                |_ child3 (75%)
+                |_ child4
+                |_ child5 (archived)
+        """
+        parent_goal = create_goal(self.employee1, "Development", 1)
+        child_goal1 = create_goal(self.employee1, parent_goal=parent_goal.name)
+
+        child_goal2 = create_goal(self.employee1, "Development", 1, parent_goal.name)
+        child_goal3 = create_goal(self.employee1, parent_goal=child_goal2.name)
+        create_goal(self.employee1, parent_goal=child_goal2.name)
+        child_goal5 = create_goal(self.employee1, parent_goal=child_goal2.name)
+        update_status("Archived", [child_goal5.name])
+
+        update_progress_in_bulk(
+            [
+                {"goal": child_goal1.name, "progress": 50},
+                {"goal": child_goal3.name, "progress": 75},
+            ]
+        )
+
+        child_goal1.reload()
+        self.assertEqual(child_goal1.progress, 50)
+        self.assertEqual(child_goal1.status, "In Progress")
+
+        child_goal2.reload()
+        self.assertEqual(child_goal2.progress, 37.5)
+        self.assertEqual(child_goal2.status, "In Progress")
+
+        parent_goal.reload()
+        self.assertEqual(parent_goal.progress, 43.75)
+
+        # same result as saving goals one by one
+        child_goal1.progress = 100
+        child_goal1.save()
+        parent_goal.reload()
+        self.assertEqual(parent_goal.progress, 68.75)
+
     def test_update_old_parent_progress(self):
         """
         BEFORE
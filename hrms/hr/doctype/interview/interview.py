@@ -232,36 +232,24 @@ def send_interview_reminder():
 		hours=remind_before.hour, minutes=remind_before.minute, seconds=remind_before.second
 	)
 
-	interviews = frappe.get_all(
-		"Interview",
-		filters={
-			"scheduled_on": ["between", (datetime.datetime.now(), reminder_date_time)],
-			"status": "Pending",
-			"reminded": 0,
-			"docstatus": ["!=", 2],
-		},
+	Interview = frappe.qb.DocType("Interview")
+	interviews = get_interviews_with_recipients(
+		(Interview.scheduled_on[datetime.datetime.now() : reminder_date_time])
+		& (Interview.status == "Pending")
+		& (Interview.reminded == 0)
+		& (Interview.docstatus != 2)
 	)
+	if not interviews:
+		return
 
 	interview_template = frappe.get_doc(
 		"Email Template", reminder_settings.interview_reminder_template
 	)
+	send_interview_emails(interviews, interview_template, reminder_settings.hiring_sender_email)
 
-	for d in interviews:
-		doc = frappe.get_doc("Interview", d.name)
-		context = doc.as_dict()
-		message = frappe.render_template(interview_template.response, context)
-		recipients = get_recipients(doc.name)
-
-		frappe.sendmail(
-			sender=reminder_settings.hiring_sender_email,
-			recipients=recipients,
-			subject=interview_template.subject,
-			message=message,
-			reference_doctype=doc.doctype,
-			reference_name=doc.name,
-		)
-
-		doc.db_set("reminded", 1)
+	frappe.qb.update(Interview).set(Interview.reminded, 1).where(
+		Interview.name.isin([d.name for d in interviews])
+	).run()
 
 
 def send_daily_feedback_reminder():
@@ -279,38 +267,113 @@ def send_daily_feedback_reminder():
 	if not cint(reminder_settings.send_interview_feedback_reminder):
 		return
 
+	Interview = frappe.qb.DocType("Interview")
+	interviews = get_interviews_with_recipients(
+		(Interview.status == "Under Review")
+		& (Interview.docstatus != 2)
+		& (Interview.scheduled_on <= getdate())
+		& (Interview.to_time <= nowtime()),
+		for_feedback=1,
+	)
+	if not interviews:
+		return
+
 	interview_feedback_template = frappe.get_doc(
 		"Email Template", reminder_settings.feedback_reminder_notification_template
 	)
-
-	interviews = frappe.get_all(
-		"Interview",
-		filters={
-			"status": "Under Review",
-			"docstatus": ["!=", 2],
-			"scheduled_on": ["<=", getdate()],
-			"to_time": ["<=", nowtime()],
-		},
-		pluck="name",
+	send_interview_emails(
+		interviews, interview_feedback_template, reminder_settings.hiring_sender_email
 	)
 
+
+def get_interviews_with_recipients(conditions, for_feedback=0) -> list[dict]:
+	"""Returns interviews matching `conditions` along with their interviewer rows and recipients.
+
+	Fetches interviews (with the applicant's email) and their interviewers in two queries
+	instead of loading each Interview document. Same recipients as `get_recipients`."""
+	Interview = frappe.qb.DocType("Interview")
+	JobApplicant = frappe.qb.DocType("Job Applicant")
+
+	interviews = (
+		frappe.qb.from_(Interview)
+		.left_join(JobApplicant)
+		.on(Interview.job_applicant == JobApplicant.name)
+		.select(Interview.star, JobApplicant.email_id.as_("applicant_email"))
+		.where(conditions)
+	).run(as_dict=True)
+
+	if not interviews:
+		return []
+
+	InterviewDetail = frappe.qb.DocType("Interview Detail")
+	InterviewFeedback = frappe.qb.DocType("Interview Feedback")
+
+	interview_details = (
+		frappe.qb.from_(InterviewDetail)
+		.left_join(InterviewFeedback)
+		.on(
+			(InterviewFeedback.interview == InterviewDetail.parent)
+			& (InterviewFeedback.interviewer == InterviewDetail.interviewer)
+			& (InterviewFeedback.docstatus == 1)
+		)
+		.select(InterviewDetail.star, InterviewFeedback.name.as_("submitted_feedback"))
+		.where(
+			(InterviewDetail.parent.isin([d.name for d in interviews]))
+			& (InterviewDetail.parenttype == "Interview")
+			& (InterviewDetail.parentfield == "interview_details")
+		)
+		.orderby(InterviewDetail.idx)
+	).run(as_dict=True)
+
+	details_by_interview = {}
+	for detail in interview_details:
+		submitted_feedback = detail.pop("submitted_feedback")
+		rows = details_by_interview.setdefault(detail.parent, {})
+		row = rows.setdefault(detail.name, detail)
+		row.feedback_submitted = row.get("feedback_submitted") or bool(submitted_feedback)
+
 	for interview in interviews:
-		recipients = get_recipients(interview, for_feedback=1)
+		applicant_email = interview.pop("applicant_email")
+		interview.doctype = "Interview"
+		interview.interview_details = list(details_by_interview.get(interview.name, {}).values())
+
+		if for_feedback:
+			interview.recipients = [
+				d.interviewer for d in interview.interview_details if not d.pop("feedback_submitted")
+			]
+		else:
+			interview.recipients = [d.interviewer for d in interview.interview_details]
+			interview.recipients.append(applicant_email)
+			for d in interview.interview_details:
+				d.pop("feedback_submitted")
 
-		doc = frappe.get_doc("Interview", interview)
-		context = doc.as_dict()
+	return interviews
 
-		message = frappe.render_template(interview_feedback_template.response, context)
 
-		if len(recipients):
-			frappe.sendmail(
-				sender=reminder_settings.hiring_sender_email,
-				recipients=recipients,
-				subject=interview_feedback_template.subject,
-				message=message,
-				reference_doctype="Interview",
-				reference_name=interview,
-			)
+def send_interview_emails(interviews: list[dict], email_template, sender: str | None = None):
+	"""Renders `email_template` for each interview with a template compiled once and queues the emails"""
+	from frappe.utils.jinja import get_jenv
+
+	response = email_template.response or ""
+	# same guard as frappe.render_template's safe rendering
+	if ".__" in response:
+		frappe.throw(_("Illegal template"))
+
+	template = get_jenv().from_string(response)
+
+	for interview in interviews:
+		recipients = interview.pop("recipients")
+		if not recipients:
+			continue
+
+		frappe.sendmail(
+			sender=sender,
+			recipients=recipients,
+			subject=email_template.subject,
+			message=template.render(interview),
+			reference_doctype="Interview",
+			reference_name=interview.name,
+		)
 
 
 @frappe.whitelist()
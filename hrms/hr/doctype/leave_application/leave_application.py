@@ -2,6 +2,8 @@
 # License: GNU General Public License v3. See license.txt
 
 import datetime
+import hashlib
+from functools import partial
 from typing import Dict, Optional, Tuple, Union
 
 import frappe
@@ -17,6 +19,7 @@ from frappe.utils import (
     get_fullname,
     get_link_to_form,
     getdate,
+    now_datetime,
     nowdate,
 )
 
@@ -32,7 +35,11 @@ from hrms.hr.utils import (
 )
 from hrms.mixins.pwa_notifications import PWANotificationsMixin
 from basic.setup.doctype.employee.employee import get_holiday_list_for_employee
-from hrms.utils import daterange, get_employee_email
+from hrms.utils import daterange, get_employee_email, make_series_names
+
+CONSECUTIVE_LEAVES_LOOKUP_DAYS = 90
+LEAVE_CALENDAR_EVENTS = "leave_calendar_events"
+LEAVE_CALENDAR_CACHE_EXPIRY = 60 * 60
 
 
 class LeaveDayBlockedError(frappe.ValidationError):
@@ -94,6 +101,8 @@ class LeaveApplication(Document, PWANotificationsMixin):
         share_doc_with_approver(self, self.leave_approver)
         self.publish_update()
         self.notify_approval_status()
+        # listed in the feeds of viewers from other companies too
+        clear_leave_calendar_cache()
 
     def on_submit(self):
         if self.status in ["Open", "Cancelled"]:
@@ -109,6 +118,7 @@ class LeaveApplication(Document, PWANotificationsMixin):
             self.notify_employee()
 
         self.create_leave_ledger_entry()
+        clear_leave_calendar_cache()
         self.reload()
 
     def before_cancel(self):
@@ -122,9 +132,11 @@ class LeaveApplication(Document, PWANotificationsMixin):
         self.cancel_attendance()
 
         self.publish_update()
+        clear_leave_calendar_cache()
 
     def after_delete(self):
         self.publish_update()
+        clear_leave_calendar_cache()
 
     def publish_update(self):
         employee_user = frappe.db.get_value("Employee", self.employee, "user_id", cache=True)
@@ -256,12 +268,13 @@ class LeaveApplication(Document, PWANotificationsMixin):
                 self.employee, self.from_date, self.to_date
             )
 
+        existing_attendance = self.get_existing_attendance()
+        attendance_to_update = {}
+        dates_to_mark = []
+
         for dt in daterange(getdate(self.from_date), getdate(self.to_date)):
             date = dt.strftime("%Y-%m-%d")
-            attendance_name = frappe.db.exists(
-                "Attendance",
-                dict(employee=self.employee, attendance_date=date, docstatus=("!=", 2)),
-            )
+            attendance_name = existing_attendance.get(date)
 
             # don't mark attendance for holidays
             # if leave type does not include holidays within leaves as leaves
@@ -275,34 +288,118 @@ class LeaveApplication(Document, PWANotificationsMixin):
                     frappe.delete_doc("Attendance", attendance_name, force=1)
                 continue
 
-            self.create_or_update_attendance(attendance_name, date)
+            if attendance_name:
+                attendance_to_update.setdefault(self.get_attendance_status(date), []).append(
+                    attendance_name
+                )
+            else:
+                dates_to_mark.append(date)
+
+        self.update_existing_attendance(attendance_to_update)
+        self.mark_attendance(dates_to_mark)
+
+    def get_existing_attendance(self) -> dict[str, str]:
+        """Returns {attendance date: attendance name} of the employee for the leave period"""
+        Attendance = frappe.qb.DocType("Attendance")
+        attendance = (
+            frappe.qb.from_(Attendance)
+            .select(Attendance.attendance_date, Attendance.name)
+            .where(
+                (Attendance.employee == self.employee)
+                & (Attendance.attendance_date.between(self.from_date, self.to_date))
+                & (Attendance.docstatus != 2)
+            )
+        ).run()
+
+        existing_attendance = {}
+        for attendance_date, name in attendance:
+            existing_attendance.setdefault(cstr(attendance_date), name)
+
+        return existing_attendance
 
-    def create_or_update_attendance(self, attendance_name, date):
-        status = (
+    def get_attendance_status(self, date):
+        return (
             "Half Day"
             if self.half_day_date and getdate(date) == getdate(self.half_day_date)
             else "On Leave"
         )
 
-        if attendance_name:
-            # update existing attendance, change absent to on leave
-            doc = frappe.get_doc("Attendance", attendance_name)
-            doc.db_set(
-                {"status": status, "leave_type": self.leave_type, "leave_application": self.name}
+    def update_existing_attendance(self, attendance_by_status: dict[str, list[str]]):
+        """Changes existing attendance (like absent) to on leave, one update per status"""
+        Attendance = frappe.qb.DocType("Attendance")
+
+        for status, attendance_names in attendance_by_status.items():
+            (
+                frappe.qb.update(Attendance)
+                .set(Attendance.status, status)
+                .set(Attendance.leave_type, self.leave_type)
+                .set(Attendance.leave_application, self.name)
+                .set(Attendance.modified, now_datetime())
+                .set(Attendance.modified_by, frappe.session.user)
+                .where(Attendance.name.isin(attendance_names))
+            ).run()
+
+    def mark_attendance(self, dates: list[str]):
+        """Inserts submitted attendance for all the dates in one statement.
+
+        The rows are written directly, so Attendance validate and on_submit do not run and
+        neither do the Attendance doc_events of other apps. Attendance created from leaves
+        skips validation anyway."""
+        if not dates:
+            return
+
+        naming_series_field = frappe.get_meta("Attendance").get_field("naming_series")
+        # the default set in Document Naming Settings, else the first option like the form
+        naming_series = (
+            naming_series_field.default or naming_series_field.options.strip().split("\n")[0]
+        )
+        names = make_series_names(naming_series, len(dates))
+        timestamp = now_datetime()
+        user = frappe.session.user
+
+        fields = [
+            "name",
+            "naming_series",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "docstatus",
+            "employee",
+            "employee_name",
+            "company",
+            "department",
+            "attendance_date",
+            "status",
+            "leave_type",
+            "leave_application",
+            "late_entry",
+            "early_exit",
+        ]
+        values = [
+            (
+                name,
+                naming_series,
+                timestamp,
+                timestamp,
+                user,
+                user,
+                1,
+                self.employee,
+                self.employee_name,
+                self.company,
+                self.department,
+                date,
+                self.get_attendance_status(date),
+                self.leave_type,
+                self.name,
+                0,
+                0,
             )
-        else:
-            # make new attendance and submit it
-            doc = frappe.new_doc("Attendance")
-            doc.employee = self.employee
-            doc.employee_name = self.employee_name
-            doc.attendance_date = date
-            doc.company = self.company
-            doc.leave_type = self.leave_type
-            doc.leave_application = self.name
-            doc.status = status
-            doc.flags.ignore_validate = True
-            doc.insert(ignore_permissions=True)
-            doc.submit()
+            for name, date in zip(names, dates)
+        ]
+
+        frappe.db.bulk_insert("Attendance", fields, values)
 
     def cancel_attendance(self):
         if self.docstatus == 2:
@@ -512,38 +609,30 @@ class LeaveApplication(Document, PWANotificationsMixin):
             frappe.throw(msg, title=_("Maximum Consecutive Leaves Exceeded"))
 
     def get_consecutive_leave_details(self) -> dict:
-        leave_applications = set()
-
-        def _get_first_from_date(reference_date):
-            """gets `from_date` of first leave application from previous consecutive leave applications"""
-            prev_date = add_days(reference_date, -1)
-            application = frappe.db.get_value(
+        # applications around the leave are fetched in one query, widening the window only if
+        # the chain reaches its edge
+        window = CONSECUTIVE_LEAVES_LOOKUP_DAYS
+        while True:
+            window_start = getdate(add_days(self.from_date, -window))
+            window_end = getdate(add_days(self.to_date, window))
+            applications = frappe.get_all(
                 "Leave Application",
-                {"employee": self.employee, "leave_type": self.leave_type, "to_date": prev_date},
-                ["name", "from_date"],
-                as_dict=True,
+                filters={
+                    "employee": self.employee,
+                    "leave_type": self.leave_type,
+                    "to_date": (">=", window_start),
+                    "from_date": ("<=", window_end),
+                },
+                fields=["name", "from_date", "to_date"],
             )
-            if application:
-                leave_applications.add(application.name)
-                return _get_first_from_date(application.from_date)
-            return reference_date
-
-        def _get_last_to_date(reference_date):
-            """gets `to_date` of last leave application from following consecutive leave applications"""
-            next_date = add_days(reference_date, 1)
-            application = frappe.db.get_value(
-                "Leave Application",
-                {"employee": self.employee, "leave_type": self.leave_type, "from_date": next_date},
-                ["name", "to_date"],
-                as_dict=True,
+            first_from_date, last_to_date, leave_applications = get_consecutive_leave_chain(
+                applications, self.from_date, self.to_date
             )
-            if application:
-                leave_applications.add(application.name)
-                return _get_last_to_date(application.to_date)
-            return reference_date
 
-        first_from_date = _get_first_from_date(self.from_date)
-        last_to_date = _get_last_to_date(self.to_date)
+            if window_start < getdate(first_from_date) and getdate(last_to_date) < window_end:
+                break
+
+            window *= 2
 
         total_consecutive_leaves = get_number_of_leave_days(
             self.employee, self.leave_type, first_from_date, last_to_date
@@ -867,6 +956,33 @@ def get_allocation_expiry_for_cf_leaves(
     return expiry[0][0] if expiry else ""
 
 
+def get_consecutive_leave_chain(
+    applications: list[dict], from_date: str | datetime.date, to_date: str | datetime.date
+) -> tuple[datetime.date, datetime.date, set[str]]:
+    """Merges the leave from `from_date` to `to_date` with the applications ending the day
+    before it or starting the day after it, transitively.
+
+    Returns the first from date and the last to date of the chain along with the names of the
+    applications chained onto the leave."""
+    applications_by_to_date, applications_by_from_date = {}, {}
+    for application in applications:
+        applications_by_to_date.setdefault(getdate(application.to_date), application)
+        applications_by_from_date.setdefault(getdate(application.from_date), application)
+
+    leave_applications = set()
+    first_from_date, last_to_date = getdate(from_date), getdate(to_date)
+
+    while application := applications_by_to_date.get(add_days(first_from_date, -1)):
+        leave_applications.add(application.name)
+        first_from_date = getdate(application.from_date)
+
+    while application := applications_by_from_date.get(add_days(last_to_date, 1)):
+        leave_applications.add(application.name)
+        last_to_date = getdate(application.to_date)
+
+    return first_from_date, last_to_date, leave_applications
+
+
 @frappe.whitelist()
 def get_number_of_leave_days(
     employee: str,
@@ -1246,64 +1362,111 @@ def is_lwp(leave_type):
 def get_events(start, end, filters=None):
     from frappe.desk.reportview import get_filters_cond
 
-    events = []
-
     employee = frappe.db.get_value(
         "Employee",
         filters={"user_id": frappe.session.user},
-        fieldname=["name", "company"],
+        fieldname=["name", "company", "department"],
         as_dict=True,
     )
 
     if employee:
-        employee, company = employee.name, employee.company
+        employee, company, department = employee.name, employee.company, employee.department
     else:
-        employee = ""
+        employee = department = ""
         company = frappe.db.get_value("Global Defaults", None, "default_company")
 
     conditions = get_filters_cond("Leave Application", filters, [])
+    match_conditions = get_leave_match_conditions()
     # show department leaves for employee
-    if "Employee" in frappe.get_roles():
-        add_department_leaves(events, start, end, employee, company)
+    show_department_leaves = bool(department) and "Employee" in frappe.get_roles()
+    holiday_list = get_holiday_list_for_employee(employee, company)
+
+    # users sharing the department, filters and permissions get the same feed
+    cache_key = get_leave_calendar_cache_key(
+        start,
+        end,
+        department,
+        conditions,
+        match_conditions,
+        show_department_leaves,
+        holiday_list,
+        bool(employee),
+    )
+    events = frappe.cache().hget(get_leave_calendar_cache_name(company), cache_key)
+    if events is not None:
+        return events
+
+    # keyed by (doctype, name) so that leaves matched by both queries are listed once
+    events = {}
+    if show_department_leaves:
+        add_department_leaves(events, start, end, department, company, match_conditions)
 
-    add_leaves(events, start, end, conditions)
+    add_leaves(events, start, end, conditions, match_conditions=match_conditions)
     add_block_dates(events, start, end, employee, company)
-    add_holidays(events, start, end, employee, company)
+    add_holidays(events, start, end, holiday_list)
+
+    events = list(events.values())
+    cache_name = get_leave_calendar_cache_name(company)
+    frappe.cache().hset(cache_name, cache_key, events)
+    frappe.cache().expire(frappe.cache().make_key(cache_name), LEAVE_CALENDAR_CACHE_EXPIRY)
 
     return events
 
 
-def add_department_leaves(events, start, end, employee, company):
-    department = frappe.db.get_value("Employee", employee, "department")
+def get_leave_match_conditions():
+    from frappe.desk.reportview import build_match_conditions
 
-    if not department:
-        return
+    if cint(
+        frappe.db.get_value(
+            "HR Settings", None, "show_leaves_of_all_department_members_in_calendar"
+        )
+    ):
+        return ""
 
-    # department leaves
-    department_employees = frappe.db.sql_list(
-        """select name from tabEmployee where department=%s
-		and company=%s""",
-        (department, company),
-    )
+    return build_match_conditions("Leave Application")
 
-    filter_conditions = ' and employee in ("%s")' % '", "'.join(department_employees)
-    add_leaves(events, start, end, filter_conditions=filter_conditions)
 
+def get_leave_calendar_cache_key(start, end, department, *args):
+    digest = hashlib.sha1(frappe.as_json(args).encode()).hexdigest()
+    return f"{department}:{getdate(start)}:{getdate(end)}:{digest}"
 
-def add_leaves(events, start, end, filter_conditions=None):
-    from frappe.desk.reportview import build_match_conditions
 
-    conditions = []
+def get_leave_calendar_cache_name(company):
+    return f"{LEAVE_CALENDAR_EVENTS}:{company}"
 
-    if not cint(
-        frappe.db.get_value(
-            "HR Settings", None, "show_leaves_of_all_department_members_in_calendar"
-        )
-    ):
-        match_conditions = build_match_conditions("Leave Application")
 
-        if match_conditions:
-            conditions.append(match_conditions)
+def clear_leave_calendar_cache(company=None):
+    """Clears the cached calendar feeds of `company`, or of all companies if not set"""
+    delete_leave_calendar_cache(company)
+    # a feed built concurrently may not see the change before it is committed
+    frappe.db.after_commit.add(partial(delete_leave_calendar_cache, company))
+
+
+def delete_leave_calendar_cache(company=None):
+    if company:
+        frappe.cache().delete_value(get_leave_calendar_cache_name(company))
+    else:
+        frappe.cache().delete_keys(LEAVE_CALENDAR_EVENTS)
+
+
+def add_department_leaves(events, start, end, department, company, match_conditions=None):
+    # department leaves
+    filter_conditions = """ AND employee IN (
+		SELECT name FROM `tabEmployee` WHERE department=%(department)s AND company=%(company)s
+	)"""
+    add_leaves(
+        events,
+        start,
+        end,
+        filter_conditions=filter_conditions,
+        match_conditions=match_conditions,
+        values={"department": department, "company": company},
+    )
+
+
+def add_leaves(events, start, end, filter_conditions=None, match_conditions=None, values=None):
+    if match_conditions is None:
+        match_conditions = get_leave_match_conditions()
 
     query = """SELECT
 		docstatus,
@@ -1323,14 +1486,17 @@ def add_leaves(events, start, end, filter_conditions=None):
 		AND status in ('Approved', 'Open')
 	"""
 
-    if conditions:
-        query += " AND " + " AND ".join(conditions)
+    if match_conditions:
+        query += " AND " + match_conditions
 
     if filter_conditions:
         query += filter_conditions
 
-    for d in frappe.db.sql(query, {"start": start, "end": end}, as_dict=True):
-        e = {
+    for d in frappe.db.sql(query, {"start": start, "end": end, **(values or {})}, as_dict=True):
+        if ("Leave Application", d.name) in events:
+            continue
+
+        events[("Leave Application", d.name)] = {
             "name": d.name,
             "doctype": "Leave Application",
             "from_date": d.from_date,
@@ -1342,48 +1508,40 @@ def add_leaves(events, start, end, filter_conditions=None):
             + f" ({cstr(d.leave_type)})"
             + (" " + _("(Half Day)") if d.half_day else ""),
         }
-        if e not in events:
-            events.append(e)
 
 
 def add_block_dates(events, start, end, employee, company):
     # block days
-    cnt = 0
     block_dates = get_applicable_block_dates(start, end, employee, company, all_lists=True)
 
-    for block_date in block_dates:
-        events.append(
-            {
-                "doctype": "Leave Block List Date",
-                "from_date": block_date.block_date,
-                "to_date": block_date.block_date,
-                "title": _("Leave Blocked") + ": " + block_date.reason,
-                "name": "_" + str(cnt),
-            }
-        )
-        cnt += 1
+    for cnt, block_date in enumerate(block_dates):
+        name = "_" + str(cnt)
+        events[("Leave Block List Date", name)] = {
+            "doctype": "Leave Block List Date",
+            "from_date": block_date.block_date,
+            "to_date": block_date.block_date,
+            "title": _("Leave Blocked") + ": " + block_date.reason,
+            "name": name,
+        }
 
 
-def add_holidays(events, start, end, employee, company):
-    applicable_holiday_list = get_holiday_list_for_employee(employee, company)
-    if not applicable_holiday_list:
+def add_holidays(events, start, end, holiday_list):
+    if not holiday_list:
         return
 
     for holiday in frappe.db.sql(
         """select name, holiday_date, description
 		from `tabHoliday` where parent=%s and holiday_date between %s and %s""",
-        (applicable_holiday_list, start, end),
+        (holiday_list, start, end),
         as_dict=True,
     ):
-        events.append(
-            {
-                "doctype": "Holiday",
-                "from_date": holiday.holiday_date,
-                "to_date": holiday.holiday_date,
-                "title": _("Holiday") + ": " + cstr(holiday.description),
-                "name": holiday.name,
-            }
-        )
+        events[("Holiday", holiday.name)] = {
+            "doctype": "Holiday",
+            "from_date": holiday.holiday_date,
+            "to_date": holiday.holiday_date,
+            "title": _("Holiday") + ": " + cstr(holiday.description),
+            "name": holiday.name,
+        }
 
 
 @frappe.whitelist()
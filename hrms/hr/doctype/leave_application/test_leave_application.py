@@ -23,6 +23,7 @@ from hrms.hr.doctype.leave_application.leave_application import (
     LeaveDayBlockedError,
     NotAnOptionalHoliday,
     OverlapError,
+    get_consecutive_leave_chain,
     get_leave_allocation_records,
     get_leave_balance_on,
     get_leave_details,
@@ -340,6 +341,46 @@ class TestLeaveApplication(FrappeTestCase):
         self.assertEqual(attendance.leave_type, "_Test Leave Type")
         self.assertEqual(attendance.leave_application, application.name)
 
+    def test_attendance_for_long_leave_takes_constant_queries(self):
+        """marking attendance for a 180 day leave takes as many queries as for a 10 day leave"""
+        from unittest.mock import patch
+
+        def mark_attendance_for_leave(from_date, to_date):
+            application = frappe.get_doc(
+                dict(
+                    doctype="Leave Application",
+                    employee="_T-Employee-00001",
+                    employee_name=frappe.db.get_value(
+                        "Employee", "_T-Employee-00001", "employee_name"
+                    ),
+                    leave_type="_Test Leave Type",
+                    from_date=from_date,
+                    to_date=to_date,
+                    company="_Test Company",
+                    status="Approved",
+                )
+            )
+            application.name = frappe.generate_hash(length=10)
+
+            with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+                application.update_attendance()
+
+            return application.name, sql.call_count
+
+        _, short_leave_queries = mark_attendance_for_leave("2018-01-01", "2018-01-10")
+        application, long_leave_queries = mark_attendance_for_leave(
+            "2018-02-01", add_days("2018-02-01", 179)
+        )
+
+        self.assertEqual(long_leave_queries, short_leave_queries)
+        self.assertEqual(
+            frappe.db.count(
+                "Attendance",
+                {"leave_application": application, "status": "On Leave", "docstatus": 1},
+            ),
+            180,
+        )
+
     @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
     def test_attendance_for_include_holidays(self):
         # Case 1: leave type with 'Include holidays within leaves as leaves' enabled
@@ -809,6 +850,98 @@ class TestLeaveApplication(FrappeTestCase):
         # 11 consecutive leaves
         self.assertRaises(frappe.ValidationError, leave_application.insert)
 
+    def test_consecutive_leave_chain_matches_recursive_lookup(self):
+        import random
+
+        def get_chain_recursively(applications, from_date, to_date):
+            """one lookup per hop, like the per application queries the chain replaces"""
+            leave_applications = set()
+
+            def _get_first_from_date(reference_date):
+                prev_date = add_days(reference_date, -1)
+                application = next((d for d in applications if d.to_date == prev_date), None)
+                if application:
+                    leave_applications.add(application.name)
+                    return _get_first_from_date(application.from_date)
+                return reference_date
+
+            def _get_last_to_date(reference_date):
+                next_date = add_days(reference_date, 1)
+                application = next((d for d in applications if d.from_date == next_date), None)
+                if application:
+                    leave_applications.add(application.name)
+                    return _get_last_to_date(application.to_date)
+                return reference_date
+
+            return _get_first_from_date(from_date), _get_last_to_date(to_date), leave_applications
+
+        rng = random.Random(7)
+        start = getdate("2023-01-01")
+
+        for _ in range(500):
+            applications = []
+            for i in range(rng.randint(0, 40)):
+                from_date = add_days(start, rng.randint(0, 120))
+                applications.append(
+                    frappe._dict(
+                        name=f"HR-LAP-{i}",
+                        from_date=from_date,
+                        to_date=add_days(from_date, rng.randint(0, 4)),
+                    )
+                )
+
+            from_date = add_days(start, rng.randint(0, 120))
+            to_date = add_days(from_date, rng.randint(0, 4))
+
+            self.assertEqual(
+                get_consecutive_leave_chain(applications, from_date, to_date),
+                get_chain_recursively(applications, from_date, to_date),
+            )
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_leave_calendar_events(self):
+        from hrms.hr.doctype.leave_application.leave_application import (
+            get_events,
+            get_leave_calendar_cache_name,
+        )
+
+        frappe.db.set_single_value(
+            "HR Settings", "show_leaves_of_all_department_members_in_calendar", 1
+        )
+        department = frappe.db.get_value("Employee", "_T-Employee-00001", "department")
+        make_employee("leave_calendar_viewer@example.com", "_Test Company", department=department)
+        colleague = make_employee(
+            "leave_calendar_colleague@example.com", "_Test Company", department=department
+        )
+
+        make_allocation_record(employee=colleague)
+        application = self.get_application(_test_records[0])
+        application.employee = colleague
+        application.insert()
+
+        frappe.set_user("leave_calendar_viewer@example.com")
+        events = get_events("2013-01-01", "2013-01-31")
+        leaves = [e["name"] for e in events if e["doctype"] == "Leave Application"]
+        self.assertIn(application.name, leaves)
+        # matched by both the department and the filtered query, but listed once
+        self.assertEqual(len(events), len({(e["doctype"], e["name"]) for e in events}))
+
+        # cached feed is invalidated by changes to the leave applications
+        frappe.set_user("Administrator")
+        application.delete()
+        frappe.set_user("leave_calendar_viewer@example.com")
+        events = get_events("2013-01-01", "2013-01-31")
+        self.assertNotIn(application.name, [e["name"] for e in events])
+
+        # and listed in the feeds of permitted viewers from other companies
+        frappe.set_user("Administrator")
+        cache_name = get_leave_calendar_cache_name("_Test Company 1")
+        frappe.cache().hset(cache_name, "feed", [])
+        application = self.get_application(_test_records[0])
+        application.employee = colleague
+        application.insert()
+        self.assertIsNone(frappe.cache().hget(cache_name, "feed"))
+
     def test_leave_balance_near_allocaton_expiry(self):
         employee = get_employee()
         leave_type = create_leave_type(
@@ -19,6 +19,17 @@ class LeaveBlockList(Document):
 				frappe.msgprint(_("Date is repeated") + ":" + d.block_date, raise_exception=1)
 			dates.append(d.block_date)
 
+	def on_update(self):
+		self.clear_leave_calendar_cache()
+
+	def on_trash(self):
+		self.clear_leave_calendar_cache()
+
+	def clear_leave_calendar_cache(self):
+		from hrms.hr.doctype.leave_application.leave_application import clear_leave_calendar_cache
+
+		clear_leave_calendar_cache(self.company)
+
 	@frappe.whitelist()
 	def set_weekly_off_dates(self, start_date, end_date, days, reason):
 		date_list = self.get_block_dates_from_date(start_date, end_date, days)
@@ -2,10 +2,16 @@
 # For license information, please see license.txt
 
 
+from bisect import bisect_right
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import DATE_FORMAT, flt, getdate, today
+from frappe.query_builder.functions import Count, Max, Sum
+from frappe.utils import DATE_FORMAT, flt, getdate, now_datetime, today
+
+LEAVE_BALANCE_CACHE = "leave_balance_map"
+LEAVE_BALANCE_CACHE_EXPIRY = 24 * 60 * 60
 
 
 class LeaveLedgerEntry(Document):
@@ -13,6 +19,9 @@ class LeaveLedgerEntry(Document):
 		if getdate(self.from_date) > getdate(self.to_date):
 			frappe.throw(_("To date needs to be before from date"))
 
+	def on_submit(self):
+		clear_leave_balance_cache(self.employee)
+
 	def on_cancel(self):
 		# allow cancellation of expiry leaves
 		if self.is_expired:
@@ -20,6 +29,8 @@ class LeaveLedgerEntry(Document):
 		else:
 			frappe.throw(_("Only expired allocation can be cancelled"))
 
+		clear_leave_balance_cache(self.employee)
+
 
 def validate_leave_allocation_against_leave_application(ledger):
 	"""Checks that leave allocation has no leave application against it"""
@@ -65,6 +76,7 @@ def create_leave_ledger_entry(ref_doc, args, submit=True):
 		doc.submit()
 	else:
 		delete_ledger_entry(ledger)
+		clear_leave_balance_cache(ledger.employee)
 
 
 def delete_ledger_entry(ledger):
@@ -117,51 +129,239 @@ def process_expired_allocation():
 	        create a separate leave expiry entry against each entry of carry forwarded and non carry forwarded leaves
 	Case 2: leave type has no specific expiry period for carry forwarded leaves
 	        and there is no carry forwarded leave allocation, create a single expiry against the remaining leaves.
+
+	Returns the number of allocations expired and of expiry ledger entries created.
 	"""
 
 	# fetch leave type records that has carry forwarded leaves expiry
-	leave_type_records = frappe.db.get_values(
-		"Leave Type", filters={"expire_carry_forwarded_leaves_after_days": (">", 0)}, fieldname=["name"]
+	leave_types = set(
+		frappe.get_all(
+			"Leave Type",
+			filters={"expire_carry_forwarded_leaves_after_days": (">", 0)},
+			pluck="name",
+		)
 	)
 
-	leave_type = [record[0] for record in leave_type_records] or [""]
+	expire_allocation = get_expired_allocation_entries(leave_types)
+	if not expire_allocation:
+		return frappe._dict(allocations=0, ledger_entries=0)
 
-	# fetch non expired leave ledger entry of transaction_type allocation
-	expire_allocation = frappe.db.sql(
-		"""
-		SELECT
-			leaves, to_date, employee, leave_type,
-			is_carry_forward, transaction_name as name, transaction_type
-		FROM `tabLeave Ledger Entry` l
-		WHERE (NOT EXISTS
-			(SELECT name
-				FROM `tabLeave Ledger Entry`
-				WHERE
-					transaction_name = l.transaction_name
-					AND transaction_type = 'Leave Allocation'
-					AND name<>l.name
-					AND docstatus = 1
-					AND (
-						is_carry_forward=l.is_carry_forward
-						OR (is_carry_forward = 0 AND leave_type not in %s)
-			)))
-			AND transaction_type = 'Leave Allocation'
-			AND to_date < %s""",
-		(leave_type, today()),
-		as_dict=1,
+	return create_expiry_ledger_entry(expire_allocation)
+
+
+def get_expired_allocation_entries(leave_types_with_cf_expiry: set) -> list[dict]:
+	"""
+	Returns the allocation ledger entries ended before today that are not expired yet, i.e. no
+	other entry of the allocation has the same carry forward flag, or, if the leave type does not
+	expire carry forwarded leaves separately, no other entry is non carry forwarded.
+	"""
+	Ledger = frappe.qb.DocType("Leave Ledger Entry")
+	Allocation = frappe.qb.DocType("Leave Allocation")
+
+	pending_allocations = (
+		frappe.qb.from_(Ledger)
+		.select(Ledger.transaction_name)
+		.distinct()
+		.where(
+			(Ledger.transaction_type == "Leave Allocation")
+			& (Ledger.docstatus == 1)
+			& (Ledger.is_expired == 0)
+			& (Ledger.to_date < today())
+		)
 	)
+	# every entry of the allocations, the expiry entries included
+	entries = (
+		frappe.qb.from_(Ledger)
+		.inner_join(Allocation)
+		.on(Allocation.name == Ledger.transaction_name)
+		.select(
+			Ledger.name,
+			Ledger.leaves,
+			Ledger.from_date,
+			Ledger.to_date,
+			Ledger.employee,
+			Ledger.employee_name,
+			Ledger.leave_type,
+			Ledger.company,
+			Ledger.is_carry_forward,
+			Ledger.is_expired,
+			Ledger.transaction_name,
+		)
+		.where(
+			(Ledger.transaction_type == "Leave Allocation")
+			& (Ledger.docstatus == 1)
+			& (Ledger.transaction_name.isin(pending_allocations))
+			& (Allocation.docstatus == 1)
+			& (Allocation.expired == 0)
+		)
+	).run(as_dict=True)
 
-	if expire_allocation:
-		create_expiry_ledger_entry(expire_allocation)
+	entries_by_allocation = {}
+	for entry in entries:
+		entries_by_allocation.setdefault(entry.transaction_name, []).append(entry)
+
+	expired_entries = []
+	for allocation_entries in entries_by_allocation.values():
+		for entry in allocation_entries:
+			if entry.is_expired or getdate(entry.to_date) >= getdate(today()):
+				continue
+
+			separate_cf_expiry = entry.leave_type in leave_types_with_cf_expiry
+			if not any(
+				other.name != entry.name
+				and (
+					other.is_carry_forward == entry.is_carry_forward
+					or (not other.is_carry_forward and not separate_cf_expiry)
+				)
+				for other in allocation_entries
+			):
+				# expiry entries are created against the allocation
+				expired_entries.append(frappe._dict(entry, name=entry.transaction_name))
+
+	return expired_entries
 
 
 def create_expiry_ledger_entry(allocations):
-	"""Create ledger entry for expired allocation"""
+	"""
+	Creates the expiry ledger entries of the expired allocations in bulk. The remaining leaves of
+	non carry forwarded allocations are computed from a single grouped query over the ledger.
+	"""
+	expiry_entries = []
 	for allocation in allocations:
 		if allocation.is_carry_forward:
-			expire_carried_forward_allocation(allocation)
-		else:
-			expire_allocation(allocation)
+			if entry := get_carried_forward_expiry_entry(allocation):
+				expiry_entries.append(entry)
+
+	non_cf_allocations = sorted(
+		(allocation for allocation in allocations if not allocation.is_carry_forward),
+		key=lambda allocation: getdate(allocation.to_date),
+	)
+	remaining_leaves = get_remaining_leaves_map(non_cf_allocations)
+
+	# expiry entries of this run count towards the balance of the later allocations
+	expired_leaves = {}
+	for entry in expiry_entries:
+		expired_leaves.setdefault((entry.employee, entry.leave_type), []).append(entry)
+
+	for allocation in non_cf_allocations:
+		key = (allocation.employee, allocation.leave_type)
+		leaves = remaining_leaves(allocation) + sum(
+			flt(entry.leaves)
+			for entry in expired_leaves.get(key, [])
+			if getdate(entry.to_date) <= getdate(allocation.to_date)
+		)
+
+		# allows expired leaves entry to be created/reverted
+		if leaves:
+			entry = get_expiry_entry(allocation, leaves=flt(leaves) * -1, is_carry_forward=0)
+			expiry_entries.append(entry)
+			expired_leaves.setdefault(key, []).append(entry)
+
+	insert_expiry_ledger_entries(expiry_entries)
+	clear_leave_balance_cache([entry.employee for entry in expiry_entries])
+
+	if expired_allocations := [allocation.name for allocation in non_cf_allocations]:
+		LeaveAllocation = frappe.qb.DocType("Leave Allocation")
+		(
+			frappe.qb.update(LeaveAllocation)
+			.set(LeaveAllocation.expired, 1)
+			.where(LeaveAllocation.name.isin(expired_allocations))
+		).run()
+
+	return frappe._dict(
+		allocations=len({allocation.name for allocation in allocations}),
+		ledger_entries=len(expiry_entries),
+	)
+
+
+def get_remaining_leaves_map(allocations):
+	"""
+	Returns a function giving the remaining leaves of an allocation, i.e. the sum of the ledger
+	entries of its employee and leave type up to its end, loaded by one grouped query.
+	"""
+	if not allocations:
+		return lambda allocation: 0
+
+	Ledger = frappe.qb.DocType("Leave Ledger Entry")
+	balances = (
+		frappe.qb.from_(Ledger)
+		.select(
+			Ledger.employee, Ledger.leave_type, Ledger.to_date, Sum(Ledger.leaves).as_("leaves")
+		)
+		.where(
+			(Ledger.docstatus == 1)
+			& (Ledger.employee.isin(list({allocation.employee for allocation in allocations})))
+			& (Ledger.leave_type.isin(list({allocation.leave_type for allocation in allocations})))
+			& (Ledger.to_date <= max(getdate(allocation.to_date) for allocation in allocations))
+		)
+		.groupby(Ledger.employee, Ledger.leave_type, Ledger.to_date)
+		.orderby(Ledger.to_date)
+	).run(as_dict=True)
+
+	# running balance of each employee and leave type, by date
+	dates, running_balances = {}, {}
+	for row in balances:
+		key = (row.employee, row.leave_type)
+		dates.setdefault(key, []).append(getdate(row.to_date))
+		previous = running_balances.setdefault(key, [])
+		previous.append((previous[-1] if previous else 0) + flt(row.leaves))
+
+	def remaining_leaves(allocation):
+		key = (allocation.employee, allocation.leave_type)
+		index = bisect_right(dates.get(key, []), getdate(allocation.to_date))
+		return running_balances[key][index - 1] if index else 0
+
+	return remaining_leaves
+
+
+def get_expiry_entry(allocation, leaves, is_carry_forward, expiry_date=None):
+	expiry_date = expiry_date or allocation.to_date
+	return frappe._dict(
+		employee=allocation.employee,
+		employee_name=allocation.employee_name,
+		leave_type=allocation.leave_type,
+		company=allocation.company,
+		transaction_type="Leave Allocation",
+		transaction_name=allocation.name,
+		leaves=leaves,
+		from_date=expiry_date,
+		to_date=expiry_date,
+		is_carry_forward=is_carry_forward,
+		is_expired=1,
+		is_lwp=0,
+	)
+
+
+def insert_expiry_ledger_entries(entries):
+	if not entries:
+		return
+
+	fields = [
+		"name",
+		"owner",
+		"modified_by",
+		"creation",
+		"modified",
+		"docstatus",
+		*entries[0].keys(),
+	]
+	now = now_datetime()
+	frappe.db.bulk_insert(
+		"Leave Ledger Entry",
+		fields=fields,
+		values=[
+			(
+				frappe.generate_hash(length=10),
+				frappe.session.user,
+				frappe.session.user,
+				now,
+				now,
+				1,
+				*entry.values(),
+			)
+			for entry in entries
+		],
+	)
 
 
 def get_remaining_leaves(allocation):
@@ -202,6 +402,11 @@ def expire_allocation(allocation, expiry_date=None):
 
 def expire_carried_forward_allocation(allocation):
 	"""Expires remaining leaves in the on carried forward allocation"""
+	if entry := get_carried_forward_expiry_entry(allocation):
+		create_leave_ledger_entry(allocation, entry)
+
+
+def get_carried_forward_expiry_entry(allocation):
 	from hrms.hr.doctype.leave_application.leave_application import get_leaves_for_period
 
 	leaves_taken = get_leaves_for_period(
@@ -215,17 +420,36 @@ def expire_carried_forward_allocation(allocation):
 
 	# allow expired leaves entry to be created
 	if leaves > 0:
-		args = frappe._dict(
-			transaction_name=allocation.name,
-			transaction_type="Leave Allocation",
-			leaves=allocation.leaves * -1,
-			is_carry_forward=allocation.is_carry_forward,
-			is_expired=1,
-			from_date=allocation.to_date,
-			to_date=allocation.to_date,
+		return get_expiry_entry(
+			allocation, leaves=allocation.leaves * -1, is_carry_forward=allocation.is_carry_forward
 		)
-		create_leave_ledger_entry(allocation, args)
+
+
+def get_leave_ledger_version(employee: str) -> str:
+	"""Returns a version of the employee's ledger, changing as entries are added or removed"""
+	Ledger = frappe.qb.DocType("Leave Ledger Entry")
+	count, modified = (
+		frappe.qb.from_(Ledger)
+		.select(Count(Ledger.name), Max(Ledger.modified))
+		.where(Ledger.employee == employee)
+	).run()[0]
+
+	return f"{count}:{modified}"
+
+
+def get_leave_balance_cache_key(employee: str) -> str:
+	return f"{LEAVE_BALANCE_CACHE}:{employee}"
+
+
+def clear_leave_balance_cache(employees: str | list[str]) -> None:
+	if isinstance(employees, str):
+		employees = [employees]
+
+	frappe.cache().delete_value(
+		[get_leave_balance_cache_key(employee) for employee in set(employees)]
+	)
 
 
 def on_doctype_update():
 	frappe.db.add_index("Leave Ledger Entry", ["transaction_type", "transaction_name"])
+	frappe.db.add_index("Leave Ledger Entry", ["employee", "leave_type"])
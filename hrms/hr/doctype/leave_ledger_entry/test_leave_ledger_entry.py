@@ -1,9 +1,60 @@
 # Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate
+
+from hrms.hr.doctype.leave_application.test_leave_application import make_allocation_record
+from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import process_expired_allocation
+from basic.setup.doctype.employee.test_employee import make_employee
 
 
 class TestLeaveLedgerEntry(FrappeTestCase):
-	pass
+	def setUp(self):
+		for dt in ["Leave Application", "Leave Allocation", "Leave Ledger Entry"]:
+			frappe.db.delete(dt)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_process_expired_allocation(self):
+		today = getdate()
+		employees = [
+			make_employee(f"test_leave_expiry{i}@example.com", company="_Test Company")
+			for i in range(3)
+		]
+		allocations = [
+			make_allocation_record(
+				employee=employee,
+				from_date=add_days(today, -30),
+				to_date=add_days(today, -1),
+				leaves=10 + i,
+			)
+			for i, employee in enumerate(employees)
+		]
+		# not ended yet
+		make_allocation_record(
+			employee=employees[0], from_date=today, to_date=add_days(today, 30), leaves=5
+		)
+
+		result = process_expired_allocation()
+		self.assertEqual(result.allocations, 3)
+		self.assertEqual(result.ledger_entries, 3)
+
+		for i, allocation in enumerate(allocations):
+			expiry = frappe.get_all(
+				"Leave Ledger Entry",
+				filters={"transaction_name": allocation.name, "is_expired": 1},
+				fields=["leaves", "to_date", "docstatus"],
+			)
+			self.assertEqual(len(expiry), 1)
+			self.assertEqual(expiry[0].leaves, -(10 + i))
+			self.assertEqual(expiry[0].to_date, add_days(today, -1))
+			self.assertEqual(expiry[0].docstatus, 1)
+			self.assertEqual(frappe.db.get_value("Leave Allocation", allocation.name, "expired"), 1)
+
+		# rerunning the job expires nothing more
+		result = process_expired_allocation()
+		self.assertEqual(result.allocations, 0)
+		self.assertEqual(frappe.db.count("Leave Ledger Entry", {"is_expired": 1}), 3)
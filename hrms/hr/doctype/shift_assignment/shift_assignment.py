@@ -149,7 +149,7 @@ def has_overlapping_timings(shift_1: str, shift_2: str) -> bool:
 
 
 @frappe.whitelist()
-def get_events(start, end, filters=None):
+def get_events(start, end, filters=None, as_ranges=False):
 	employee = frappe.db.get_value(
 		"Employee", {"user_id": frappe.session.user}, ["name", "company"], as_dict=True
 	)
@@ -160,7 +160,7 @@ def get_events(start, end, filters=None):
 		company = frappe.db.get_value("Global Defaults", None, "default_company")
 
 	assignments = get_shift_assignments(start, end, filters)
-	return get_shift_events(assignments)
+	return get_shift_events(assignments, start, end, as_ranges=cint(as_ranges))
 
 
 def get_shift_assignments(start: str, end: str, filters: str | list | None = None) -> list[dict]:
@@ -171,11 +171,14 @@ def get_shift_assignments(start: str, end: str, filters: str | list | None = Non
 	if not filters:
 		filters = []
 
-	filters.extend([["start_date", ">=", start], ["end_date", "<=", end], ["docstatus", "=", 1]])
+	# assignments overlapping the window, including ongoing ones
+	filters.extend([["start_date", "<=", end], ["docstatus", "=", 1]])
+	or_filters = [["end_date", ">=", start], ["end_date", "is", "not set"]]
 
 	return frappe.get_list(
 		"Shift Assignment",
 		filters=filters,
+		or_filters=or_filters,
 		fields=[
 			"name",
 			"start_date",
@@ -188,38 +191,68 @@ def get_shift_assignments(start: str, end: str, filters: str | list | None = Non
 	)
 
 
-def get_shift_events(assignments: list[dict]) -> list[dict]:
+def get_shift_events(
+	assignments: list[dict], start: str | None = None, end: str | None = None, as_ranges=False
+) -> list[dict]:
+	"""
+	Returns a daily event for each day of the assignments falling within [start, end]. Ongoing
+	assignments run up to `end`, or today if it is not set.
+
+	With `as_ranges`, each assignment is returned as a single event spanning its days in the
+	window, with the daily timings of the shift in `start_time` and `end_time`.
+	"""
 	events = []
+	seen = set()
 	shift_timing_map = get_shift_type_timing([d.shift_type for d in assignments])
+	window_start = getdate(start) if start else None
+	window_end = getdate(end) if end else getdate()
 
 	for d in assignments:
-		daily_event_start = d.start_date
-		daily_event_end = d.end_date or getdate()
+		if d.name in seen:
+			continue
+		seen.add(d.name)
+
+		daily_event_start = max(d.start_date, window_start) if window_start else d.start_date
+		daily_event_end = min(d.end_date, window_end) if d.end_date else window_end
 		shift_start = shift_timing_map[d.shift_type]["start_time"]
 		shift_end = shift_timing_map[d.shift_type]["end_time"]
+		title = cstr(d.employee_name) + ": " + cstr(d.shift_type)
+
+		if as_ranges:
+			if daily_event_start <= daily_event_end:
+				events.append(
+					{
+						"name": d.name,
+						"doctype": "Shift Assignment",
+						"start_date": daily_event_start,
+						"end_date": daily_event_end,
+						"start_time": shift_start,
+						"end_time": shift_end,
+						"title": title,
+						"docstatus": d.docstatus,
+						"allDay": 1,
+						"convertToUserTz": 0,
+					}
+				)
+			continue
 
 		delta = timedelta(days=1)
+		# shift spans across 2 days
+		end_delta = shift_end + delta if shift_start > shift_end else shift_end
 		while daily_event_start <= daily_event_end:
-			start_timing = frappe.utils.get_datetime(daily_event_start) + shift_start
-
-			if shift_start > shift_end:
-				# shift spans across 2 days
-				end_timing = frappe.utils.get_datetime(daily_event_start) + shift_end + delta
-			else:
-				end_timing = frappe.utils.get_datetime(daily_event_start) + shift_end
-
-			event = {
-				"name": d.name,
-				"doctype": "Shift Assignment",
-				"start_date": start_timing,
-				"end_date": end_timing,
-				"title": cstr(d.employee_name) + ": " + cstr(d.shift_type),
-				"docstatus": d.docstatus,
-				"allDay": 0,
-				"convertToUserTz": 0,
-			}
-			if event not in events:
-				events.append(event)
+			day = frappe.utils.get_datetime(daily_event_start)
+			events.append(
+				{
+					"name": d.name,
+					"doctype": "Shift Assignment",
+					"start_date": day + shift_start,
+					"end_date": day + end_delta,
+					"title": title,
+					"docstatus": d.docstatus,
+					"allDay": 0,
+					"convertToUserTz": 0,
+				}
+			)
 
 			daily_event_start += delta
 
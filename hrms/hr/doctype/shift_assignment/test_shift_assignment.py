@@ -10,6 +10,7 @@ from hrms.hr.doctype.shift_assignment.shift_assignment import (
     OverlappingShiftError,
     get_actual_start_end_datetime_of_shift,
     get_events,
+    get_shift_events,
 )
 from hrms.hr.doctype.shift_type.test_shift_type import make_shift_assignment, setup_shift_type
 from basic.setup.doctype.employee.test_employee import make_employee
@@ -276,6 +277,41 @@ class TestShiftAssignment(FrappeTestCase):
         self.assertEqual(events[0]["start_date"], get_datetime(f"{date} 08:00:00"))
         self.assertEqual(events[0]["end_date"], get_datetime(f"{add_days(date, 1)} 02:00:00"))
 
+    def test_calendar_for_long_assignments(self):
+        employee = make_employee("test_shift_assignment1@example.com", company="_Test Company")
+        shift_type = setup_shift_type(
+            shift_type="Shift 1", start_time="08:00:00", end_time="12:00:00"
+        )
+        date = getdate()
+        shift = make_shift_assignment(shift_type.name, employee, add_days(date, -365))
+
+        # ongoing assignment started before the window is clamped to it
+        start, end = add_days(date, -2), add_days(date, 2)
+        events = get_events(start=start, end=end)
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events[0]["start_date"], get_datetime(f"{start} 08:00:00"))
+        self.assertEqual(events[-1]["end_date"], get_datetime(f"{end} 12:00:00"))
+
+        events = get_events(start=start, end=end, as_ranges=1)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["name"], shift.name)
+        self.assertEqual((events[0]["start_date"], events[0]["end_date"]), (start, end))
+
+        # events grow with assignments x days in the window, not with the assignment length
+        assignments = [
+            frappe._dict(
+                name=f"{shift.name}-{i}",
+                start_date=add_days(date, -365),
+                end_date=add_days(date, 365),
+                employee_name=f"Employee {i}",
+                docstatus=1,
+                shift_type=shift_type.name,
+            )
+            for i in range(2000)
+        ]
+        events = get_shift_events(assignments + assignments, start, end)
+        self.assertEqual(len(events), 2000 * 5)
+
     def test_consecutive_day_and_night_shifts(self):
         # defaults
         employee = make_employee(
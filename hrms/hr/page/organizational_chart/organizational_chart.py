@@ -1,6 +1,21 @@
+from functools import partial
+
 import frappe
 from frappe.query_builder.functions import Count
 
+ORG_CHART_NODES = "org_chart_nodes"
+# the chart is cleared when an employee changes, expiring it is only a backstop
+ORG_CHART_CACHE_EXPIRY = 24 * 60 * 60
+# changes to these fields of an employee change the chart
+ORG_CHART_EMPLOYEE_FIELDS = (
+	"reports_to",
+	"status",
+	"company",
+	"employee_name",
+	"designation",
+	"image",
+)
+
 
 @frappe.whitelist()
 def get_children(parent=None, company=None, exclude_node=None):
@@ -47,3 +62,76 @@ def get_connections(employee: str, lft: int, rgt: int) -> int:
 	).run()
 
 	return query[0][0]
+
+
+def get_all_nodes(company=None):
+	"""
+	Returns the children of every node of the chart, in the order they are expanded by
+	`hrms.utils.hierarchy_chart.get_all_nodes`. Cached per company until an employee changes.
+	"""
+	key = f"{ORG_CHART_NODES}:{company or ''}"
+	nodes = frappe.cache().get_value(key)
+	if nodes is None:
+		nodes = build_all_nodes(company)
+		frappe.cache().set_value(key, nodes, expires_in_sec=ORG_CHART_CACHE_EXPIRY)
+
+	return nodes
+
+
+def build_all_nodes(company=None):
+	"""Builds the chart from a single query over the employees instead of a query per node"""
+	filters = [["status", "=", "Active"]]
+	if company and company != "All Companies":
+		filters.append(["company", "=", company])
+
+	employees = frappe.get_all(
+		"Employee",
+		fields=[
+			"employee_name as name",
+			"name as id",
+			"lft",
+			"rgt",
+			"reports_to",
+			"image",
+			"designation as title",
+		],
+		filters=filters,
+		order_by="name",
+	)
+
+	children = {}
+	for employee in employees:
+		# descendants in the nested set, as counted by `get_connections`
+		employee.connections = (
+			(employee.rgt - employee.lft - 1) // 2 if employee.lft and employee.rgt else 0
+		)
+		employee.expandable = bool(employee.connections)
+		children.setdefault(employee.reports_to or "", []).append(employee)
+
+	result = []
+	nodes_to_expand = []
+
+	for root in children.get("", []):
+		data = children.get(root.id, [])
+		result.append(dict(parent=root.id, parent_name=root.name, data=data))
+		nodes_to_expand.extend(d for d in data if d.expandable)
+
+	# breadth first, as the nodes are loaded one level after the other; the list grows while
+	# it is walked
+	for parent in nodes_to_expand:
+		data = children.get(parent.id, [])
+		result.append(dict(parent=parent.id, parent_name=parent.name, data=data))
+		nodes_to_expand.extend(d for d in data if d.expandable)
+
+	return result
+
+
+def clear_org_chart_cache(doc=None, method=None):
+	if method == "on_update" and not any(
+		doc.has_value_changed(field) for field in ORG_CHART_EMPLOYEE_FIELDS
+	):
+		return
+
+	frappe.cache().delete_keys(ORG_CHART_NODES)
+	# a chart built concurrently may not see the change before it is committed
+	frappe.db.after_commit.add(partial(frappe.cache().delete_keys, ORG_CHART_NODES))
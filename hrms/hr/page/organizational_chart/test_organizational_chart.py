@@ -5,6 +5,7 @@ import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from hrms.hr.page.organizational_chart.organizational_chart import get_children
+from hrms.utils.hierarchy_chart import get_all_nodes
 from basic.setup.doctype.employee.test_employee import make_employee
 from hrms.tests.test_utils import create_company
 
@@ -34,3 +35,39 @@ class TestOrganizationalChart(FrappeTestCase):
         self.assertEqual(children[0].connections, 1)
         self.assertEqual(children[1].id, emp3)
         self.assertEqual(children[1].connections, 0)
+
+    def test_get_all_nodes(self):
+        emp1 = make_employee("testemp1@mail.com", company=self.company)
+        emp2 = make_employee("testemp2@mail.com", company=self.company, reports_to=emp1)
+        make_employee("testemp3@mail.com", company=self.company, reports_to=emp1)
+        emp4 = make_employee("testemp4@mail.com", company=self.company, reports_to=emp2)
+        make_employee("testemp5@mail.com", company=self.company, reports_to=emp4)
+        make_employee("testemp6@mail.com", company=self.company)
+
+        method = "hrms.hr.page.organizational_chart.organizational_chart.get_children"
+        self.assertEqual(get_all_nodes(method, self.company), get_nodes_by_walk(self.company))
+
+        # cached chart is refreshed when the hierarchy changes
+        doc = frappe.get_doc("Employee", emp4)
+        doc.reports_to = emp1
+        doc.save()
+        nodes = get_all_nodes(method, self.company)
+        self.assertEqual(nodes, get_nodes_by_walk(self.company))
+        root = next(node for node in nodes if node["parent"] == emp1)
+        self.assertIn(emp4, [d.id for d in root["data"]])
+
+
+def get_nodes_by_walk(company):
+    """Loads the chart node by node, as the chart does when expanding it"""
+    result = []
+    nodes_to_expand = [
+        frappe._dict(id=root.id, name=root.name) for root in get_children(company=company)
+    ]
+    while nodes_to_expand:
+        level, nodes_to_expand = nodes_to_expand, []
+        for parent in level:
+            data = get_children(parent.id, company)
+            result.append(dict(parent=parent.id, parent_name=parent.name, data=data))
+            nodes_to_expand.extend(d for d in data if d.expandable)
+
+    return result
@@ -1,12 +1,17 @@
 import click
 
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
 from basic.setup import after_install as setup
 
+from hrms.overrides.employee_master import get_event_day_custom_fields
+
 
 def after_install():
     try:
         print("Setting up Frappe HR...")
         setup()
+        create_custom_fields(get_event_day_custom_fields(), ignore_validate=True)
 
         click.secho("Thank you for installing Frappe HR!", fg="green")
 
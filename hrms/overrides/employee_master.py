@@ -8,6 +8,12 @@ from frappe.utils import add_years, cint, get_link_to_form, getdate
 
 from basic.setup.doctype.employee.employee import Employee
 
+# date field -> indexed "MM-DD" key used for birthday / work anniversary lookups
+EMPLOYEE_EVENT_DAY_KEYS = {
+    "date_of_birth": "birth_month_day",
+    "date_of_joining": "joining_month_day",
+}
+
 
 class EmployeeMaster(Employee):
     def autoname(self):
@@ -45,9 +51,51 @@ def validate_onboarding_process(doc, method=None):
         onboarding.db_set("employee", doc.name)
 
 
+def set_event_day_keys(doc, method=None):
+    """Maintains the indexed month-day keys for date of birth and date of joining"""
+    for date_field, key_field in EMPLOYEE_EVENT_DAY_KEYS.items():
+        date_value = doc.get(date_field)
+        doc.set(key_field, get_month_day_key(date_value) if date_value else None)
+
+
+def get_month_day_key(date) -> str:
+    return getdate(date).strftime("%m-%d")
+
+
+def get_event_day_custom_fields() -> dict:
+    return {
+        "Employee": [
+            {
+                "fieldname": "birth_month_day",
+                "fieldtype": "Data",
+                "label": "Birth Month Day",
+                "insert_after": "date_of_birth",
+                "length": 5,
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
+            {
+                "fieldname": "joining_month_day",
+                "fieldtype": "Data",
+                "label": "Joining Month Day",
+                "insert_after": "date_of_joining",
+                "length": 5,
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
+        ]
+    }
+
+
 def publish_update(doc, method=None):
     import hrms
+    from hrms.api import clear_employee_directory_cache
 
+    clear_employee_directory_cache()
     hrms.refetch_resource("hrms:employee", doc.user_id)
 
 
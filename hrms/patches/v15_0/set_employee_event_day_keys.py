@@ -0,0 +1,25 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from hrms.overrides.employee_master import get_event_day_custom_fields
+
+
+def execute():
+	create_custom_fields(get_event_day_custom_fields(), ignore_validate=True)
+
+	frappe.db.multisql(
+		{
+			"mariadb": """
+				UPDATE `tabEmployee`
+				SET
+					`birth_month_day` = DATE_FORMAT(`date_of_birth`, '%%m-%%d'),
+					`joining_month_day` = DATE_FORMAT(`date_of_joining`, '%%m-%%d')
+			""",
+			"postgres": """
+				UPDATE "tabEmployee"
+				SET
+					"birth_month_day" = TO_CHAR("date_of_birth", 'MM-DD'),
+					"joining_month_day" = TO_CHAR("date_of_joining", 'MM-DD')
+			""",
+		}
+	)
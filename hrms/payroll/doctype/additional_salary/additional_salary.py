@@ -173,30 +173,63 @@ class AdditionalSalary(Document):
 			self.validate_recurring_additional_salary_overlap()
 
 
-def get_additional_salaries(employee, start_date, end_date, component_type):
-	from frappe.query_builder import Criterion
-
+def get_additional_salaries(
+	employee, start_date, end_date, component_type, additional_salaries=None
+):
+	"""
+	Returns the additional salaries of `component_type` for the employee's salary slip.
+	`additional_salaries` are the employee's rows from `get_additional_salaries_for_employees`,
+	fetched here if not passed.
+	"""
 	comp_type = "Earning" if component_type == "earnings" else "Deduction"
 
+	if additional_salaries is None:
+		additional_salaries = get_additional_salaries_for_employees(
+			[employee], start_date, end_date, comp_type
+		).get(employee, [])
+
+	components_to_overwrite = []
+	for d in additional_salaries:
+		if d.type != comp_type or not d.overwrite:
+			continue
+
+		if d.component in components_to_overwrite:
+			frappe.throw(
+				_(
+					"Multiple Additional Salaries with overwrite property exist for Salary Component {0} between {1} and {2}."
+				).format(frappe.bold(d.component), start_date, end_date),
+				title=_("Error"),
+			)
+
+		components_to_overwrite.append(d.component)
+
+	return [d for d in additional_salaries if d.type == comp_type]
+
+
+def get_additional_salaries_for_employees(employees, start_date, end_date, comp_type=None):
+	"""Returns the additional salaries applicable to the payroll period, grouped by employee"""
+	from frappe.query_builder import Criterion
+
 	additional_sal = frappe.qb.DocType("Additional Salary")
 	component_field = additional_sal.salary_component.as_("component")
 	overwrite_field = additional_sal.overwrite_salary_structure_amount.as_("overwrite")
 
-	additional_salary_list = (
+	query = (
 		frappe.qb.from_(additional_sal)
 		.select(
 			additional_sal.name,
+			additional_sal.employee,
 			component_field,
 			additional_sal.type,
 			additional_sal.amount,
 			additional_sal.is_recurring,
+			additional_sal.to_date,
 			overwrite_field,
 			additional_sal.deduct_full_tax_on_selected_payroll_date,
 		)
 		.where(
-			(additional_sal.employee == employee)
+			(additional_sal.employee.isin(employees))
 			& (additional_sal.docstatus == 1)
-			& (additional_sal.type == comp_type)
 			& (additional_sal.disabled == 0)
 		)
 		.where(
@@ -218,24 +251,13 @@ def get_additional_salaries(employee, start_date, end_date, component_type):
 				]
 			)
 		)
-		.run(as_dict=True)
 	)
 
-	additional_salaries = []
-	components_to_overwrite = []
-
-	for d in additional_salary_list:
-		if d.overwrite:
-			if d.component in components_to_overwrite:
-				frappe.throw(
-					_(
-						"Multiple Additional Salaries with overwrite property exist for Salary Component {0} between {1} and {2}."
-					).format(frappe.bold(d.component), start_date, end_date),
-					title=_("Error"),
-				)
-
-			components_to_overwrite.append(d.component)
+	if comp_type:
+		query = query.where(additional_sal.type == comp_type)
 
-		additional_salaries.append(d)
+	additional_salaries = {}
+	for d in query.run(as_dict=True):
+		additional_salaries.setdefault(d.employee, []).append(d)
 
 	return additional_salaries
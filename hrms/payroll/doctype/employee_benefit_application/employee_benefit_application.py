@@ -256,8 +256,21 @@ def calculate_lwp(employee, start_date, holidays, working_days):
 
 
 def get_benefit_component_amount(
-	employee, start_date, end_date, salary_component, sal_struct, payroll_frequency, payroll_period
+	employee,
+	start_date,
+	end_date,
+	salary_component,
+	sal_struct,
+	payroll_frequency,
+	payroll_period,
+	application_amounts=None,
+	prefetched=False,
 ):
+	"""
+	`application_amounts` maps the earning components of the employee's benefit application to
+	their amounts, as returned per employee by `get_benefit_application_amounts`. Fetched here
+	unless `prefetched`; it is None for an employee without an application.
+	"""
 	if not payroll_period:
 		frappe.msgprint(
 			_("Start and end dates not in a valid Payroll Period, cannot calculate {0}").format(
@@ -266,31 +279,22 @@ def get_benefit_component_amount(
 		)
 		return False
 
-	# Considering there is only one application for a year
-	benefit_application = frappe.db.sql(
-		"""
-		select name
-		from `tabEmployee Benefit Application`
-		where
-			payroll_period=%(payroll_period)s
-			and employee=%(employee)s
-			and docstatus = 1
-	""",
-		{"employee": employee, "payroll_period": payroll_period.name},
-	)
+	if not prefetched:
+		application_amounts = get_benefit_application_amounts([employee], payroll_period.name).get(
+			employee
+		)
 
 	current_benefit_amount = 0.0
 	component_max_benefit, depends_on_payment_days = frappe.db.get_value(
-		"Salary Component", salary_component, ["max_benefit_amount", "depends_on_payment_days"]
+		"Salary Component",
+		salary_component,
+		["max_benefit_amount", "depends_on_payment_days"],
+		cache=True,
 	)
 
 	benefit_amount = 0
-	if benefit_application:
-		benefit_amount = frappe.db.get_value(
-			"Employee Benefit Application Detail",
-			{"parent": benefit_application[0][0], "earning_component": salary_component},
-			"amount",
-		)
+	if application_amounts is not None:
+		benefit_amount = application_amounts.get(salary_component)
 	elif component_max_benefit:
 		benefit_amount = get_benefit_amount_based_on_pro_rata(sal_struct, component_max_benefit)
 
@@ -305,6 +309,42 @@ def get_benefit_component_amount(
 	return current_benefit_amount
 
 
+def get_benefit_application_amounts(employees, payroll_period):
+	"""Returns {employee: {earning_component: amount}} for the submitted benefit applications"""
+	Application = frappe.qb.DocType("Employee Benefit Application")
+	ApplicationDetail = frappe.qb.DocType("Employee Benefit Application Detail")
+
+	applications = (
+		frappe.qb.from_(Application)
+		.left_join(ApplicationDetail)
+		.on(ApplicationDetail.parent == Application.name)
+		.select(
+			Application.employee,
+			Application.name,
+			ApplicationDetail.earning_component,
+			ApplicationDetail.amount,
+		)
+		.where(
+			(Application.employee.isin(employees))
+			& (Application.payroll_period == payroll_period)
+			& (Application.docstatus == 1)
+		)
+		.orderby(Application.creation)
+	).run(as_dict=True)
+
+	application_amounts, application_names = {}, {}
+	for d in applications:
+		# considering there is only one application for a year
+		if application_names.setdefault(d.employee, d.name) != d.name:
+			continue
+
+		amounts = application_amounts.setdefault(d.employee, {})
+		if d.earning_component:
+			amounts.setdefault(d.earning_component, d.amount)
+
+	return application_amounts
+
+
 def get_benefit_amount_based_on_pro_rata(sal_struct, component_max_benefit):
 	max_benefits_total = 0
 	benefit_amount = 0
@@ -5,6 +5,7 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder.functions import Sum
 from frappe.utils import flt
 
 from hrms.hr.utils import get_previous_claimed_amount, validate_active_employee
@@ -164,6 +165,29 @@ def get_benefit_claim_amount(employee, start_date, end_date, salary_component=No
 	return claimed_amount
 
 
+def get_benefit_claim_amounts(employees, start_date, end_date):
+	"""Returns {employee: {earning_component: claimed_amount}} for claims in the period"""
+	Claim = frappe.qb.DocType("Employee Benefit Claim")
+
+	claims = (
+		frappe.qb.from_(Claim)
+		.select(Claim.employee, Claim.earning_component, Sum(Claim.claimed_amount))
+		.where(
+			(Claim.employee.isin(employees))
+			& (Claim.docstatus == 1)
+			& (Claim.pay_against_benefit_claim == 1)
+			& (Claim.claim_date[start_date:end_date])
+		)
+		.groupby(Claim.employee, Claim.earning_component)
+	).run()
+
+	claimed_amounts = {}
+	for employee, earning_component, claimed_amount in claims:
+		claimed_amounts.setdefault(employee, {})[earning_component] = flt(claimed_amount)
+
+	return claimed_amounts
+
+
 def get_total_benefit_dispensed(employee, sal_struct, sal_slip_start_date, payroll_period):
 	pro_rata_amount = 0
 	claimed_amount = 0
@@ -195,8 +219,17 @@ def get_total_benefit_dispensed(employee, sal_struct, sal_slip_start_date, payro
 
 
 def get_last_payroll_period_benefits(
-	employee, sal_slip_start_date, sal_slip_end_date, payroll_period, sal_struct
+	employee,
+	sal_slip_start_date,
+	sal_slip_end_date,
+	payroll_period,
+	sal_struct,
+	current_claimed_amounts=None,
 ):
+	"""
+	`current_claimed_amounts` are the employee's claims in the salary slip period, as returned per
+	employee by `get_benefit_claim_amounts`. Fetched here if not passed.
+	"""
 	if sal_struct:
 		max_benefits = sal_struct.max_benefits
 	else:
@@ -210,13 +243,19 @@ def get_last_payroll_period_benefits(
 		have_remaining = True
 		# Set the remaining benefits to flexi non pro-rata component in the salary structure
 		salary_components_array = []
+		claimed_amounts = get_benefit_claim_amounts(
+			[employee], payroll_period.start_date, sal_slip_end_date
+		).get(employee, {})
+		if current_claimed_amounts is None:
+			current_claimed_amounts = get_benefit_claim_amounts(
+				[employee], sal_slip_start_date, sal_slip_end_date
+			).get(employee, {})
+
 		for d in sal_struct.get("earnings"):
 			if d.is_flexible_benefit == 1:
 				salary_component = frappe.get_cached_doc("Salary Component", d.salary_component)
 				if salary_component.pay_against_benefit_claim == 1:
-					claimed_amount = get_benefit_claim_amount(
-						employee, payroll_period.start_date, sal_slip_end_date, d.salary_component
-					)
+					claimed_amount = claimed_amounts.get(d.salary_component, 0)
 					amount_fit_to_component = salary_component.max_benefit_amount - claimed_amount
 					if amount_fit_to_component > 0:
 						if remaining_benefit > amount_fit_to_component:
@@ -225,9 +264,7 @@ def get_last_payroll_period_benefits(
 						else:
 							amount = remaining_benefit
 							have_remaining = False
-						current_claimed_amount = get_benefit_claim_amount(
-							employee, sal_slip_start_date, sal_slip_end_date, d.salary_component
-						)
+						current_claimed_amount = current_claimed_amounts.get(d.salary_component, 0)
 						amount += current_claimed_amount
 						struct_row = {}
 						salary_components_dict = {}
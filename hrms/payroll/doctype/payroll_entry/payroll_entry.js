@@ -30,6 +30,13 @@ frappe.ui.form.on('Payroll Entry', {
     frappe.realtime.on('completed_salary_slip_submission', function () {
       frm.reload_doc();
     });
+
+    frappe.realtime.off('hrms:salary_slip_email_status');
+    frappe.realtime.on('hrms:salary_slip_email_status', function (status) {
+      if (status.payroll_entry === frm.doc.name) {
+        frm.events.render_salary_slip_email_status(frm, status);
+      }
+    });
   },
 
   department_filters: function (frm) {
@@ -109,7 +116,38 @@ frappe.ui.form.on('Payroll Entry', {
         e.preventDefault();
         frm.scroll_to_field('error_message');
       });
+    } else if (frm.doc.docstatus == 1 && cint(frm.doc.salary_slips_submitted)) {
+      frm.events.show_salary_slip_email_status(frm);
+    }
+  },
+
+  show_salary_slip_email_status: function (frm) {
+    frappe
+      .call({
+        method:
+          'hrms.payroll.doctype.salary_slip.salary_slip_email_utils.get_payroll_entry_email_status',
+        args: { payroll_entry: frm.doc.name },
+      })
+      .then((r) => {
+        if (r.message) {
+          frm.events.render_salary_slip_email_status(frm, r.message);
+        }
+      });
+  },
+
+  render_salary_slip_email_status: function (frm, status) {
+    let message = __(
+      'Salary Slip emails: {0} sent, {1} skipped, {2} failed, {3} pending',
+      [status.sent, status.skipped, status.failed, status.pending]
+    );
+    if (status.failed) {
+      message += '. ' + __('Failed for {0}', [
+        frappe.utils.escape_html(status.failed_salary_slips.join(', ')),
+      ]);
     }
+
+    let color = status.failed ? 'red' : status.pending ? 'blue' : 'green';
+    frm.dashboard.set_headline(message, color);
   },
 
   get_employee_details: function (frm) {
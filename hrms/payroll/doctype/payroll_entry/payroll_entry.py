@@ -2,6 +2,7 @@
 # For license information, please see license.txt
 
 import json
+from bisect import bisect_left, bisect_right
 
 from dateutil.relativedelta import relativedelta
 
@@ -9,7 +10,8 @@ import frappe
 from frappe import _
 from frappe.desk.reportview import get_match_cond
 from frappe.model.document import Document
-from frappe.query_builder.functions import Coalesce, Count
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Coalesce, Count, Sum
 from frappe.utils import (
     DATE_FORMAT,
     add_days,
@@ -25,6 +27,7 @@ from frappe.utils import (
 from hrms.utils import get_fiscal_year
 
 from hrms.utils import get_accounting_dimensions
+from hrms.payroll.doctype.salary_slip.salary_slip_email_utils import enqueue_salary_slip_emails
 
 
 class PayrollEntry(Document):
@@ -247,21 +250,24 @@ class PayrollEntry(Document):
         ss_list = (
             frappe.qb.from_(ss)
             .select(ss.name, ss.salary_structure)
-            .where(
-                (ss.docstatus == ss_status)
-                & (ss.start_date >= self.start_date)
-                & (ss.end_date <= self.end_date)
-                & (ss.payroll_entry == self.name)
-                & ((ss.journal_entry.isnull()) | (ss.journal_entry == ""))
-                & (
-                    Coalesce(ss.salary_slip_based_on_timesheet, 0)
-                    == self.salary_slip_based_on_timesheet
-                )
-            )
+            .where(self.get_salary_slip_conditions(ss, ss_status))
         ).run(as_dict=as_dict)
 
         return ss_list
 
+    def get_salary_slip_conditions(self, ss, ss_status):
+        return (
+            (ss.docstatus == ss_status)
+            & (ss.start_date >= self.start_date)
+            & (ss.end_date <= self.end_date)
+            & (ss.payroll_entry == self.name)
+            & ((ss.journal_entry.isnull()) | (ss.journal_entry == ""))
+            & (
+                Coalesce(ss.salary_slip_based_on_timesheet, 0)
+                == self.salary_slip_based_on_timesheet
+            )
+        )
+
     @frappe.whitelist()
     def submit_salary_slips(self):
         self.check_permission("write")
@@ -286,8 +292,10 @@ class PayrollEntry(Document):
 
     def email_salary_slip(self, submitted_ss):
         if frappe.db.get_single_value("Payroll Settings", "email_salary_slip_to_employee"):
-            for ss in submitted_ss:
-                ss.email_salary_slip()
+            # rendered and sent by background jobs once the submission is committed
+            enqueue_salary_slip_emails(
+                [ss.name for ss in submitted_ss], payroll_entry=self.name
+            )
 
     def get_salary_component_account(self, salary_component):
         account = frappe.db.get_value(
@@ -307,30 +315,55 @@ class PayrollEntry(Document):
         return account
 
     def get_salary_components(self, component_type):
-        salary_slips = self.get_sal_slip_list(ss_status=1, as_dict=True)
-
-        if salary_slips:
-            ss = frappe.qb.DocType("Salary Slip")
-            ssd = frappe.qb.DocType("Salary Detail")
-            salary_components = (
-                frappe.qb.from_(ss)
-                .join(ssd)
-                .on(ss.name == ssd.parent)
-                .select(
-                    ssd.salary_component,
-                    ssd.amount,
-                    ssd.parentfield,
-                    ssd.additional_salary,
-                    ss.salary_structure,
-                    ss.employee,
-                )
+        """Returns salary component amounts of the submitted salary slips summed per
+        (employee, salary structure, component, employee advance) for the accrual entry"""
+        ss = frappe.qb.DocType("Salary Slip")
+        ssd = frappe.qb.DocType("Salary Detail")
+        sc = frappe.qb.DocType("Salary Component")
+        additional_salary = frappe.qb.DocType("Additional Salary")
+
+        employee_advance = (
+            Case()
+            .when(
+                additional_salary.ref_doctype == "Employee Advance", additional_salary.ref_docname
+            )
+            .else_(None)
+        )
+
+        query = (
+            frappe.qb.from_(ss)
+            .join(ssd)
+            .on(ss.name == ssd.parent)
+            .select(
+                ssd.salary_component,
+                ss.salary_structure,
+                ss.employee,
+                Sum(ssd.amount).as_("amount"),
+            )
+            .where((ssd.parentfield == component_type) & self.get_salary_slip_conditions(ss, 1))
+            .groupby(ss.employee, ss.salary_structure, ssd.salary_component)
+        )
+
+        if component_type == "earnings":
+            # flexible benefits with only tax impact are not booked
+            query = (
+                query.join(sc)
+                .on(sc.name == ssd.salary_component)
                 .where(
-                    (ssd.parentfield == component_type)
-                    & (ss.name.isin([d.name for d in salary_slips]))
+                    (Coalesce(sc.is_flexible_benefit, 0) == 0)
+                    | (Coalesce(sc.only_tax_impact, 0) == 0)
                 )
-            ).run(as_dict=True)
+            )
+        else:
+            # deductions recovering an employee advance are booked against the advance
+            query = (
+                query.left_join(additional_salary)
+                .on(additional_salary.name == ssd.additional_salary)
+                .select(employee_advance.as_("employee_advance"))
+                .groupby(employee_advance)
+            )
 
-            return salary_components
+        return query.run(as_dict=True)
 
     def get_salary_component_total(
         self,
@@ -340,15 +373,13 @@ class PayrollEntry(Document):
         salary_components = self.get_salary_components(component_type)
         if salary_components:
             component_dict = {}
+            self.set_payroll_cost_centers_for_employees(salary_components)
 
             for item in salary_components:
-                if not self.should_add_component_to_accrual_jv(component_type, item):
-                    continue
-
                 employee_cost_centers = self.get_payroll_cost_centers_for_employee(
                     item.employee, item.salary_structure
                 )
-                employee_advance = self.get_advance_deduction(component_type, item)
+                employee_advance = item.get("employee_advance")
 
                 for cost_center, percentage in employee_cost_centers.items():
                     amount_against_cost_center = flt(item.amount) * percentage / 100
@@ -372,31 +403,6 @@ class PayrollEntry(Document):
 
             return account_details
 
-    def should_add_component_to_accrual_jv(self, component_type: str, item: dict) -> bool:
-        add_component_to_accrual_jv = True
-        if component_type == "earnings":
-            is_flexible_benefit, only_tax_impact = frappe.get_cached_value(
-                "Salary Component",
-                item["salary_component"],
-                ["is_flexible_benefit", "only_tax_impact"],
-            )
-            if cint(is_flexible_benefit) and cint(only_tax_impact):
-                add_component_to_accrual_jv = False
-
-        return add_component_to_accrual_jv
-
-    def get_advance_deduction(self, component_type: str, item: dict) -> str | None:
-        if component_type == "deductions" and item.additional_salary:
-            ref_doctype, ref_docname = frappe.db.get_value(
-                "Additional Salary",
-                item.additional_salary,
-                ["ref_doctype", "ref_docname"],
-            )
-
-            if ref_doctype == "Employee Advance":
-                return ref_docname
-        return
-
     def add_advance_deduction_entry(
         self,
         item: dict,
@@ -455,6 +461,79 @@ class PayrollEntry(Document):
         if salary_structure and "salary_structure" not in employee_details:
             employee_details["salary_structure"] = salary_structure
 
+    def set_payroll_cost_centers_for_employees(self, salary_components: list[dict]) -> None:
+        """Prefetches payroll cost centers of all employees in `salary_components` in bulk,
+        with the same fallbacks as `get_payroll_cost_centers_for_employee`"""
+        if not hasattr(self, "employee_cost_centers"):
+            self.employee_cost_centers = {}
+
+        # cost centers are resolved against the first salary structure seen for an employee
+        salary_structures = {}
+        for item in salary_components:
+            if item.employee not in self.employee_cost_centers:
+                salary_structures.setdefault(item.employee, item.salary_structure)
+
+        if not salary_structures:
+            return
+
+        SalaryStructureAssignment = frappe.qb.DocType("Salary Structure Assignment")
+        EmployeeCostCenter = frappe.qb.DocType("Employee Cost Center")
+
+        assigned_cost_centers = (
+            frappe.qb.from_(SalaryStructureAssignment)
+            .join(EmployeeCostCenter)
+            .on(SalaryStructureAssignment.name == EmployeeCostCenter.parent)
+            .select(
+                SalaryStructureAssignment.employee,
+                SalaryStructureAssignment.salary_structure,
+                EmployeeCostCenter.cost_center,
+                EmployeeCostCenter.percentage,
+            )
+            .where(
+                (SalaryStructureAssignment.employee.isin(list(salary_structures)))
+                & (SalaryStructureAssignment.docstatus == 1)
+                & (
+                    SalaryStructureAssignment.salary_structure.isin(
+                        set(salary_structures.values())
+                    )
+                )
+            )
+        ).run(as_dict=True)
+
+        cost_centers = {}
+        for row in assigned_cost_centers:
+            if salary_structures[row.employee] == row.salary_structure:
+                cost_centers.setdefault(row.employee, {})[row.cost_center] = row.percentage
+
+        employees_without_cost_centers = [d for d in salary_structures if d not in cost_centers]
+        if employees_without_cost_centers:
+            employees = frappe.get_all(
+                "Employee",
+                filters={"name": ("in", employees_without_cost_centers)},
+                fields=["name", "payroll_cost_center", "department"],
+            )
+            department_cost_centers = dict(
+                frappe.get_all(
+                    "Department",
+                    filters={
+                        "name": ("in", list({d.department for d in employees if d.department}))
+                    },
+                    fields=["name", "payroll_cost_center"],
+                    as_list=True,
+                )
+            )
+
+            for employee in employees:
+                default_cost_center = (
+                    employee.payroll_cost_center
+                    or department_cost_centers.get(employee.department)
+                    or self.cost_center
+                )
+                cost_centers[employee.name] = {default_cost_center: 100}
+
+        for employee, employee_cost_centers in cost_centers.items():
+            self.employee_cost_centers.setdefault(employee, employee_cost_centers)
+
     def get_payroll_cost_centers_for_employee(self, employee, salary_structure):
         if not hasattr(self, "employee_cost_centers"):
             self.employee_cost_centers = {}
@@ -1025,15 +1104,18 @@ class PayrollEntry(Document):
             return
 
         unmarked_attendance = []
-        employee_details = self.get_employee_and_attendance_details()
+        employee_details = {
+            details.name: details for details in self.get_employee_and_attendance_details()
+        }
         default_holiday_list = frappe.db.get_value(
             "Company", self.company, "default_holiday_list", cache=True
         )
+        self.get_holiday_dates(
+            {details.holiday_list or default_holiday_list for details in employee_details.values()}
+        )
 
         for emp in self.employees:
-            details = next(
-                (record for record in employee_details if record.name == emp.employee), None
-            )
+            details = employee_details.get(emp.employee)
             if not details:
                 continue
 
@@ -1105,24 +1187,43 @@ class PayrollEntry(Document):
         return start_date, end_date
 
     def get_holidays_count(self, holiday_list: str, start_date: str, end_date: str) -> float:
-        """Returns number of holidays between start and end dates in the holiday list"""
-        if not hasattr(self, "_holidays_between_dates"):
-            self._holidays_between_dates = {}
-
-        key = f"{start_date}-{end_date}-{holiday_list}"
-        if key in self._holidays_between_dates:
-            return self._holidays_between_dates[key]
-
-        holidays = frappe.db.get_all(
-            "Holiday",
-            filters={"parent": holiday_list, "holiday_date": ("between", [start_date, end_date])},
-            fields=["COUNT(*) as holidays_count"],
-        )[0]
+        """Returns number of holidays between start and end dates in the holiday list.
+        Only the holidays of the payroll period are loaded, so the dates are clamped to it."""
+        start_date = max(getdate(start_date), getdate(self.start_date))
+        end_date = min(getdate(end_date), getdate(self.end_date))
+        if start_date > end_date:
+            return 0
+
+        holiday_dates = self.get_holiday_dates([holiday_list])[holiday_list]
+        return bisect_right(holiday_dates, end_date) - bisect_left(holiday_dates, start_date)
+
+    def get_holiday_dates(self, holiday_lists: list[str] | set[str]) -> dict[str, list]:
+        """Returns the sorted holiday dates of the payroll period for each holiday list.
+        Lists not loaded yet are fetched together in one query."""
+        period = (getdate(self.start_date), getdate(self.end_date))
+        if getattr(self, "_holiday_dates_period", None) != period:
+            self._holiday_dates_period = period
+            self._holiday_dates = {}
+
+        holiday_lists_to_load = [hl for hl in holiday_lists if hl not in self._holiday_dates]
+        if holiday_lists_to_load:
+            Holiday = frappe.qb.DocType("Holiday")
+            holidays = (
+                frappe.qb.from_(Holiday)
+                .select(Holiday.parent, Holiday.holiday_date)
+                .where(
+                    (Holiday.parent.isin(holiday_lists_to_load))
+                    & (Holiday.holiday_date.between(self.start_date, self.end_date))
+                )
+                .orderby(Holiday.holiday_date)
+            ).run()
 
-        if holidays:
-            self._holidays_between_dates[key] = holidays.holidays_count
+            for holiday_list in holiday_lists_to_load:
+                self._holiday_dates[holiday_list] = []
+            for holiday_list, holiday_date in holidays:
+                self._holiday_dates[holiday_list].append(holiday_date)
 
-        return self._holidays_between_dates.get(key) or 0
+        return self._holiday_dates
 
 
 def get_salary_structure(
@@ -1415,6 +1516,13 @@ def create_salary_slips_for_employees(employees, args, publish_progress=True):
         count = 0
 
         employees = list(set(employees) - set(salary_slips_exist_for))
+        if employees:
+            from hrms.payroll.doctype.salary_slip.salary_slip import get_payroll_batch_lookups
+
+            frappe.flags.payroll_batch_lookups = get_payroll_batch_lookups(
+                employees, args.start_date, args.end_date, args.company
+            )
+
         for emp in employees:
             args.update({"doctype": "Salary Slip", "employee": emp})
             frappe.get_doc(args).insert()
@@ -1444,6 +1552,7 @@ def create_salary_slips_for_employees(employees, args, publish_progress=True):
         log_payroll_failure("creation", payroll_entry, e)
 
     finally:
+        frappe.flags.payroll_batch_lookups = None
         frappe.db.commit()  # nosemgrep
         frappe.publish_realtime("completed_salary_slip_creation", user=frappe.session.user)
 
@@ -0,0 +1,204 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_months, get_first_day, get_last_day, getdate
+
+from hrms.hr.doctype.attendance.attendance import mark_attendance
+from hrms.payroll.doctype.employee_benefit_application.employee_benefit_application import (
+    get_benefit_application_amounts,
+)
+from hrms.payroll.doctype.employee_tax_exemption_declaration.test_employee_tax_exemption_declaration import (
+    create_payroll_period,
+)
+from hrms.payroll.doctype.salary_slip.salary_slip import get_payroll_batch_lookups
+from hrms.payroll.doctype.salary_slip.test_salary_slip import make_holiday_list
+from hrms.payroll.doctype.salary_structure.salary_structure import make_salary_slip
+from hrms.payroll.doctype.salary_structure.test_salary_structure import (
+    create_salary_structure_assignment,
+    make_salary_structure,
+)
+from hrms.utils import daterange
+from basic.setup.doctype.employee.test_employee import make_employee
+
+BENEFIT_APPLICATION_MODULE = (
+    "hrms.payroll.doctype.employee_benefit_application.employee_benefit_application"
+)
+
+
+class TestPayrollEntry(FrappeTestCase):
+    def setUp(self):
+        self.start_date = get_first_day(add_months(getdate(), -1))
+        self.end_date = get_last_day(self.start_date)
+        self.holiday_list = make_holiday_list(
+            "_Test Payroll Entry Holiday List",
+            from_date=add_months(self.start_date, -1),
+            to_date=add_months(self.end_date, 1),
+        )
+        self.holidays = set(
+            frappe.get_all("Holiday", filters={"parent": self.holiday_list}, pluck="holiday_date")
+        )
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_unmarked_attendance_of_joiners_and_leavers(self):
+        employee = self.make_employee("test_unmarked_attendance@payroll.com")
+        joiner = self.make_employee(
+            "test_unmarked_attendance_joiner@payroll.com",
+            date_of_joining=add_days(self.start_date, 10),
+        )
+        leaver = self.make_employee(
+            "test_unmarked_attendance_leaver@payroll.com",
+            relieving_date=add_days(self.start_date, 19),
+        )
+
+        self.mark_attendance(employee, self.start_date, self.end_date)
+        self.mark_attendance(leaver, self.start_date, add_days(self.start_date, 19))
+        # the last two working days are left unmarked
+        working_days = self.get_working_days(add_days(self.start_date, 10), self.end_date)
+        self.mark_attendance(joiner, working_days[0], working_days[-3])
+
+        payroll_entry = self.make_payroll_entry([employee, joiner, leaver])
+
+        unmarked_attendance = payroll_entry.get_employees_with_unmarked_attendance()
+        self.assertEqual(
+            [(d["employee"], d["unmarked_days"]) for d in unmarked_attendance], [(joiner, 2)]
+        )
+
+        # holidays outside the payroll period are not loaded, the range is clamped to it
+        self.assertEqual(
+            payroll_entry.get_holidays_count(
+                self.holiday_list, add_months(self.start_date, -1), add_months(self.end_date, 1)
+            ),
+            len([d for d in self.holidays if self.start_date <= d <= self.end_date]),
+        )
+
+    def test_unmarked_attendance_queries_do_not_grow_with_employees(self):
+        other_holiday_list = make_holiday_list(
+            "_Test Payroll Entry Holiday List 2",
+            from_date=add_months(self.start_date, -1),
+            to_date=add_months(self.end_date, 1),
+        )
+        employees = []
+        for i in range(12):
+            # joiners, leavers and two holiday lists
+            kwargs = {"holiday_list": other_holiday_list} if i % 2 else {}
+            if i % 3 == 1:
+                kwargs["date_of_joining"] = add_days(self.start_date, i)
+            elif i % 3 == 2:
+                kwargs["relieving_date"] = add_days(self.start_date, i)
+            employees.append(self.make_employee(f"test_unmarked_scaling{i}@payroll.com", **kwargs))
+
+        def count_queries(employees):
+            payroll_entry = self.make_payroll_entry(employees)
+            with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+                payroll_entry.get_employees_with_unmarked_attendance()
+            return sql.call_count
+
+        # warms the cached company defaults
+        count_queries(employees[:2])
+        self.assertEqual(count_queries(employees), count_queries(employees[:2]))
+
+    def test_batch_lookups_replace_per_employee_queries(self):
+        frappe.db.delete("Salary Slip")
+        payroll_period = create_payroll_period(
+            name="_Test Payroll Period Batch Lookups", company="_Test Company"
+        )
+        start_date = getdate(payroll_period.start_date)
+        end_date = get_last_day(start_date)
+        # flexible benefits without an application are paid pro rata
+        salary_structure = make_salary_structure(
+            "Test Payroll Batch Lookups",
+            "Monthly",
+            company="_Test Company",
+            currency="INR",
+            payroll_period=payroll_period,
+            include_flexi_benefits=True,
+        )
+        employees = [
+            self.make_employee(
+                f"test_batch_lookups{i}@payroll.com",
+                date_of_joining=add_months(start_date, -12),
+            )
+            for i in range(3)
+        ]
+        for employee in employees:
+            create_salary_structure_assignment(
+                employee,
+                salary_structure.name,
+                from_date=start_date,
+                company="_Test Company",
+                currency="INR",
+            )
+
+        def make_salary_slips(batch):
+            if batch:
+                frappe.flags.payroll_batch_lookups = get_payroll_batch_lookups(
+                    employees, start_date, end_date, "_Test Company"
+                )
+
+            try:
+                with patch(
+                    f"{BENEFIT_APPLICATION_MODULE}.get_benefit_application_amounts",
+                    wraps=get_benefit_application_amounts,
+                ) as get_applications, patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+                    slips = [
+                        make_salary_slip(
+                            salary_structure.name, employee=employee, posting_date=start_date
+                        )
+                        for employee in employees
+                    ]
+            finally:
+                frappe.flags.payroll_batch_lookups = None
+
+            return slips, sql.call_count, get_applications.call_count
+
+        # warms the document and value caches
+        make_salary_slips(batch=False)
+        slips, queries, application_lookups = make_salary_slips(batch=False)
+        self.assertGreaterEqual(application_lookups, len(employees))
+
+        batch_slips, batch_queries, batch_application_lookups = make_salary_slips(batch=True)
+        # employees without an application are not looked up again
+        self.assertEqual(batch_application_lookups, 0)
+        self.assertLessEqual(batch_queries, queries - len(employees))
+        self.assertEqual(
+            [slip.gross_pay for slip in batch_slips], [slip.gross_pay for slip in slips]
+        )
+
+    def make_employee(self, user, **kwargs):
+        kwargs.setdefault("date_of_joining", add_months(self.start_date, -12))
+        kwargs.setdefault("holiday_list", self.holiday_list)
+        return make_employee(user, company="_Test Company", **kwargs)
+
+    def make_payroll_entry(self, employees):
+        payroll_entry = frappe.get_doc(
+            {
+                "doctype": "Payroll Entry",
+                "company": "_Test Company",
+                "payroll_frequency": "Monthly",
+                "posting_date": self.end_date,
+                "start_date": self.start_date,
+                "end_date": self.end_date,
+                "validate_attendance": 1,
+            }
+        )
+        for employee in employees:
+            payroll_entry.append("employees", {"employee": employee})
+
+        return payroll_entry
+
+    def mark_attendance(self, employee, from_date, to_date):
+        for attendance_date in self.get_working_days(from_date, to_date):
+            mark_attendance(employee, attendance_date, "Present")
+
+    def get_working_days(self, from_date, to_date):
+        return [
+            date
+            for date in daterange(getdate(from_date), getdate(to_date))
+            if date not in self.holidays
+        ]
@@ -3,7 +3,10 @@
 
 
 import unicodedata
+from collections import ChainMap
 from datetime import date
+from functools import partial
+from types import CodeType
 
 import frappe
 from frappe import _, msgprint
@@ -30,12 +33,17 @@ from frappe.utils.background_jobs import enqueue
 from hrms.utils import get_fiscal_year
 
 from hrms.hr.utils import validate_active_employee
-from hrms.payroll.doctype.additional_salary.additional_salary import get_additional_salaries
+from hrms.payroll.doctype.additional_salary.additional_salary import (
+    get_additional_salaries,
+    get_additional_salaries_for_employees,
+)
 from hrms.payroll.doctype.employee_benefit_application.employee_benefit_application import (
+    get_benefit_application_amounts,
     get_benefit_component_amount,
 )
 from hrms.payroll.doctype.employee_benefit_claim.employee_benefit_claim import (
     get_benefit_claim_amount,
+    get_benefit_claim_amounts,
     get_last_payroll_period_benefits,
 )
 from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
@@ -43,12 +51,14 @@ from hrms.payroll.doctype.payroll_period.payroll_period import (
     get_payroll_period,
     get_period_factor,
 )
+from hrms.payroll.doctype.salary_slip.salary_slip_email_utils import enqueue_salary_slip_emails
 from hrms.payroll.doctype.salary_slip.salary_slip_loan_utils import (
     cancel_loan_repayment_entry,
     make_loan_repayment_entry,
     set_loan_repayment,
 )
-from hrms.payroll.utils import sanitize_expression
+from hrms.payroll.doctype.salary_slip.salary_slip_pdf import enqueue_salary_slip_pdf_render
+from hrms.payroll.utils import clear_payroll_report_cache, sanitize_expression
 from basic.setup.doctype.employee.employee import get_holiday_list_for_employee
 from hrms.utils.holiday_list import get_holiday_dates_between
 from hrms.utils.transaction_base import TransactionBase
@@ -58,6 +68,11 @@ HOLIDAYS_BETWEEN_DATES = "holidays_between_dates"
 LEAVE_TYPE_MAP = "leave_type_map"
 SALARY_COMPONENT_VALUES = "salary_component_values"
 TAX_COMPONENTS_BY_COMPANY = "tax_components_by_company"
+SALARY_SLIP_LEDGER = "salary_slip_ledger"
+SALARY_SLIP_LEDGER_EXPIRY = 24 * 60 * 60
+
+# slip fields that vary between sub periods while projecting formula based amounts
+PERIOD_DATE_FIELDS = {"start_date", "end_date", "posting_date"}
 
 
 class SalarySlip(TransactionBase):
@@ -181,6 +196,8 @@ class SalarySlip(TransactionBase):
         self.base_total_in_words = money_in_words(base_total, company_currency)
 
     def on_update(self):
+        # the salary register lists draft slips too
+        self.invalidate_payroll_report_cache()
         self.publish_update()
 
     def on_submit(self):
@@ -191,6 +208,10 @@ class SalarySlip(TransactionBase):
             self.update_status(self.name)
 
             make_loan_repayment_entry(self)
+            self.invalidate_salary_slip_ledger()
+            self.invalidate_payroll_report_cache()
+            # rendered ahead of the first download
+            enqueue_salary_slip_pdf_render(self.name)
 
             if not frappe.flags.via_payroll_entry and not frappe.flags.in_patch:
                 email_salary_slip = cint(
@@ -225,8 +246,31 @@ class SalarySlip(TransactionBase):
         self.update_payment_status_for_gratuity()
 
         cancel_loan_repayment_entry(self)
+        self.invalidate_salary_slip_ledger()
+        self.invalidate_payroll_report_cache()
         self.publish_update()
 
+    def invalidate_salary_slip_ledger(self):
+        if not self.payroll_period:
+            return
+
+        key = get_salary_slip_ledger_key(self.employee, self.payroll_period)
+        frappe.cache().delete_value(key)
+        # a concurrent projection may cache the ledger again before this change is committed
+        frappe.db.after_commit.add(partial(frappe.cache().delete_value, key))
+
+    def invalidate_payroll_report_cache(self):
+        # bank remittance filters on the posting date, the other reports on the slip period
+        posting_date = getdate(self.posting_date)
+        args = (
+            self.company,
+            min(getdate(self.start_date), posting_date),
+            max(getdate(self.end_date), posting_date),
+        )
+        clear_payroll_report_cache(*args)
+        # a report run concurrently may cache results without this change before it is committed
+        frappe.db.after_commit.add(partial(clear_payroll_report_cache, *args))
+
     def publish_update(self):
         employee_user = frappe.db.get_value("Employee", self.employee, "user_id", cache=True)
         frappe.publish_realtime(
@@ -240,6 +284,7 @@ class SalarySlip(TransactionBase):
         from frappe.model.naming import revert_series_if_last
 
         revert_series_if_last(self.series, self.name)
+        self.invalidate_payroll_report_cache()
 
     def get_status(self):
         if self.docstatus == 0:
@@ -1061,10 +1106,11 @@ class SalarySlip(TransactionBase):
         for deduction in self._salary_structure_doc.get("deductions"):
             if deduction.exempted_from_income_tax:
                 if deduction.amount_based_on_formula:
-                    for sub_period in range(1, ceil(self.remaining_sub_periods)):
-                        future_period_exempted_amount += self.get_amount_from_formula(
-                            deduction, sub_period
+                    future_period_exempted_amount += sum(
+                        self.get_amounts_from_formula_for_sub_periods(
+                            deduction, range(1, ceil(self.remaining_sub_periods))
                         )
+                    )
                 else:
                     future_period_exempted_amount += deduction.amount * (
                         ceil(self.remaining_sub_periods) - 1
@@ -1077,6 +1123,33 @@ class SalarySlip(TransactionBase):
         ) or 0
 
     def get_amount_from_formula(self, struct_row, sub_period=1):
+        return self.get_amounts_from_formula_for_sub_periods(struct_row, [sub_period])[0]
+
+    def get_amounts_from_formula_for_sub_periods(self, struct_row, sub_periods) -> list[float]:
+        """Evaluates the condition & formula of `struct_row` for each of the (future) `sub_periods`.
+
+        The expressions are compiled once and only the period dates vary between evaluations.
+        If they don't reference any of the period dates, the amount is evaluated once and reused.
+        """
+        sub_periods = list(sub_periods)
+        if not sub_periods:
+            return []
+
+        if not self.get_compiled_expressions(struct_row).names & PERIOD_DATE_FIELDS:
+            # layered over self.data so that the evaluation doesn't update it
+            amount = flt(self.eval_condition_and_formula(struct_row, ChainMap({}, self.data)))
+            return [amount] * len(sub_periods)
+
+        return [
+            flt(
+                self.eval_condition_and_formula(
+                    struct_row, ChainMap(self.get_sub_period_dates(sub_period), self.data)
+                )
+            )
+            for sub_period in sub_periods
+        ]
+
+    def get_sub_period_dates(self, sub_period: int) -> dict:
         if self.payroll_frequency == "Monthly":
             start_date = frappe.utils.add_months(self.start_date, sub_period)
             end_date = frappe.utils.add_months(self.end_date, sub_period)
@@ -1091,18 +1164,13 @@ class SalarySlip(TransactionBase):
                 days_to_add = sub_period * 13
 
             if self.payroll_frequency == "Daily":
-                days_to_add = start_date
+                days_to_add = sub_period
 
             start_date = frappe.utils.add_days(self.start_date, days_to_add)
             end_date = frappe.utils.add_days(self.end_date, days_to_add)
             posting_date = start_date
 
-        local_data = self.data.copy()
-        local_data.update(
-            {"start_date": start_date, "end_date": end_date, "posting_date": posting_date}
-        )
-
-        return flt(self.eval_condition_and_formula(struct_row, local_data))
+        return {"start_date": start_date, "end_date": end_date, "posting_date": posting_date}
 
     def get_income_tax_deducted_till_date(self):
         tax_deducted = 0.0
@@ -1182,28 +1250,44 @@ class SalarySlip(TransactionBase):
                     )
 
     def get_data_for_eval(self):
-        """Returns data for evaluating formula"""
-        data = frappe._dict()
-        employee = frappe.get_cached_doc("Employee", self.employee).as_dict()
+        """Returns data for evaluating formula.
 
+        Both namespaces are read-through layers (component amounts, component abbreviations,
+        employee, salary slip, salary structure assignment - in order of precedence) sharing
+        everything but the component amounts, so nothing is copied and child tables are not serialised.
+        """
         if not hasattr(self, "_salary_structure_assignment"):
             self.set_salary_structure_assignment()
 
-        data.update(self._salary_structure_assignment)
-        data.update(self.as_dict())
-        data.update(employee)
-
-        data.update(self.get_component_abbr_map())
+        salary_slip = self.get_valid_dict()
+        salary_slip["doctype"] = self.doctype
 
-        # shallow copy of data to store default amounts (without payment days) for tax calculation
-        default_data = data.copy()
+        layers = (
+            self.get_component_abbr_map(),
+            self.get_employee_data_for_eval(),
+            salary_slip,
+            self._salary_structure_assignment,
+        )
 
+        # default amounts (without payment days) are kept separately for tax calculation
+        amounts, default_amounts = {}, {}
         for key in ("earnings", "deductions"):
             for d in self.get(key):
-                default_data[d.abbr] = d.default_amount or 0
-                data[d.abbr] = d.amount or 0
+                default_amounts[d.abbr] = d.default_amount or 0
+                amounts[d.abbr] = d.amount or 0
+
+        return ChainMap(amounts, *layers), ChainMap(default_amounts, *layers)
 
-        return data, default_data
+    def get_employee_data_for_eval(self) -> dict:
+        """Employee fields (without child tables) for formula evaluation, fetched once per slip"""
+        employee_data = getattr(self, "_employee_data_for_eval", None)
+        if not employee_data or employee_data.get("name") != self.employee:
+            employee = frappe.get_cached_doc("Employee", self.employee)
+            employee_data = employee.get_valid_dict()
+            employee_data["doctype"] = employee.doctype
+            self._employee_data_for_eval = employee_data
+
+        return employee_data
 
     def get_component_abbr_map(self):
         def _fetch_component_values():
@@ -1216,18 +1300,39 @@ class SalarySlip(TransactionBase):
 
         return frappe.cache().get_value(SALARY_COMPONENT_VALUES, generator=_fetch_component_values)
 
+    def get_compiled_expressions(self, struct_row) -> frappe._dict:
+        """Returns the compiled condition & formula of `struct_row` and the names they reference"""
+        if not hasattr(self, "_compiled_expressions"):
+            self._compiled_expressions = {}
+
+        key = (struct_row.condition, struct_row.formula)
+        if key not in self._compiled_expressions:
+            condition = sanitize_expression(struct_row.condition)
+            formula = sanitize_expression(struct_row.formula)
+            compiled = frappe._dict(
+                condition=_compile_expression(condition) if condition else None,
+                formula=_compile_expression(formula) if formula else None,
+                names=set(),
+            )
+            for code in (compiled.condition, compiled.formula):
+                if code:
+                    compiled.names.update(_get_referenced_names(code))
+
+            self._compiled_expressions[key] = compiled
+
+        return self._compiled_expressions[key]
+
     def eval_condition_and_formula(self, struct_row, data):
         try:
-            condition = sanitize_expression(struct_row.condition)
-            if condition:
-                if not _safe_eval(condition, self.whitelisted_globals, data):
+            compiled = self.get_compiled_expressions(struct_row)
+            if compiled.condition:
+                if not _safe_eval(compiled.condition, self.whitelisted_globals, data):
                     return None
             amount = struct_row.amount
             if struct_row.amount_based_on_formula:
-                formula = sanitize_expression(struct_row.formula)
-                if formula:
+                if compiled.formula:
                     amount = flt(
-                        _safe_eval(formula, self.whitelisted_globals, data),
+                        _safe_eval(compiled.formula, self.whitelisted_globals, data),
                         struct_row.precision("amount"),
                     )
             if amount:
@@ -1258,7 +1363,20 @@ class SalarySlip(TransactionBase):
             )
             raise
 
+    def get_payroll_batch_lookups(self):
+        """Lookups prefetched for this slip's payroll batch, if they cover its period"""
+        lookups = frappe.flags.payroll_batch_lookups
+        if (
+            lookups
+            and lookups.start_date == getdate(self.start_date)
+            and lookups.end_date == getdate(self.end_date)
+            and lookups.company == self.company
+        ):
+            return lookups
+
     def add_employee_benefits(self):
+        lookups = self.get_payroll_batch_lookups()
+
         for struct_row in self._salary_structure_doc.get("earnings"):
             if struct_row.is_flexible_benefit == 1:
                 if (
@@ -1278,13 +1396,25 @@ class SalarySlip(TransactionBase):
                         self._salary_structure_doc,
                         self.payroll_frequency,
                         self.payroll_period,
+                        application_amounts=(
+                            lookups.benefit_applications.get(self.employee) if lookups else None
+                        ),
+                        prefetched=bool(lookups),
                     )
                     if benefit_component_amount:
                         self.update_component_row(struct_row, benefit_component_amount, "earnings")
                 else:
-                    benefit_claim_amount = get_benefit_claim_amount(
-                        self.employee, self.start_date, self.end_date, struct_row.salary_component
-                    )
+                    if lookups:
+                        benefit_claim_amount = lookups.benefit_claims.get(self.employee, {}).get(
+                            struct_row.salary_component, 0
+                        )
+                    else:
+                        benefit_claim_amount = get_benefit_claim_amount(
+                            self.employee,
+                            self.start_date,
+                            self.end_date,
+                            struct_row.salary_component,
+                        )
                     if benefit_claim_amount:
                         self.update_component_row(struct_row, benefit_claim_amount, "earnings")
 
@@ -1293,12 +1423,16 @@ class SalarySlip(TransactionBase):
     def adjust_benefits_in_last_payroll_period(self, payroll_period):
         if payroll_period:
             if getdate(payroll_period.end_date) <= getdate(self.end_date):
+                lookups = self.get_payroll_batch_lookups()
                 last_benefits = get_last_payroll_period_benefits(
                     self.employee,
                     self.start_date,
                     self.end_date,
                     payroll_period,
                     self._salary_structure_doc,
+                    current_claimed_amounts=(
+                        lookups.benefit_claims.get(self.employee, {}) if lookups else None
+                    ),
                 )
                 if last_benefits:
                     for last_benefit in last_benefits:
@@ -1309,11 +1443,22 @@ class SalarySlip(TransactionBase):
                         )
 
     def add_additional_salary_components(self, component_type):
+        lookups = self.get_payroll_batch_lookups()
         additional_salaries = get_additional_salaries(
-            self.employee, self.start_date, self.end_date, component_type
+            self.employee,
+            self.start_date,
+            self.end_date,
+            component_type,
+            additional_salaries=(
+                lookups.additional_salaries.get(self.employee, []) if lookups else None
+            ),
         )
 
+        if not hasattr(self, "_additional_salary_to_dates"):
+            self._additional_salary_to_dates = {}
+
         for additional_salary in additional_salaries:
+            self._additional_salary_to_dates[additional_salary.name] = additional_salary.to_date
             self.update_component_row(
                 get_salary_component_data(additional_salary.component),
                 additional_salary.amount,
@@ -1483,7 +1628,7 @@ class SalarySlip(TransactionBase):
 
         self.update_component_amount_based_on_payment_days(component_row, remove_if_zero_valued)
 
-        if data:
+        if data is not None:
             data[component_row.abbr] = component_row.amount
 
     def update_component_amount_based_on_payment_days(
@@ -1614,6 +1759,21 @@ class SalarySlip(TransactionBase):
         variable_based_on_taxable_salary=0,
         field_to_select="amount",
     ):
+        ledger = self.get_salary_slip_ledger(start_date, end_date)
+        if ledger is not None:
+            return get_total_from_salary_slip_ledger(
+                ledger,
+                start_date,
+                end_date,
+                parentfield,
+                salary_component=salary_component,
+                is_tax_applicable=is_tax_applicable,
+                is_flexible_benefit=is_flexible_benefit,
+                exempted_from_income_tax=exempted_from_income_tax,
+                variable_based_on_taxable_salary=variable_based_on_taxable_salary,
+                field_to_select=field_to_select,
+            )
+
         ss = frappe.qb.DocType("Salary Slip")
         sd = frappe.qb.DocType("Salary Detail")
 
@@ -1653,6 +1813,27 @@ class SalarySlip(TransactionBase):
 
         return flt(result[0][0]) if result else 0.0
 
+    def get_salary_slip_ledger(self, start_date, end_date) -> list[dict] | None:
+        """Returns the cached ledger of submitted salary slip component totals for the employee
+        in the payroll period, if the period covers the requested dates"""
+        payroll_period = self.payroll_period
+        if not (
+            payroll_period
+            and getdate(payroll_period.start_date) <= getdate(start_date)
+            and getdate(end_date) <= getdate(payroll_period.end_date)
+        ):
+            return None
+
+        key = get_salary_slip_ledger_key(self.employee, payroll_period)
+        ledger = frappe.cache().get_value(key)
+        if ledger is None:
+            ledger = get_salary_slip_ledger(
+                self.employee, payroll_period.start_date, payroll_period.end_date
+            )
+            frappe.cache().set_value(key, ledger, expires_in_sec=SALARY_SLIP_LEDGER_EXPIRY)
+
+        return ledger
+
     def get_tax_paid_in_period(self, start_date, end_date, tax_component):
         # find total_tax_paid, tax paid for benefit, additional_salary
         total_tax_paid = self.get_salary_slip_details(
@@ -1736,6 +1917,9 @@ class SalarySlip(TransactionBase):
         if self.relieving_date:
             to_date = self.relieving_date
 
+        if not to_date:
+            to_date = getattr(self, "_additional_salary_to_dates", {}).get(additional_salary)
+
         if not to_date:
             to_date = frappe.db.get_value(
                 "Additional Salary", additional_salary, "to_date", cache=True
@@ -1910,8 +2094,27 @@ class SalarySlip(TransactionBase):
         return total
 
     def email_salary_slip(self):
+        email_args = self.get_email_args()
+        if email_args:
+            if not frappe.flags.in_test:
+                enqueue(
+                    method=frappe.sendmail, queue="short", timeout=300, is_async=True, **email_args
+                )
+            else:
+                frappe.sendmail(**email_args)
+        else:
+            msgprint(
+                _("{0}: Employee email not found, hence email not sent").format(self.employee_name)
+            )
+
+    def get_email_args(self, payroll_settings=None):
+        """Returns the arguments for `frappe.sendmail` with the rendered salary slip attached,
+        or None if the employee has no email address"""
         receiver = frappe.db.get_value("Employee", self.employee, "prefered_email", cache=True)
-        payroll_settings = frappe.get_single("Payroll Settings")
+        if not receiver:
+            return None
+
+        payroll_settings = payroll_settings or frappe.get_single("Payroll Settings")
         message = "Please see attachment"
         password = None
         if payroll_settings.encrypt_salary_slips_in_emails:
@@ -1921,30 +2124,19 @@ class SalarySlip(TransactionBase):
                 payroll_settings.password_policy
             )
 
-        if receiver:
-            email_args = {
-                "sender": payroll_settings.sender_email,
-                "recipients": [receiver],
-                "message": _(message),
-                "subject": "Salary Slip - from {0} to {1}".format(self.start_date, self.end_date),
-                "attachments": [
-                    frappe.attach_print(
-                        self.doctype, self.name, file_name=self.name, password=password
-                    )
-                ],
-                "reference_doctype": self.doctype,
-                "reference_name": self.name,
-            }
-            if not frappe.flags.in_test:
-                enqueue(
-                    method=frappe.sendmail, queue="short", timeout=300, is_async=True, **email_args
+        return {
+            "sender": payroll_settings.sender_email,
+            "recipients": [receiver],
+            "message": _(message),
+            "subject": "Salary Slip - from {0} to {1}".format(self.start_date, self.end_date),
+            "attachments": [
+                frappe.attach_print(
+                    self.doctype, self.name, file_name=self.name, password=password
                 )
-            else:
-                frappe.sendmail(**email_args)
-        else:
-            msgprint(
-                _("{0}: Employee email not found, hence email not sent").format(self.employee_name)
-            )
+            ],
+            "reference_doctype": self.doctype,
+            "reference_name": self.name,
+        }
 
     def update_status(self, salary_slip=None):
         for data in self.timesheets:
@@ -2137,6 +2329,103 @@ class SalarySlip(TransactionBase):
                 )
 
 
+def get_salary_slip_ledger_key(employee: str, payroll_period) -> str:
+    start_date, end_date = getdate(payroll_period.start_date), getdate(payroll_period.end_date)
+    return f"{SALARY_SLIP_LEDGER}:{employee}:{start_date}:{end_date}"
+
+
+def get_salary_slip_ledger(employee: str, start_date, end_date) -> list[dict]:
+    """Returns component totals of the employee's submitted salary slips between the dates,
+    grouped by slip period, component and the flags used in tax projections"""
+    ss = frappe.qb.DocType("Salary Slip")
+    sd = frappe.qb.DocType("Salary Detail")
+
+    return (
+        frappe.qb.from_(ss)
+        .join(sd)
+        .on(sd.parent == ss.name)
+        .select(
+            ss.start_date,
+            ss.end_date,
+            sd.parentfield,
+            sd.salary_component,
+            sd.is_tax_applicable,
+            sd.is_flexible_benefit,
+            sd.exempted_from_income_tax,
+            sd.variable_based_on_taxable_salary,
+            Sum(sd.amount).as_("amount"),
+            Sum(sd.additional_amount).as_("additional_amount"),
+        )
+        .where(
+            (ss.docstatus == 1)
+            & (ss.employee == employee)
+            & (ss.start_date >= start_date)
+            & (ss.end_date <= end_date)
+        )
+        .groupby(
+            ss.start_date,
+            ss.end_date,
+            sd.parentfield,
+            sd.salary_component,
+            sd.is_tax_applicable,
+            sd.is_flexible_benefit,
+            sd.exempted_from_income_tax,
+            sd.variable_based_on_taxable_salary,
+        )
+    ).run(as_dict=True)
+
+
+def get_total_from_salary_slip_ledger(
+    ledger: list[dict],
+    start_date,
+    end_date,
+    parentfield,
+    salary_component=None,
+    is_tax_applicable=None,
+    is_flexible_benefit=0,
+    exempted_from_income_tax=0,
+    variable_based_on_taxable_salary=0,
+    field_to_select="amount",
+) -> float:
+    """Same totals as `SalarySlip.get_salary_slip_details`, computed from the ledger"""
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    total = 0.0
+
+    for row in ledger:
+        if not (
+            start_date <= getdate(row.start_date) <= end_date
+            and start_date <= getdate(row.end_date) <= end_date
+        ):
+            continue
+
+        if row.parentfield != parentfield or cint(row.is_flexible_benefit) != cint(
+            is_flexible_benefit
+        ):
+            continue
+
+        if is_tax_applicable is not None and cint(row.is_tax_applicable) != cint(
+            is_tax_applicable
+        ):
+            continue
+
+        if exempted_from_income_tax and cint(row.exempted_from_income_tax) != cint(
+            exempted_from_income_tax
+        ):
+            continue
+
+        if variable_based_on_taxable_salary and cint(row.variable_based_on_taxable_salary) != cint(
+            variable_based_on_taxable_salary
+        ):
+            continue
+
+        if salary_component and row.salary_component != salary_component:
+            continue
+
+        total += flt(row.amount if field_to_select == "amount" else row.additional_amount)
+
+    return total
+
+
 def unlink_ref_doc_from_salary_slip(doc, method=None):
     """Unlinks accrual Journal Entry from Salary Slips on cancellation"""
     linked_ss = frappe.get_all(
@@ -2149,6 +2438,32 @@ def unlink_ref_doc_from_salary_slip(doc, method=None):
             frappe.db.set_value("Salary Slip", ss_doc.name, "journal_entry", "")
 
 
+def get_payroll_batch_lookups(employees, start_date, end_date, company):
+    """
+    Prefetches the additional salaries, benefit applications and benefit claims of a payroll
+    batch in a few grouped queries. Salary slips of the batch read their own slice from
+    `frappe.flags.payroll_batch_lookups` instead of querying per employee.
+    """
+    payroll_period = get_payroll_period(start_date, end_date, company)
+
+    return frappe._dict(
+        {
+            "start_date": getdate(start_date),
+            "end_date": getdate(end_date),
+            "company": company,
+            "additional_salaries": get_additional_salaries_for_employees(
+                employees, start_date, end_date
+            ),
+            "benefit_applications": (
+                get_benefit_application_amounts(employees, payroll_period.name)
+                if payroll_period
+                else {}
+            ),
+            "benefit_claims": get_benefit_claim_amounts(employees, start_date, end_date),
+        }
+    )
+
+
 def generate_password_for_pdf(policy_template, employee):
     employee = frappe.get_cached_doc("Employee", employee)
     return policy_template.format(**employee.as_dict())
@@ -2336,7 +2651,9 @@ def on_doctype_update():
     frappe.db.add_index("Salary Slip", ["employee", "start_date", "end_date"])
 
 
-def _safe_eval(code: str, eval_globals: dict | None = None, eval_locals: dict | None = None):
+def _safe_eval(
+    code: str | CodeType, eval_globals: dict | None = None, eval_locals: dict | None = None
+):
     """Old version of safe_eval from framework.
 
     Note: current frappe.safe_eval transforms code so if you have nested
@@ -2346,9 +2663,8 @@ def _safe_eval(code: str, eval_globals: dict | None = None, eval_locals: dict |
 
     WARNING: DO NOT use this function anywhere else outside of this file.
     """
-    code = unicodedata.normalize("NFKC", code)
-
-    _check_attributes(code)
+    if isinstance(code, str):
+        code = _compile_expression(code)
 
     whitelisted_globals = {"int": int, "float": float, "long": int, "round": round}
     if not eval_globals:
@@ -2359,6 +2675,25 @@ def _safe_eval(code: str, eval_globals: dict | None = None, eval_locals: dict |
     return eval(code, eval_globals, eval_locals)  # nosemgrep
 
 
+def _compile_expression(code: str) -> CodeType:
+    """Validates and compiles an expression for `_safe_eval`"""
+    code = unicodedata.normalize("NFKC", code)
+
+    _check_attributes(code)
+
+    return compile(code, "<string>", "eval")
+
+
+def _get_referenced_names(code: CodeType) -> set[str]:
+    """Returns all names referenced by a compiled expression, including nested code objects"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.update(_get_referenced_names(const))
+
+    return names
+
+
 def _check_attributes(code: str) -> None:
     import ast
 
@@ -2394,15 +2729,16 @@ def enqueue_email_salary_slips(names) -> None:
     if isinstance(names, str):
         names = json.loads(names)
 
-    frappe.enqueue("hrms.payroll.doctype.salary_slip.salary_slip.email_salary_slips", names=names)
+    run_id = enqueue_salary_slip_emails(names)
     frappe.msgprint(
-        _("Salary slip emails have been enqueued for sending. Check {0} for status.").format(
-            f"""<a href='{frappe.utils.get_url_to_list("Email Queue")}' target='blank'>Email Queue</a>"""
+        _(
+            "Salary slip emails have been enqueued for sending (run {0}). Check {1} for status."
+        ).format(
+            frappe.bold(run_id),
+            f"""<a href='{frappe.utils.get_url_to_list("Email Queue")}' target='blank'>Email Queue</a>""",
         )
     )
 
 
 def email_salary_slips(names) -> None:
-    for name in names:
-        salary_slip = frappe.get_doc("Salary Slip", name)
-        salary_slip.email_salary_slip()
+    enqueue_salary_slip_emails(names)
@@ -0,0 +1,138 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import create_batch
+
+SALARY_SLIP_EMAIL_BATCH_SIZE = 50
+SALARY_SLIP_EMAIL_RETRIES = 3
+# seconds before the first retry, doubled for each one after it
+SALARY_SLIP_EMAIL_RETRY_BACKOFF = 2
+SALARY_SLIP_EMAIL_STATUS = "salary_slip_email_status"
+SALARY_SLIP_EMAIL_STATUS_EXPIRY = 7 * 24 * 60 * 60
+
+
+def enqueue_salary_slip_emails(
+	names: list[str],
+	batch_size: int = SALARY_SLIP_EMAIL_BATCH_SIZE,
+	payroll_entry: str | None = None,
+) -> str:
+	"""
+	Splits the salary slips into batches, each rendered and queued for emailing by its own
+	background job so that batches run in parallel on the available workers.
+
+	Returns the id of the run, to be passed to `get_salary_slip_email_status`. The latest run of
+	`payroll_entry` is also found by `get_payroll_entry_email_status`.
+	"""
+	run_id = frappe.generate_hash(length=10)
+	status_key = get_salary_slip_email_status_key(run_id)
+
+	frappe.cache().hset(
+		status_key,
+		"__run__",
+		{"total": len(names), "user": frappe.session.user, "payroll_entry": payroll_entry},
+	)
+	frappe.cache().expire(frappe.cache().make_key(status_key), SALARY_SLIP_EMAIL_STATUS_EXPIRY)
+	if payroll_entry:
+		frappe.cache().set_value(
+			get_payroll_entry_email_run_key(payroll_entry),
+			run_id,
+			expires_in_sec=SALARY_SLIP_EMAIL_STATUS_EXPIRY,
+		)
+
+	for batch in create_batch(names, batch_size):
+		frappe.enqueue(
+			email_salary_slip_batch,
+			queue="long",
+			timeout=batch_size * 60,
+			run_id=run_id,
+			names=batch,
+			enqueue_after_commit=True,
+			now=frappe.flags.in_test,
+		)
+
+	return run_id
+
+
+def email_salary_slip_batch(run_id: str, names: list[str]) -> None:
+	"""Renders and queues the emails of a batch of salary slips, retrying each slip on failure"""
+	payroll_settings = frappe.get_cached_doc("Payroll Settings")
+
+	for name in names:
+		for attempt in range(1, SALARY_SLIP_EMAIL_RETRIES + 1):
+			try:
+				email_args = frappe.get_doc("Salary Slip", name).get_email_args(payroll_settings)
+				if email_args:
+					frappe.sendmail(**email_args)
+				status = "Sent" if email_args else "Skipped"
+				break
+			except Exception:
+				if attempt == SALARY_SLIP_EMAIL_RETRIES:
+					frappe.log_error(
+						title=_("Salary Slip email failed"),
+						reference_doctype="Salary Slip",
+						reference_name=name,
+					)
+					status = "Failed"
+				else:
+					# give a mail server or database under load time to recover
+					time.sleep(SALARY_SLIP_EMAIL_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+		frappe.cache().hset(get_salary_slip_email_status_key(run_id), name, status)
+
+	# queued emails of the batch are kept even if a later batch fails
+	frappe.db.commit()  # nosemgrep
+
+	status = get_salary_slip_email_status(run_id)
+	frappe.publish_realtime("hrms:salary_slip_email_status", status, user=status["user"])
+
+
+@frappe.whitelist()
+def get_salary_slip_email_status(run_id: str) -> dict:
+	frappe.has_permission("Salary Slip", "read", throw=True)
+
+	status_key = get_salary_slip_email_status_key(run_id)
+	statuses = {
+		frappe.safe_decode(name): status
+		for name, status in frappe.cache().hgetall(status_key).items()
+	}
+	run = statuses.pop("__run__", None)
+	if not run:
+		frappe.throw(_("Salary slip email run {0} not found").format(run_id))
+
+	counts = {"Sent": 0, "Skipped": 0, "Failed": 0}
+	for status in statuses.values():
+		counts[status] += 1
+
+	return {
+		"run_id": run_id,
+		"user": run["user"],
+		"payroll_entry": run.get("payroll_entry"),
+		"total": run["total"],
+		"pending": run["total"] - len(statuses),
+		"sent": counts["Sent"],
+		"skipped": counts["Skipped"],
+		"failed": counts["Failed"],
+		"failed_salary_slips": [name for name, status in statuses.items() if status == "Failed"],
+	}
+
+
+@frappe.whitelist()
+def get_payroll_entry_email_status(payroll_entry: str) -> dict | None:
+	"""Returns the status of the latest salary slip email run of the payroll entry, if any"""
+	frappe.has_permission("Payroll Entry", "read", doc=payroll_entry, throw=True)
+
+	run_id = frappe.cache().get_value(get_payroll_entry_email_run_key(payroll_entry))
+	if run_id and frappe.cache().hget(get_salary_slip_email_status_key(run_id), "__run__"):
+		return get_salary_slip_email_status(run_id)
+
+
+def get_salary_slip_email_status_key(run_id: str) -> str:
+	return f"{SALARY_SLIP_EMAIL_STATUS}:{run_id}"
+
+
+def get_payroll_entry_email_run_key(payroll_entry: str) -> str:
+	return f"{SALARY_SLIP_EMAIL_STATUS}:payroll_entry:{payroll_entry}"
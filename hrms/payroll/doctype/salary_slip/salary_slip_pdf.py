@@ -0,0 +1,170 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import hashlib
+import re
+
+import frappe
+from frappe import _
+
+# seconds a render may hold the lock, well above the slowest wkhtmltopdf run
+SALARY_SLIP_PDF_LOCK_TIMEOUT = 10 * 60
+# seconds a request waits for a concurrent render before asking the client to retry
+SALARY_SLIP_PDF_LOCK_WAIT = 10
+# names of the stored renders, user attachments like "salary-slip-march.pdf" do not match
+SALARY_SLIP_PDF_FILE_NAME = re.compile(r"salary-slip-[0-9a-f]{20}\.pdf")
+
+
+class SalarySlipPDFRenderInProgressError(frappe.ValidationError):
+	http_status_code = 409
+
+
+def get_salary_slip_pdf(doc) -> bytes:
+	"""
+	Returns the stored PDF of a submitted salary slip, or renders the slip in its default print
+	format without storing it. Leaves the caller's transaction alone.
+	"""
+	print_format = get_salary_slip_print_format()
+	if doc.docstatus == 1:
+		file_name = get_salary_slip_pdf_file_name(doc, print_format)
+		if content := get_stored_salary_slip_pdf(doc.name, file_name):
+			return content
+
+	return render_salary_slip_pdf(doc, print_format)
+
+
+def get_or_store_salary_slip_pdf(doc) -> bytes:
+	"""
+	Returns the PDF of the salary slip in its default print format.
+
+	PDFs of submitted slips are rendered once and stored as a private file named after the slip,
+	its modified timestamp and the print format. Concurrent callers for a PDF not stored yet wait
+	briefly for a single render, and are asked to retry if it does not finish in time.
+
+	The transaction is rolled back before checking for a file stored by a concurrent render and
+	committed once the file is stored, so this is only called by `download_salary_slip` and the
+	render job, which own their transaction.
+	"""
+	print_format = get_salary_slip_print_format()
+	if doc.docstatus != 1:
+		return render_salary_slip_pdf(doc, print_format)
+
+	file_name = get_salary_slip_pdf_file_name(doc, print_format)
+	if content := get_stored_salary_slip_pdf(doc.name, file_name):
+		return content
+
+	cache = frappe.cache()
+	lock = cache.lock(cache.make_key(f"salary_slip_pdf:{file_name}"), SALARY_SLIP_PDF_LOCK_TIMEOUT)
+	if not lock.acquire(blocking_timeout=SALARY_SLIP_PDF_LOCK_WAIT):
+		frappe.throw(
+			_("The PDF of Salary Slip {0} is being generated. Please try again shortly.").format(
+				doc.name
+			),
+			SalarySlipPDFRenderInProgressError,
+		)
+
+	try:
+		# start a new transaction to see the file committed by a concurrent render
+		frappe.db.rollback()
+		if content := get_stored_salary_slip_pdf(doc.name, file_name):
+			return content
+
+		content = render_salary_slip_pdf(doc, print_format)
+		store_salary_slip_pdf(doc.name, file_name, content)
+		# make the file visible to the requests waiting for the lock
+		frappe.db.commit()  # nosemgrep
+	finally:
+		if lock.owned():
+			lock.release()
+
+	return content
+
+
+def get_salary_slip_pdf_etag(doc) -> str | None:
+	"""Returns the name of the file a submitted slip is stored as, it changes with the content"""
+	if doc.docstatus == 1:
+		return get_salary_slip_pdf_file_name(doc, get_salary_slip_print_format())
+
+
+def enqueue_salary_slip_pdf_render(salary_slip: str) -> None:
+	frappe.enqueue(
+		render_and_store_salary_slip_pdf,
+		queue="long",
+		salary_slip=salary_slip,
+		enqueue_after_commit=True,
+	)
+
+
+def render_and_store_salary_slip_pdf(salary_slip: str) -> None:
+	"""Renders the PDF of a submitted slip ahead of its first download"""
+	doc = frappe.get_doc("Salary Slip", salary_slip)
+	# cancelled before the job ran
+	if doc.docstatus == 1:
+		get_or_store_salary_slip_pdf(doc)
+
+
+def render_salary_slip_pdf(doc, print_format: str) -> bytes:
+	try:
+		return frappe.get_print("Salary Slip", doc.name, print_format, doc=doc, as_pdf=True)
+	except Exception:
+		frappe.log_error(
+			title=_("Salary Slip PDF render failed"),
+			reference_doctype="Salary Slip",
+			reference_name=doc.name,
+		)
+		frappe.throw(_("Failed to download Salary Slip PDF"))
+
+
+def get_salary_slip_print_format() -> str:
+	return frappe.get_meta("Salary Slip").default_print_format or "Standard"
+
+
+def get_salary_slip_pdf_file_name(doc, print_format: str) -> str:
+	key = frappe.as_json([doc.name, str(doc.modified), print_format])
+	return f"salary-slip-{hashlib.sha1(key.encode()).hexdigest()[:20]}.pdf"
+
+
+def get_stored_salary_slip_pdf(salary_slip: str, file_name: str) -> bytes | None:
+	file = frappe.db.get_value(
+		"File",
+		{
+			"attached_to_doctype": "Salary Slip",
+			"attached_to_name": salary_slip,
+			"file_name": file_name,
+		},
+	)
+	if not file:
+		return None
+
+	try:
+		return frappe.get_doc("File", file).get_content()
+	except OSError:
+		# missing from the disk, rendered again
+		return None
+
+
+def store_salary_slip_pdf(salary_slip: str, file_name: str, content: bytes) -> None:
+	# renders of earlier versions of the slip or print format are superseded
+	for file in frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": "Salary Slip",
+			"attached_to_name": salary_slip,
+			"file_name": ("like", "salary-slip-%.pdf"),
+			"is_private": 1,
+		},
+		fields=["name", "file_name"],
+	):
+		if SALARY_SLIP_PDF_FILE_NAME.fullmatch(file.file_name):
+			frappe.delete_doc("File", file.name, ignore_permissions=True)
+
+	frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"attached_to_doctype": "Salary Slip",
+			"attached_to_name": salary_slip,
+			"content": content,
+			"is_private": 1,
+		}
+	).insert(ignore_permissions=True)
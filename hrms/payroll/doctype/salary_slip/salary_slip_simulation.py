@@ -0,0 +1,291 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+from bisect import bisect_right
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, create_batch, getdate
+
+from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
+
+SIMULATION_OVERRIDE_FIELDS = ("base", "variable", "salary_structure", "income_tax_slab")
+SIMULATION_BATCH_SIZE = 100
+SALARY_SLIP_SIMULATION = "salary_slip_simulation"
+SALARY_SLIP_SIMULATION_EXPIRY = 24 * 60 * 60
+
+
+def simulate_salary_slips(
+	employees: list[str],
+	start_date: str,
+	end_date: str,
+	overrides: dict | None = None,
+	employee_overrides: dict | None = None,
+) -> list[dict]:
+	"""
+	Computes the salary slips of `employees` for every payroll period between `start_date` and
+	`end_date` as they would be with `overrides` applied to their salary structure assignment.
+	`employee_overrides` maps an employee to overrides applying only to them. Nothing is saved.
+
+	Overrides can set the `base`, `variable`, `salary_structure` and `income_tax_slab` of the
+	assignment in effect at the start of each period. The assignments, salary structures and
+	employee data are fetched once per employee and shared by all of their periods.
+	"""
+	overrides = validate_simulation_overrides(overrides)
+	employee_overrides = {
+		employee: validate_simulation_overrides(values)
+		for employee, values in (employee_overrides or {}).items()
+	}
+	assignments = get_salary_structure_assignments(employees, end_date)
+
+	results = []
+	frappe.db.savepoint(SALARY_SLIP_SIMULATION)
+	try:
+		for employee in employees:
+			if employee not in assignments:
+				results.append(
+					{"employee": employee, "error": _("No Salary Structure Assignment found")}
+				)
+				continue
+
+			results.extend(
+				simulate_employee_salary_slips(
+					employee,
+					assignments[employee],
+					start_date,
+					end_date,
+					{**overrides, **employee_overrides.get(employee, {})},
+				)
+			)
+	finally:
+		# the computation must not leave anything behind, even if some part of it writes
+		frappe.db.rollback(save_point=SALARY_SLIP_SIMULATION)
+
+	return results
+
+
+def simulate_employee_salary_slips(
+	employee: str, assignments: list[dict], start_date: str, end_date: str, overrides: dict
+) -> list[dict]:
+	"""`assignments` are the employee's assignments ordered by their from date"""
+	employee_doc = frappe.get_cached_doc("Employee", employee)
+	employee_data = employee_doc.get_valid_dict()
+	employee_data["doctype"] = employee_doc.doctype
+	date_of_joining = getdate(employee_doc.date_of_joining)
+	from_dates = [getdate(assignment.from_date) for assignment in assignments]
+
+	results = []
+	period_start = getdate(start_date)
+	while period_start <= getdate(end_date):
+		# the assignment a salary slip for the period would use; periods before the first
+		# assignment only take their payroll frequency from it
+		index = bisect_right(from_dates, max(period_start, date_of_joining)) - 1
+		assignment = frappe._dict({**assignments[max(index, 0)], **overrides})
+
+		salary_structure = frappe.get_cached_doc("Salary Structure", assignment.salary_structure)
+		if salary_structure.salary_slip_based_on_timesheet:
+			results.append(
+				{
+					"employee": employee,
+					"start_date": period_start,
+					"error": _("Timesheet based salary structures cannot be simulated"),
+				}
+			)
+			break
+
+		period_end = get_start_end_dates(
+			salary_structure.payroll_frequency, period_start, assignment.company
+		).end_date
+
+		if index < 0:
+			results.append(
+				{
+					"employee": employee,
+					"start_date": period_start,
+					"end_date": period_end,
+					"error": _("No Salary Structure Assignment applicable on {0}").format(
+						period_start
+					),
+				}
+			)
+			period_start = add_days(period_end, 1)
+			continue
+
+		salary_slip = frappe.new_doc("Salary Slip")
+		salary_slip.update(
+			{
+				"employee": employee,
+				"company": assignment.company,
+				"start_date": period_start,
+				"end_date": period_end,
+				"posting_date": period_end,
+				"salary_structure": salary_structure.name,
+				"payroll_frequency": salary_structure.payroll_frequency,
+			}
+		)
+		# read by the computation in place of its own per slip queries
+		salary_slip._salary_structure_assignment = assignment
+		salary_slip._salary_structure_doc = salary_structure
+		salary_slip._employee_data_for_eval = employee_data
+
+		try:
+			salary_slip.process_salary_structure(for_preview=1)
+		except Exception as e:
+			frappe.clear_messages()
+			results.append(
+				{
+					"employee": employee,
+					"start_date": period_start,
+					"end_date": period_end,
+					"error": str(e),
+				}
+			)
+			break
+
+		results.append(get_simulation_result(salary_slip))
+		period_start = add_days(period_end, 1)
+
+	return results
+
+
+def get_simulation_result(salary_slip) -> dict:
+	return {
+		"employee": salary_slip.employee,
+		"start_date": salary_slip.start_date,
+		"end_date": salary_slip.end_date,
+		"salary_structure": salary_slip.salary_structure,
+		"gross_pay": salary_slip.gross_pay,
+		"total_deduction": salary_slip.total_deduction,
+		"net_pay": salary_slip.net_pay,
+		"earnings": {d.salary_component: d.amount for d in salary_slip.earnings},
+		"deductions": {d.salary_component: d.amount for d in salary_slip.deductions},
+	}
+
+
+def validate_simulation_overrides(overrides: dict | None) -> dict:
+	overrides = overrides or {}
+	invalid_fields = set(overrides) - set(SIMULATION_OVERRIDE_FIELDS)
+	if invalid_fields:
+		frappe.throw(
+			_("Cannot override {0} in a salary slip simulation").format(
+				", ".join(frappe.bold(field) for field in sorted(invalid_fields))
+			)
+		)
+
+	return overrides
+
+
+def get_salary_structure_assignments(employees: list[str], date: str) -> dict[str, list[dict]]:
+	"""Returns the submitted assignments from on or before `date` of each employee"""
+	Assignment = frappe.qb.DocType("Salary Structure Assignment")
+	assignments = (
+		frappe.qb.from_(Assignment)
+		.select(Assignment.star)
+		.where(
+			(Assignment.employee.isin(employees))
+			& (Assignment.docstatus == 1)
+			& (Assignment.from_date <= date)
+		)
+		.orderby(Assignment.from_date)
+	).run(as_dict=True)
+
+	assignments_by_employee = {}
+	for assignment in assignments:
+		assignments_by_employee.setdefault(assignment.employee, []).append(assignment)
+
+	return assignments_by_employee
+
+
+@frappe.whitelist()
+def run_salary_slip_simulation(
+	employees: list[str] | str,
+	start_date: str,
+	end_date: str,
+	overrides: dict | str | None = None,
+	employee_overrides: dict | str | None = None,
+) -> str:
+	"""
+	Splits the employees into batches simulated by parallel background jobs and returns the id
+	of the run, to be passed to `get_salary_slip_simulation`.
+	"""
+	frappe.has_permission("Salary Slip", "create", throw=True)
+
+	employees = frappe.parse_json(employees)
+	validate_employee_permissions(employees)
+
+	run_id = frappe.generate_hash(length=10)
+	result_key = get_salary_slip_simulation_key(run_id)
+
+	run = {"total": len(employees), "owner": frappe.session.user}
+	frappe.cache().hset(result_key, "__run__", run)
+	frappe.cache().expire(frappe.cache().make_key(result_key), SALARY_SLIP_SIMULATION_EXPIRY)
+
+	for batch in create_batch(employees, SIMULATION_BATCH_SIZE):
+		frappe.enqueue(
+			simulate_salary_slip_batch,
+			queue="long",
+			timeout=3000,
+			run_id=run_id,
+			employees=batch,
+			start_date=start_date,
+			end_date=end_date,
+			overrides=frappe.parse_json(overrides),
+			employee_overrides=frappe.parse_json(employee_overrides),
+		)
+
+	return run_id
+
+
+def validate_employee_permissions(employees: list[str]) -> None:
+	permitted_employees = set(
+		frappe.get_list("Employee", filters={"name": ("in", employees)}, pluck="name")
+	)
+	not_permitted = [employee for employee in employees if employee not in permitted_employees]
+	if not_permitted:
+		frappe.throw(
+			_("Not permitted to simulate the salary of {0}").format(
+				", ".join(frappe.bold(employee) for employee in not_permitted)
+			),
+			frappe.PermissionError,
+		)
+
+
+def simulate_salary_slip_batch(
+	run_id, employees, start_date, end_date, overrides=None, employee_overrides=None
+) -> None:
+	results = simulate_salary_slips(employees, start_date, end_date, overrides, employee_overrides)
+
+	slips_by_employee = {employee: [] for employee in employees}
+	for result in results:
+		slips_by_employee[result["employee"]].append(result)
+
+	result_key = get_salary_slip_simulation_key(run_id)
+	for employee, slips in slips_by_employee.items():
+		frappe.cache().hset(result_key, employee, slips)
+
+
+@frappe.whitelist()
+def get_salary_slip_simulation(run_id: str) -> dict:
+	frappe.has_permission("Salary Slip", "create", throw=True)
+
+	result_key = get_salary_slip_simulation_key(run_id)
+	results = {
+		frappe.safe_decode(employee): slips
+		for employee, slips in frappe.cache().hgetall(result_key).items()
+	}
+	run = results.pop("__run__", None)
+	if not run:
+		frappe.throw(_("Salary slip simulation {0} not found").format(run_id))
+	if run["owner"] != frappe.session.user:
+		frappe.throw(_("Not Permitted"), frappe.PermissionError)
+
+	return {
+		"run_id": run_id,
+		"total": run["total"],
+		"pending": run["total"] - len(results),
+		"salary_slips": results,
+	}
+
+
+def get_salary_slip_simulation_key(run_id: str) -> str:
+	return f"{SALARY_SLIP_SIMULATION}:{run_id}"
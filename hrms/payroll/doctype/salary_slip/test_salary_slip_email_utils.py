@@ -0,0 +1,120 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hrms.payroll.doctype.salary_slip.salary_slip_email_utils import (
+    SALARY_SLIP_EMAIL_RETRIES,
+    SALARY_SLIP_EMAIL_RETRY_BACKOFF,
+    SALARY_SLIP_EMAIL_STATUS_EXPIRY,
+    email_salary_slip_batch,
+    enqueue_salary_slip_emails,
+    get_payroll_entry_email_run_key,
+    get_salary_slip_email_status,
+    get_salary_slip_email_status_key,
+)
+
+EMAIL_MODULE = "hrms.payroll.doctype.salary_slip.salary_slip_email_utils"
+# the error log of a failed slip is still inserted while `frappe.get_doc` is patched
+frappe_get_doc = frappe.get_doc
+
+
+class TestSalarySlipEmailUtils(FrappeTestCase):
+    def setUp(self):
+        # read before `frappe.get_doc` is patched
+        frappe.get_cached_doc("Payroll Settings")
+        self.attempts = {}
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_slips_are_emailed_in_batches(self):
+        names = [f"_Test Salary Slip {i}" for i in range(5)]
+
+        with patch(f"{EMAIL_MODULE}.frappe.enqueue") as enqueue:
+            run_id = enqueue_salary_slip_emails(names, batch_size=2)
+
+        self.assertEqual(
+            [call.kwargs["names"] for call in enqueue.call_args_list],
+            [names[:2], names[2:4], names[4:]],
+        )
+        self.assertEqual({call.kwargs["run_id"] for call in enqueue.call_args_list}, {run_id})
+
+        status = get_salary_slip_email_status(run_id)
+        self.assertEqual((status["total"], status["pending"]), (5, 5))
+
+    def test_failing_slips_are_retried_and_recorded(self):
+        names = ["_Test Sent Slip", "_Test Flaky Slip", "_Test Skipped Slip", "_Test Failed Slip"]
+
+        with patch(f"{EMAIL_MODULE}.frappe.enqueue"):
+            run_id = enqueue_salary_slip_emails(names, payroll_entry="_Test Payroll Entry")
+
+        with patch("frappe.get_doc", side_effect=self.get_doc), patch(
+            "frappe.sendmail"
+        ) as sendmail, patch(f"{EMAIL_MODULE}.time.sleep") as sleep, patch(
+            "frappe.publish_realtime"
+        ) as publish_realtime, patch.object(
+            frappe.db, "commit"
+        ):
+            email_salary_slip_batch(run_id, names)
+
+        self.assertEqual(self.attempts["_Test Flaky Slip"], 2)
+        self.assertEqual(self.attempts["_Test Failed Slip"], SALARY_SLIP_EMAIL_RETRIES)
+        self.assertEqual(sendmail.call_count, 2)
+        # backs off before each retry
+        self.assertEqual(
+            [call.args[0] for call in sleep.call_args_list],
+            [SALARY_SLIP_EMAIL_RETRY_BACKOFF]
+            + [
+                SALARY_SLIP_EMAIL_RETRY_BACKOFF * 2**attempt
+                for attempt in range(SALARY_SLIP_EMAIL_RETRIES - 1)
+            ],
+        )
+
+        status = get_salary_slip_email_status(run_id)
+        self.assertEqual(
+            (status["sent"], status["skipped"], status["failed"], status["pending"]),
+            (2, 1, 1, 0),
+        )
+        self.assertEqual(status["failed_salary_slips"], ["_Test Failed Slip"])
+        self.assertEqual(status["payroll_entry"], "_Test Payroll Entry")
+        publish_realtime.assert_called_once_with(
+            "hrms:salary_slip_email_status", status, user=frappe.session.user
+        )
+
+    def test_status_is_kept_for_a_limited_time(self):
+        with patch(f"{EMAIL_MODULE}.frappe.enqueue"):
+            run_id = enqueue_salary_slip_emails(
+                ["_Test Salary Slip"], payroll_entry="_Test Payroll Entry"
+            )
+
+        status_key = frappe.cache().make_key(get_salary_slip_email_status_key(run_id))
+        self.assertTrue(0 < frappe.cache().ttl(status_key) <= SALARY_SLIP_EMAIL_STATUS_EXPIRY)
+        # the payroll entry shows its latest run
+        self.assertEqual(
+            frappe.cache().get_value(get_payroll_entry_email_run_key("_Test Payroll Entry")),
+            run_id,
+        )
+
+        frappe.cache().delete_value(get_salary_slip_email_status_key(run_id))
+        self.assertRaises(frappe.ValidationError, get_salary_slip_email_status, run_id)
+
+    def get_doc(self, *args, **kwargs):
+        if args[:1] != ("Salary Slip",):
+            return frappe_get_doc(*args, **kwargs)
+
+        name = args[1]
+        return frappe._dict(get_email_args=lambda payroll_settings: self.get_email_args(name))
+
+    def get_email_args(self, name):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+        if name == "_Test Failed Slip" or (
+            name == "_Test Flaky Slip" and self.attempts[name] == 1
+        ):
+            raise frappe.ValidationError("Mail server unavailable")
+
+        if name != "_Test Skipped Slip":
+            return {"recipients": ["employee@example.com"], "subject": name}
@@ -0,0 +1,77 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_months, flt, getdate
+
+from hrms.payroll.doctype.employee_tax_exemption_declaration.test_employee_tax_exemption_declaration import (
+    create_payroll_period,
+)
+from hrms.payroll.doctype.salary_slip.salary_slip import get_salary_slip_ledger_key
+from hrms.payroll.doctype.salary_slip.test_salary_slip import create_tax_slab
+from hrms.payroll.doctype.salary_structure.salary_structure import make_salary_slip
+from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+from basic.setup.doctype.employee.test_employee import make_employee
+
+
+class TestSalarySlipLedger(FrappeTestCase):
+    def setUp(self):
+        for dt in ["Salary Slip", "Payroll Period", "Income Tax Slab"]:
+            frappe.db.delete(dt)
+
+        self.payroll_period = create_payroll_period(
+            name="_Test Payroll Period Salary Slip Ledger", company="_Test Company"
+        )
+        create_tax_slab(
+            self.payroll_period,
+            effective_date=self.payroll_period.start_date,
+            company="_Test Company",
+        )
+        self.employee = make_employee(
+            "test_salary_slip_ledger@salary.com",
+            company="_Test Company",
+            date_of_joining=add_days(self.payroll_period.start_date, -30),
+        )
+        self.salary_structure = make_salary_structure(
+            "Test Salary Slip Ledger",
+            "Monthly",
+            employee=self.employee,
+            company="_Test Company",
+            currency="INR",
+            payroll_period=self.payroll_period,
+            from_date=self.payroll_period.start_date,
+            test_tax=True,
+        )
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_submit_and_cancel_change_next_period_projection(self):
+        start_date = getdate(self.payroll_period.start_date)
+        first_slip = self.make_salary_slip(start_date)
+        next_slip = self.make_salary_slip(add_months(start_date, 1))
+        # caches the ledger without the first slip
+        self.assertEqual(next_slip.previous_taxable_earnings, 0)
+        self.assertIsNotNone(
+            frappe.cache().get_value(
+                get_salary_slip_ledger_key(self.employee, self.payroll_period)
+            )
+        )
+
+        first_slip.submit()
+        taxable_earnings = sum(flt(d.amount) for d in first_slip.earnings if d.is_tax_applicable)
+        self.assertGreater(taxable_earnings, 0)
+        next_slip.save()
+        self.assertEqual(flt(next_slip.previous_taxable_earnings), taxable_earnings)
+
+        first_slip.cancel()
+        next_slip.save()
+        self.assertEqual(next_slip.previous_taxable_earnings, 0)
+
+    def make_salary_slip(self, posting_date):
+        salary_slip = make_salary_slip(
+            self.salary_structure.name, employee=self.employee, posting_date=posting_date
+        )
+        salary_slip.insert()
+        return salary_slip
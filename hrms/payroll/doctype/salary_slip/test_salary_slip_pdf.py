@@ -0,0 +1,177 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days
+
+from hrms.payroll.doctype.salary_slip.salary_slip_pdf import (
+    SalarySlipPDFRenderInProgressError,
+    get_or_store_salary_slip_pdf,
+    get_salary_slip_pdf,
+)
+from hrms.payroll.doctype.salary_slip.test_salary_slip import (
+    make_deduction_salary_component,
+    make_earning_salary_component,
+    make_employee_salary_slip,
+    make_holiday_list,
+)
+from basic.setup.doctype.employee.test_employee import make_employee
+from basic.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
+
+PDF_MODULE = "hrms.payroll.doctype.salary_slip.salary_slip_pdf"
+
+
+class TestSalarySlipPDF(FrappeTestCase):
+    def setUp(self):
+        frappe.db.delete("Salary Slip")
+        make_earning_salary_component(setup=True, company_list=["_Test Company"])
+        make_deduction_salary_component(setup=True, company_list=["_Test Company"])
+        make_holiday_list()
+
+        self.employee = make_employee("test_salary_slip_pdf@salary.com", company="_Test Company")
+        self.renders = 0
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_draft_and_cancelled_slips_are_not_stored(self):
+        salary_slip = make_employee_salary_slip(self.employee, "Monthly", "Test Salary Slip PDF")
+
+        with patch("frappe.get_print", side_effect=self.render):
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-1")
+            self.assertEqual(self.get_stored_files(salary_slip), [])
+
+            salary_slip.submit()
+            salary_slip.cancel()
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-2")
+            self.assertEqual(self.get_stored_files(salary_slip), [])
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_stored_pdf_is_reused_until_slip_or_print_format_changes(self):
+        salary_slip = make_employee_salary_slip(self.employee, "Monthly", "Test Salary Slip PDF")
+        salary_slip.submit()
+
+        with patch("frappe.get_print", side_effect=self.render):
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-1")
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-1")
+            self.assertEqual(self.renders, 1)
+            files = self.get_stored_files(salary_slip)
+            self.assertEqual(len(files), 1)
+
+            # the slip changed
+            frappe.db.set_value(
+                "Salary Slip",
+                salary_slip.name,
+                "modified",
+                add_days(salary_slip.modified, 1),
+                update_modified=False,
+            )
+            salary_slip.reload()
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-2")
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-2")
+            self.assertEqual(self.renders, 2)
+            new_files = self.get_stored_files(salary_slip)
+            self.assertEqual(len(new_files), 1)
+            self.assertNotEqual(new_files, files)
+
+            # the default print format changed
+            with patch(
+                f"{PDF_MODULE}.get_salary_slip_print_format",
+                return_value="Test Salary Slip Format",
+            ):
+                self.assertEqual(self.get_pdf(salary_slip), b"%PDF-3")
+            self.assertEqual(len(self.get_stored_files(salary_slip)), 1)
+            self.assertNotEqual(self.get_stored_files(salary_slip), new_files)
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_shared_helper_leaves_transaction_alone(self):
+        salary_slip = make_employee_salary_slip(self.employee, "Monthly", "Test Salary Slip PDF")
+        salary_slip.submit()
+
+        with patch("frappe.get_print", side_effect=self.render), patch.object(
+            frappe.db, "commit"
+        ) as commit, patch.object(frappe.db, "rollback") as rollback:
+            # rendered but not stored
+            self.assertEqual(get_salary_slip_pdf(salary_slip), b"%PDF-1")
+            self.assertEqual(self.get_stored_files(salary_slip), [])
+
+            # served from the stored file once there is one
+            get_or_store_salary_slip_pdf(salary_slip)
+            commit.reset_mock()
+            rollback.reset_mock()
+            self.assertEqual(get_salary_slip_pdf(salary_slip), b"%PDF-2")
+            self.assertEqual(self.renders, 2)
+
+        commit.assert_not_called()
+        rollback.assert_not_called()
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_user_attachments_are_kept(self):
+        salary_slip = make_employee_salary_slip(self.employee, "Monthly", "Test Salary Slip PDF")
+        salary_slip.submit()
+        frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": "salary-slip-march.pdf",
+                "attached_to_doctype": "Salary Slip",
+                "attached_to_name": salary_slip.name,
+                "content": b"%PDF-attached",
+                "is_private": 1,
+            }
+        ).insert()
+
+        with patch("frappe.get_print", side_effect=self.render):
+            self.get_pdf(salary_slip)
+            frappe.db.set_value(
+                "Salary Slip",
+                salary_slip.name,
+                "modified",
+                add_days(salary_slip.modified, 1),
+                update_modified=False,
+            )
+            salary_slip.reload()
+            self.get_pdf(salary_slip)
+
+        files = self.get_stored_files(salary_slip)
+        self.assertEqual(len(files), 2)
+        self.assertIn("salary-slip-march.pdf", files)
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_concurrent_requests_render_once(self):
+        salary_slip = make_employee_salary_slip(self.employee, "Monthly", "Test Salary Slip PDF")
+        salary_slip.submit()
+
+        def render_with_concurrent_request(*args, **kwargs):
+            # a request for the same PDF arriving while it is rendered
+            with self.assertRaises(SalarySlipPDFRenderInProgressError):
+                get_or_store_salary_slip_pdf(salary_slip)
+            return self.render()
+
+        with patch("frappe.get_print", side_effect=render_with_concurrent_request), patch(
+            f"{PDF_MODULE}.SALARY_SLIP_PDF_LOCK_WAIT", 0.1
+        ):
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-1")
+            # the retried request gets the stored PDF
+            self.assertEqual(self.get_pdf(salary_slip), b"%PDF-1")
+
+        self.assertEqual(self.renders, 1)
+
+    def render(self, *args, **kwargs):
+        self.renders += 1
+        return f"%PDF-{self.renders}".encode()
+
+    def get_pdf(self, salary_slip):
+        # the test runs in a single transaction
+        with patch.object(frappe.db, "commit"), patch.object(frappe.db, "rollback"):
+            return get_or_store_salary_slip_pdf(salary_slip)
+
+    def get_stored_files(self, salary_slip):
+        return frappe.get_all(
+            "File",
+            filters={"attached_to_doctype": "Salary Slip", "attached_to_name": salary_slip.name},
+            pluck="file_name",
+        )
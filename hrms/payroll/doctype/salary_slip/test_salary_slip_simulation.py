@@ -0,0 +1,131 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.permissions import add_user_permission
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_months, get_first_day, get_last_day, getdate
+
+from hrms.payroll.doctype.salary_slip.salary_slip_simulation import (
+    get_salary_slip_simulation,
+    run_salary_slip_simulation,
+    simulate_salary_slips,
+)
+from hrms.payroll.doctype.salary_slip.test_salary_slip import make_holiday_list
+from hrms.payroll.doctype.salary_structure.test_salary_structure import (
+    create_salary_structure_assignment,
+    make_salary_structure,
+)
+from basic.setup.doctype.employee.test_employee import make_employee
+from basic.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
+
+
+class TestSalarySlipSimulation(FrappeTestCase):
+    def setUp(self):
+        frappe.db.delete("Salary Slip")
+        make_holiday_list()
+
+        self.start_date = get_first_day(add_months(getdate(), -4))
+        self.employee = make_employee(
+            "test_salary_slip_simulation@salary.com",
+            company="_Test Company",
+            date_of_joining=add_months(self.start_date, -12),
+        )
+        self.salary_structure = make_salary_structure(
+            "Test Salary Slip Simulation", "Monthly", company="_Test Company", currency="INR"
+        )
+        # a raise from the third month
+        for months, base in ((0, 50000), (2, 100000)):
+            create_salary_structure_assignment(
+                self.employee,
+                self.salary_structure.name,
+                from_date=add_months(self.start_date, months),
+                company="_Test Company",
+                currency="INR",
+                base=base,
+                allow_duplicate=True,
+            )
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        frappe.db.rollback()
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_assignment_is_resolved_per_period(self):
+        results = simulate_salary_slips(
+            [self.employee], self.start_date, get_last_day(add_months(self.start_date, 3))
+        )
+
+        self.assertEqual(
+            [getdate(result["start_date"]) for result in results],
+            [add_months(self.start_date, months) for months in range(4)],
+        )
+        self.assertFalse([result for result in results if result.get("error")])
+
+        gross_pay = [result["gross_pay"] for result in results]
+        self.assertEqual(gross_pay[0], gross_pay[1])
+        self.assertEqual(gross_pay[2], gross_pay[3])
+        self.assertGreater(gross_pay[2], gross_pay[0])
+        self.assertEqual(frappe.db.count("Salary Slip", {"employee": self.employee}), 0)
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_overrides(self):
+        end_date = get_last_day(self.start_date)
+        simulated_raise = simulate_salary_slips(
+            [self.employee],
+            self.start_date,
+            end_date,
+            employee_overrides={self.employee: {"base": 100000}},
+        )
+        raised = simulate_salary_slips(
+            [self.employee],
+            add_months(self.start_date, 2),
+            get_last_day(add_months(self.start_date, 2)),
+        )
+        self.assertEqual(simulated_raise[0]["gross_pay"], raised[0]["gross_pay"])
+
+        # overrides for everyone apply below the per employee ones
+        results = simulate_salary_slips(
+            [self.employee],
+            self.start_date,
+            end_date,
+            overrides={"base": 50000},
+            employee_overrides={self.employee: {"base": 100000}},
+        )
+        self.assertEqual(results[0]["gross_pay"], raised[0]["gross_pay"])
+
+        self.assertRaises(
+            frappe.ValidationError,
+            simulate_salary_slips,
+            [self.employee],
+            self.start_date,
+            end_date,
+            overrides={"payroll_payable_account": "Payroll Payable - _TC"},
+        )
+
+    def test_runs_are_scoped_to_permitted_employees_and_requesting_user(self):
+        user = "test_salary_slip_simulation_user@salary.com"
+        user_employee = make_employee(user, company="_Test Company")
+        frappe.get_doc("User", user).add_roles("HR Manager")
+        add_user_permission("Employee", user_employee, user)
+
+        frappe.set_user(user)
+        with patch("frappe.enqueue") as enqueue:
+            self.assertRaises(
+                frappe.PermissionError,
+                run_salary_slip_simulation,
+                [self.employee],
+                self.start_date,
+                get_last_day(self.start_date),
+            )
+            run_id = run_salary_slip_simulation(
+                [user_employee], self.start_date, get_last_day(self.start_date)
+            )
+            enqueue.assert_called_once()
+
+        self.assertEqual(get_salary_slip_simulation(run_id)["pending"], 1)
+
+        frappe.set_user("Administrator")
+        self.assertRaises(frappe.PermissionError, get_salary_slip_simulation, run_id)
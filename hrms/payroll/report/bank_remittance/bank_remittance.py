@@ -5,7 +5,10 @@
 import frappe
 from frappe import _, get_all
 
+from hrms.payroll.utils import cache_payroll_report
 
+
+@cache_payroll_report
 def execute(filters=None):
 	columns = [
 		{
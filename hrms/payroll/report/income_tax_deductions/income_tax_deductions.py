@@ -6,10 +6,13 @@ import frappe
 from frappe import _
 from frappe.query_builder.functions import Extract
 
+from hrms.payroll.utils import cache_payroll_report
+
 
 Filters = frappe._dict
 
 
+@cache_payroll_report
 def execute(filters: Filters = None) -> tuple:
 	columns = get_columns()
 	data = get_data(filters, is_indian_company)
@@ -6,7 +6,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate
 
+from hrms.payroll.utils import cache_payroll_report
 
+
+@cache_payroll_report
 def execute(filters=None):
 	data = get_data(filters)
 	columns = get_columns(filters) if len(data) else []
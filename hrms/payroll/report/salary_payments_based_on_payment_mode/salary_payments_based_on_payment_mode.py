@@ -7,8 +7,10 @@ from frappe import _
 
 
 from hrms.payroll.report.provident_fund_deductions.provident_fund_deductions import get_conditions
+from hrms.payroll.utils import cache_payroll_report
 
 
+@cache_payroll_report
 def execute(filters=None):
     mode_of_payments = get_payment_modes()
 
@@ -52,4 +52,17 @@ frappe.query_reports['Salary Register'] = {
       width: '100px',
     },
   ],
+
+  onload: function (report) {
+    report.page.add_inner_button(__('Export CSV'), function () {
+      frappe.call({
+        method: 'hrms.payroll.report.salary_register.salary_register.export_salary_register',
+        args: { filters: report.get_filter_values() },
+      });
+    });
+
+    frappe.realtime.on('hrms:salary_register_exported', function (data) {
+      window.open(data.file_url);
+    });
+  },
 };
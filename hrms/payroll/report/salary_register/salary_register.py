@@ -2,107 +2,207 @@
 # License: GNU General Public License v3. See license.txt
 
 
+import csv
+
 import frappe
 from frappe import _
 from frappe.utils import flt
 
+import hrms
+from hrms.payroll.utils import cache_payroll_report
+
 
 salary_slip = frappe.qb.DocType("Salary Slip")
 salary_detail = frappe.qb.DocType("Salary Detail")
 salary_component = frappe.qb.DocType("Salary Component")
 
 
+SALARY_REGISTER_CHUNK_SIZE = 1000
+SALARY_SLIP_FIELDS = (
+    "name",
+    "employee",
+    "employee_name",
+    "branch",
+    "department",
+    "designation",
+    "company",
+    "start_date",
+    "end_date",
+    "leave_without_pay",
+    "payment_days",
+    "total_loan_repayment",
+    "gross_pay",
+    "total_deduction",
+    "net_pay",
+    "exchange_rate",
+)
+
+
+@cache_payroll_report
 def execute(filters=None):
     if not filters:
         filters = {}
 
-    currency = None
-    if filters.get("currency"):
-        currency = filters.get("currency")
     company_currency = hrms.get_company_currency(filters.get("company"))
 
-    salary_slips = get_salary_slips(filters, company_currency)
-    if not salary_slips:
-        return [], []
-
-    earning_types, ded_types = get_earning_and_deduction_types(salary_slips)
+    earning_types, ded_types = get_earning_and_deduction_types(filters, company_currency)
     columns = get_columns(earning_types, ded_types)
 
-    ss_earning_map = get_salary_slip_details(salary_slips, currency, company_currency, "earnings")
-    ss_ded_map = get_salary_slip_details(salary_slips, currency, company_currency, "deductions")
+    data = []
+    for rows in get_salary_register_rows(filters, earning_types, ded_types, company_currency):
+        for row in rows:
+            update_column_width(row, columns)
+        data.extend(rows)
 
-    doj_map = get_employee_doj_map()
+    if not data:
+        return [], []
 
-    data = []
-    for ss in salary_slips:
-        row = {
-            "salary_slip_id": ss.name,
-            "employee": ss.employee,
-            "employee_name": ss.employee_name,
-            "data_of_joining": doj_map.get(ss.employee),
-            "branch": ss.branch,
-            "department": ss.department,
-            "designation": ss.designation,
-            "company": ss.company,
-            "start_date": ss.start_date,
-            "end_date": ss.end_date,
-            "leave_without_pay": ss.leave_without_pay,
-            "payment_days": ss.payment_days,
-            "currency": currency or company_currency,
-            "total_loan_repayment": ss.total_loan_repayment,
-        }
+    return columns, data
 
-        update_column_width(ss, columns)
 
-        for e in earning_types:
-            row.update({frappe.scrub(e): ss_earning_map.get(ss.name, {}).get(e)})
+def get_salary_register_rows(filters, earning_types, ded_types, company_currency):
+    """Yields register rows one chunk of salary slips at a time"""
+    currency = filters.get("currency")
 
-        for d in ded_types:
-            row.update({frappe.scrub(d): ss_ded_map.get(ss.name, {}).get(d)})
+    for salary_slips in get_salary_slips_in_chunks(filters, company_currency):
+        ss_earning_map = get_salary_slip_details(
+            salary_slips, currency, company_currency, "earnings"
+        )
+        ss_ded_map = get_salary_slip_details(
+            salary_slips, currency, company_currency, "deductions"
+        )
+        doj_map = get_employee_doj_map({ss.employee for ss in salary_slips})
+
+        rows = []
+        for ss in salary_slips:
+            row = {
+                "salary_slip_id": ss.name,
+                "employee": ss.employee,
+                "employee_name": ss.employee_name,
+                "data_of_joining": doj_map.get(ss.employee),
+                "branch": ss.branch,
+                "department": ss.department,
+                "designation": ss.designation,
+                "company": ss.company,
+                "start_date": ss.start_date,
+                "end_date": ss.end_date,
+                "leave_without_pay": ss.leave_without_pay,
+                "payment_days": ss.payment_days,
+                "currency": currency or company_currency,
+                "total_loan_repayment": ss.total_loan_repayment,
+            }
 
-        if currency == company_currency:
-            row.update(
-                {
-                    "gross_pay": flt(ss.gross_pay) * flt(ss.exchange_rate),
-                    "total_deduction": flt(ss.total_deduction) * flt(ss.exchange_rate),
-                    "net_pay": flt(ss.net_pay) * flt(ss.exchange_rate),
-                }
-            )
+            for e in earning_types:
+                row.update({frappe.scrub(e): ss_earning_map.get(ss.name, {}).get(e)})
+
+            for d in ded_types:
+                row.update({frappe.scrub(d): ss_ded_map.get(ss.name, {}).get(d)})
+
+            if currency == company_currency:
+                row.update(
+                    {
+                        "gross_pay": flt(ss.gross_pay) * flt(ss.exchange_rate),
+                        "total_deduction": flt(ss.total_deduction) * flt(ss.exchange_rate),
+                        "net_pay": flt(ss.net_pay) * flt(ss.exchange_rate),
+                    }
+                )
+
+            else:
+                row.update(
+                    {
+                        "gross_pay": ss.gross_pay,
+                        "total_deduction": ss.total_deduction,
+                        "net_pay": ss.net_pay,
+                    }
+                )
+
+            rows.append(row)
+
+        yield rows
+
+
+@frappe.whitelist()
+def export_salary_register(filters):
+    frappe.has_permission("Salary Slip", "export", throw=True)
+
+    frappe.enqueue(
+        build_salary_register_export,
+        queue="long",
+        timeout=3000,
+        filters=frappe.parse_json(filters),
+        user=frappe.session.user,
+    )
+    frappe.msgprint(
+        _("The Salary Register is being exported. You will be notified once the file is ready."),
+        alert=True,
+    )
 
-        else:
-            row.update(
-                {
-                    "gross_pay": ss.gross_pay,
-                    "total_deduction": ss.total_deduction,
-                    "net_pay": ss.net_pay,
-                }
-            )
 
-        data.append(row)
+def build_salary_register_export(filters, user):
+    """Writes the register to a private CSV file chunk by chunk and notifies `user` when done"""
+    filters = frappe._dict(filters)
+    company_currency = hrms.get_company_currency(filters.get("company"))
 
-    return columns, data
+    earning_types, ded_types = get_earning_and_deduction_types(filters, company_currency)
+    columns = [
+        column for column in get_columns(earning_types, ded_types) if not column.get("hidden")
+    ]
 
+    file_name = f"salary_register_{frappe.generate_hash(length=10)}.csv"
+    with open(frappe.get_site_path("private", "files", file_name), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([column["label"] for column in columns])
 
-def get_earning_and_deduction_types(salary_slips):
-    salary_component_and_type = {_("Earning"): [], _("Deduction"): []}
+        for rows in get_salary_register_rows(filters, earning_types, ded_types, company_currency):
+            writer.writerows([row.get(column["fieldname"]) for column in columns] for row in rows)
 
-    for salary_compoent in get_salary_components(salary_slips):
-        component_type = get_salary_component_type(salary_compoent)
-        salary_component_and_type[_(component_type)].append(salary_compoent)
+    file = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": file_name,
+            "file_url": f"/private/files/{file_name}",
+            "is_private": 1,
+        }
+    ).insert(ignore_permissions=True)
 
-    return sorted(salary_component_and_type[_("Earning")]), sorted(
-        salary_component_and_type[_("Deduction")]
+    frappe.publish_realtime(
+        "hrms:salary_register_exported",
+        {"file_url": file.file_url},
+        user=user,
+        after_commit=True,
     )
 
 
-def update_column_width(ss, columns):
-    if ss.branch is not None:
+def get_earning_and_deduction_types(filters, company_currency):
+    salary_slips = get_salary_slip_query(filters, company_currency).select(salary_slip.name)
+
+    components = (
+        frappe.qb.from_(salary_detail)
+        .join(salary_component)
+        .on(salary_detail.salary_component == salary_component.name)
+        .where((salary_detail.amount != 0) & (salary_detail.parent.isin(salary_slips)))
+        .select(salary_detail.salary_component, salary_component.type)
+        .distinct()
+    ).run()
+
+    earning_types, ded_types = [], []
+    for component, component_type in components:
+        if component_type == "Earning":
+            earning_types.append(component)
+        else:
+            ded_types.append(component)
+
+    return sorted(earning_types), sorted(ded_types)
+
+
+def update_column_width(row, columns):
+    if row["branch"] is not None:
         columns[3].update({"width": 120})
-    if ss.department is not None:
+    if row["department"] is not None:
         columns[4].update({"width": 120})
-    if ss.designation is not None:
+    if row["designation"] is not None:
         columns[5].update({"width": 120})
-    if ss.leave_without_pay is not None:
+    if row["leave_without_pay"] is not None:
         columns[9].update({"width": 120})
 
 
@@ -255,26 +355,10 @@ def get_columns(earning_types, ded_types):
     return columns
 
 
-def get_salary_components(salary_slips):
-    return (
-        frappe.qb.from_(salary_detail)
-        .where(
-            (salary_detail.amount != 0)
-            & (salary_detail.parent.isin([d.name for d in salary_slips]))
-        )
-        .select(salary_detail.salary_component)
-        .distinct()
-    ).run(pluck=True)
-
-
-def get_salary_component_type(salary_component):
-    return frappe.db.get_value("Salary Component", salary_component, "type", cache=True)
-
-
-def get_salary_slips(filters, company_currency):
+def get_salary_slip_query(filters, company_currency):
     doc_status = {"Draft": 0, "Submitted": 1, "Cancelled": 2}
 
-    query = frappe.qb.from_(salary_slip).select(salary_slip.star)
+    query = frappe.qb.from_(salary_slip)
 
     if filters.get("docstatus"):
         query = query.where(salary_slip.docstatus == doc_status[filters.get("docstatus")])
@@ -294,15 +378,43 @@ def get_salary_slips(filters, company_currency):
     if filters.get("currency") and filters.get("currency") != company_currency:
         query = query.where(salary_slip.currency == filters.get("currency"))
 
-    salary_slips = query.run(as_dict=1)
+    return query
+
+
+def get_salary_slips_in_chunks(filters, company_currency, chunk_size=SALARY_REGISTER_CHUNK_SIZE):
+    """Yields salary slips in name order, paginated on the name so each chunk is one indexed read"""
+    last_name = None
 
-    return salary_slips or []
+    while True:
+        query = (
+            get_salary_slip_query(filters, company_currency)
+            .select(*SALARY_SLIP_FIELDS)
+            .orderby(salary_slip.name)
+            .limit(chunk_size)
+        )
+        if last_name:
+            query = query.where(salary_slip.name > last_name)
+
+        salary_slips = query.run(as_dict=1)
+        if not salary_slips:
+            return
+
+        yield salary_slips
 
+        if len(salary_slips) < chunk_size:
+            return
 
-def get_employee_doj_map():
+        last_name = salary_slips[-1].name
+
+
+def get_employee_doj_map(employees):
     employee = frappe.qb.DocType("Employee")
 
-    result = (frappe.qb.from_(employee).select(employee.name, employee.date_of_joining)).run()
+    result = (
+        frappe.qb.from_(employee)
+        .select(employee.name, employee.date_of_joining)
+        .where(employee.name.isin(list(employees)))
+    ).run()
 
     return frappe._dict(result)
 
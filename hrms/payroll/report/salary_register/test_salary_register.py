@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.permissions import add_user_permission
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_first_day, get_last_day, getdate
+
+from hrms.payroll.doctype.salary_slip.test_salary_slip import make_holiday_list
+from hrms.payroll.doctype.salary_structure.salary_structure import make_salary_slip
+from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+from hrms.payroll.report.salary_register.salary_register import execute, get_salary_register_rows
+from hrms.payroll.utils import clear_payroll_report_cache, get_payroll_report_cache_key
+from basic.setup.doctype.employee.test_employee import make_employee
+from basic.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
+
+REPORT_MODULE = "hrms.payroll.report.salary_register.salary_register"
+
+
+class TestSalaryRegister(FrappeTestCase):
+    def setUp(self):
+        frappe.db.delete("Salary Slip")
+        make_holiday_list()
+
+        self.start_date = get_first_day(getdate())
+        self.filters = frappe._dict(
+            company="_Test Company",
+            from_date=self.start_date,
+            to_date=get_last_day(self.start_date),
+            currency="INR",
+        )
+        clear_payroll_report_cache("_Test Company", getdate("1900-01-01"), getdate("2100-12-31"))
+
+        self.employee = make_employee("test_salary_register@salary.com", company="_Test Company")
+        self.salary_structure = make_salary_structure(
+            "Test Salary Register",
+            "Monthly",
+            employee=self.employee,
+            company="_Test Company",
+            currency="INR",
+        )
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        frappe.db.rollback()
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_cached_results_are_reused(self):
+        computed, result = self.run_report()
+        self.assertTrue(computed)
+
+        computed, cached_result = self.run_report()
+        self.assertFalse(computed)
+        self.assertEqual(cached_result, result)
+
+    @set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+    def test_salary_slip_changes_invalidate_cached_results(self):
+        filters = frappe._dict(self.filters, docstatus="Submitted")
+        self.assertEqual(self.run_report(filters)[1][1], [])
+
+        salary_slip = make_salary_slip(
+            self.salary_structure.name, employee=self.employee, posting_date=self.start_date
+        )
+        salary_slip.insert()
+        # draft slips are listed without the docstatus filter
+        computed, (_columns, data) = self.run_report()
+        self.assertTrue(computed)
+        self.assertEqual([row["salary_slip_id"] for row in data], [salary_slip.name])
+
+        self.run_report()
+        salary_slip.save()
+        self.assertTrue(self.run_report()[0])
+
+        salary_slip.submit()
+        computed, (_columns, data) = self.run_report(filters)
+        self.assertTrue(computed)
+        self.assertEqual([row["salary_slip_id"] for row in data], [salary_slip.name])
+
+        salary_slip.cancel()
+        computed, (_columns, data) = self.run_report(filters)
+        self.assertTrue(computed)
+        self.assertEqual(data, [])
+
+    def test_cache_key_is_permission_scoped(self):
+        self.run_report()
+        admin_key = get_payroll_report_cache_key(REPORT_MODULE, self.filters)
+
+        user = "test_salary_register@salary.com"
+        frappe.get_doc("User", user).add_roles("HR Manager")
+        frappe.set_user(user)
+        user_key = get_payroll_report_cache_key(REPORT_MODULE, self.filters)
+        self.assertNotEqual(user_key, admin_key)
+        # not served the results cached for another user
+        self.assertTrue(self.run_report()[0])
+
+        frappe.set_user("Administrator")
+        add_user_permission("Employee", self.employee, user)
+        frappe.set_user(user)
+        self.assertNotIn(
+            get_payroll_report_cache_key(REPORT_MODULE, self.filters), (admin_key, user_key)
+        )
+
+    def run_report(self, filters=None):
+        """Returns whether the report was computed instead of served from the cache and its result"""
+        with patch(
+            f"{REPORT_MODULE}.get_salary_register_rows", wraps=get_salary_register_rows
+        ) as get_rows:
+            result = execute(filters or self.filters)
+
+        return get_rows.called, result
@@ -1,4 +1,15 @@
+import functools
+import hashlib
+from datetime import date
+
 import frappe
+from frappe.permissions import get_user_permissions
+from frappe.utils import cint, cstr, get_last_day, getdate
+
+PAYROLL_REPORT_CACHE_INDEX = "payroll_report_cache_index"
+PAYROLL_REPORT_CACHE_TTL = 10 * 60
+PAYROLL_REPORT_CACHE_MAX_ENTRIES = 50
+PAYROLL_REPORT_CACHE_MAX_ROWS = 20000
 
 
 def sanitize_expression(string: str | None = None) -> str | None:
@@ -39,3 +50,119 @@ def get_payroll_settings_for_payment_days() -> dict:
 		],
 		as_dict=True,
 	)
+
+
+def cache_payroll_report(execute):
+	"""
+	Serves a payroll report's `execute` from a shared cache.
+
+	Results are keyed by the normalised filters and the permission scope of the caller and
+	expire after `PAYROLL_REPORT_CACHE_TTL` seconds. Each company keeps at most
+	`PAYROLL_REPORT_CACHE_MAX_ENTRIES` results and results larger than
+	`PAYROLL_REPORT_CACHE_MAX_ROWS` rows are not cached at all. Saving, submitting, cancelling
+	or deleting a salary slip drops the results overlapping its company and period.
+	"""
+
+	@functools.wraps(execute)
+	def wrapper(filters=None):
+		filters = frappe._dict(filters or {})
+		key = get_payroll_report_cache_key(execute.__module__, filters)
+
+		result = frappe.cache().get_value(key)
+		if result is not None:
+			return result
+
+		result = execute(filters)
+		if len(result[1] or []) <= PAYROLL_REPORT_CACHE_MAX_ROWS:
+			frappe.cache().set_value(key, result, expires_in_sec=PAYROLL_REPORT_CACHE_TTL)
+			add_to_payroll_report_cache_index(key, filters)
+
+		return result
+
+	return wrapper
+
+
+def get_payroll_report_cache_key(report: str, filters: dict) -> str:
+	normalised_filters = {
+		fieldname: cstr(value) for fieldname, value in filters.items() if value not in (None, "")
+	}
+	digest = hashlib.sha1(
+		frappe.as_json([report, normalised_filters, get_permission_scope()]).encode()
+	).hexdigest()
+
+	return f"payroll_report_cache:{digest}"
+
+
+def get_permission_scope(user: str | None = None) -> dict:
+	"""Returns everything that decides which records `user` may see in a report"""
+	user = user or frappe.session.user
+	user_permissions = get_user_permissions(user)
+
+	return {
+		"roles": sorted(frappe.get_roles(user)),
+		"user_permissions": {
+			doctype: sorted((perm.get("doc"), perm.get("applicable_for") or "") for perm in perms)
+			for doctype, perms in user_permissions.items()
+		},
+	}
+
+
+def get_payroll_report_period(filters: dict) -> tuple[date | None, date | None]:
+	"""Returns the salary slip period covered by the report filters, `None` for an open end"""
+	if filters.get("from_date") or filters.get("to_date"):
+		from_date, to_date = filters.get("from_date"), filters.get("to_date")
+		return (getdate(from_date) if from_date else None, getdate(to_date) if to_date else None)
+
+	if filters.get("year"):
+		year = cint(filters.year)
+		if filters.get("month"):
+			start_date = date(year, cint(filters.month), 1)
+			return start_date, get_last_day(start_date)
+
+		return date(year, 1, 1), date(year, 12, 31)
+
+	return None, None
+
+
+def add_to_payroll_report_cache_index(key: str, filters: dict) -> None:
+	company = filters.get("company") or ""
+	from_date, to_date = get_payroll_report_period(filters)
+
+	entries = [
+		entry
+		for entry in frappe.cache().hget(PAYROLL_REPORT_CACHE_INDEX, company) or []
+		if entry["key"] != key
+	]
+	entries.append({"key": key, "from_date": from_date, "to_date": to_date})
+
+	evicted = entries[:-PAYROLL_REPORT_CACHE_MAX_ENTRIES]
+	if evicted:
+		frappe.cache().delete_value([entry["key"] for entry in evicted])
+
+	frappe.cache().hset(
+		PAYROLL_REPORT_CACHE_INDEX, company, entries[-PAYROLL_REPORT_CACHE_MAX_ENTRIES:]
+	)
+
+
+def clear_payroll_report_cache(company: str, from_date: date, to_date: date) -> None:
+	"""Drops cached report results of `company` (or of all companies) overlapping the period"""
+	from_date, to_date = getdate(from_date), getdate(to_date)
+
+	for bucket in (company, ""):
+		entries = frappe.cache().hget(PAYROLL_REPORT_CACHE_INDEX, bucket)
+		if not entries:
+			continue
+
+		stale = [
+			entry
+			for entry in entries
+			if (not entry["from_date"] or entry["from_date"] <= to_date)
+			and (not entry["to_date"] or entry["to_date"] >= from_date)
+		]
+		if not stale:
+			continue
+
+		frappe.cache().delete_value([entry["key"] for entry in stale])
+		frappe.cache().hset(
+			PAYROLL_REPORT_CACHE_INDEX, bucket, [entry for entry in entries if entry not in stale]
+		)
@@ -87,6 +87,44 @@ def daterange(start_date, end_date):
         yield start_date + timedelta(n)
 
 
+def make_series_names(naming_series: str, count: int, digits: int = 5) -> list[str]:
+    """Returns `count` consecutive names of a naming series (like "HR-ATT-.YYYY.-.#####"),
+    reserved with a single update of the series counter instead of one update per name.
+
+    Hashes are only supported as the last part of the series, without them names have `digits`
+    digits."""
+    from frappe.model.naming import parse_naming_series
+
+    parts = naming_series.split(".")
+    if parts[-1] and not parts[-1].strip("#"):
+        # the counter, like ".#####"
+        digits = len(parts.pop())
+        naming_series = ".".join(parts)
+
+    if "#" in naming_series:
+        frappe.throw(_("Naming Series {0} is not supported").format(frappe.bold(naming_series)))
+
+    prefix = parse_naming_series(naming_series)
+    Series = DocType("Series")
+
+    current = (
+        frappe.qb.from_(Series).select(Series.current).where(Series.name == prefix).for_update()
+    ).run()
+
+    if current and current[0][0] is not None:
+        start = cint(current[0][0])
+        (
+            frappe.qb.update(Series)
+            .set(Series.current, start + count)
+            .where(Series.name == prefix)
+        ).run()
+    else:
+        start = 0
+        frappe.qb.into(Series).columns(Series.name, Series.current).insert(prefix, count).run()
+
+    return [prefix + str(start + i).zfill(digits) for i in range(1, count + 1)]
+
+
 def get_period_list(
     from_fiscal_year,
     to_fiscal_year,
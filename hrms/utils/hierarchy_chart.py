@@ -14,6 +14,10 @@ def get_all_nodes(method, company):
 	if method not in frappe.whitelisted:
 		frappe.throw(_("Not Permitted"), frappe.PermissionError)
 
+	# charts that can build all of their nodes at once skip the walk below
+	if get_chart_nodes := getattr(frappe.get_module(method.__module__), "get_all_nodes", None):
+		return get_chart_nodes(company)
+
 	root_nodes = method(company=company)
 	result = []
 	nodes_to_expand = []
@@ -22,6 +22,9 @@ def get_holiday_dates_between(
 
 
 def invalidate_cache(doc, method=None):
+	from hrms.hr.doctype.leave_application.leave_application import clear_leave_calendar_cache
 	from hrms.payroll.doctype.salary_slip.salary_slip import HOLIDAYS_BETWEEN_DATES
 
 	frappe.cache().delete_value(HOLIDAYS_BETWEEN_DATES)
+	# holiday lists are shared across companies
+	clear_leave_calendar_cache()
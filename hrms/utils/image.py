@@ -0,0 +1,108 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import frappe
+from frappe.utils import cint
+
+# site config keys; images are only downscaled if a maximum dimension is set
+UPLOAD_IMAGE_MAX_DIMENSION = "hrms_upload_image_max_dimension"
+UPLOAD_IMAGE_MEMORY_LIMIT = "hrms_upload_image_memory_limit_mb"
+DEFAULT_MEMORY_LIMIT_MB = 256
+
+
+def enqueue_image_normalisation(file: str) -> None:
+	frappe.enqueue(
+		normalise_uploaded_image,
+		queue="short",
+		file=file,
+		enqueue_after_commit=True,
+	)
+
+
+def normalise_uploaded_image(file: str) -> None:
+	"""
+	Replaces an uploaded JPEG with its normalised copy, unless it needs no changes. Uploads of the
+	same content share the file on the disk, which is normalised once for all of them.
+	"""
+	file_doc = frappe.get_doc("File", file)
+	content = file_doc.get_content()
+	if (
+		file_doc.content_hash
+		and hashlib.md5(content, usedforsecurity=False).hexdigest() != file_doc.content_hash
+	):
+		# already normalised by the job of another upload sharing the file
+		return
+
+	content = normalise_image(content, **get_image_limits())
+	if content is None:
+		return
+
+	write_file_atomically(file_doc.get_full_path(), content)
+	# the content hash is left as is, so that uploads of the same original reuse this copy
+	File = frappe.qb.DocType("File")
+	(
+		frappe.qb.update(File)
+		.set(File.file_size, len(content))
+		.where(File.file_url == file_doc.file_url)
+	).run()
+
+
+def write_file_atomically(path: str, content: bytes) -> None:
+	"""Replaces the file, readers see either the old or the new content but never a partial one"""
+	fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".normalise-")
+	try:
+		with os.fdopen(fd, "wb") as f:
+			f.write(content)
+		os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+		os.replace(temp_path, path)
+	except BaseException:
+		os.remove(temp_path)
+		raise
+
+
+def normalise_image(
+	content: bytes, max_dimension: int = 0, memory_limit: int | None = None
+) -> bytes | None:
+	"""
+	Transposes the JPEG according to its EXIF orientation, downscales it to fit `max_dimension`
+	and re-encodes it without the EXIF data.
+
+	The decoded image must fit in `memory_limit` bytes. When downscaling, the JPEG is decoded at
+	the smallest scale still larger than `max_dimension`. Returns None if the image is left as is.
+	"""
+	from PIL import Image, ImageOps
+
+	with Image.open(io.BytesIO(content)) as image:
+		oversized = max_dimension and max(image.size) > max_dimension
+		if not image.getexif() and not oversized:
+			return None
+
+		if oversized:
+			image.draft(None, (max_dimension, max_dimension))
+
+		decoded_size = image.width * image.height * len(image.getbands())
+		if memory_limit and decoded_size > memory_limit:
+			frappe.log_error(
+				title="Uploaded image not normalised",
+				message=f"Decoding {image.width}x{image.height} needs {decoded_size} bytes",
+			)
+			return None
+
+		image = ImageOps.exif_transpose(image)
+		if oversized:
+			image.thumbnail((max_dimension, max_dimension))
+
+		output = io.BytesIO()
+		image.save(output, format="JPEG")
+
+	return output.getvalue()
+
+
+def get_image_limits() -> dict:
+	memory_limit = cint(frappe.conf.get(UPLOAD_IMAGE_MEMORY_LIMIT)) or DEFAULT_MEMORY_LIMIT_MB
+	return {
+		"max_dimension": cint(frappe.conf.get(UPLOAD_IMAGE_MAX_DIMENSION)),
+		"memory_limit": memory_limit * 1024 * 1024,
+	}